@@ -13,4 +13,25 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from db_connect.async_views import close_clients, share_clients  # noqa: E402
+
+# The server's event loop outlives requests: keep one S3 client on it
+share_clients()
+
+
+async def application(scope, receive, send):
+    # Django does not handle the lifespan protocol; answer it here so the
+    # async S3 client is closed when the server shuts down
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_clients()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'db_connect.metrics.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -120,6 +121,26 @@ LOGIN_REDIRECT_URL = '/'  # Redirect to home page or any desired URL
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+from corsheaders.defaults import default_headers
+
+# Conditional and partial document/label requests (get_document, get_json)
+CORS_ALLOW_HEADERS = (
+    *default_headers,
+    "range",
+    "if-none-match",
+    "if-modified-since",
+    "if-match",
+)
+
+CORS_EXPOSE_HEADERS = [
+    "ETag",
+    "Server-Timing",
+    "Last-Modified",
+    "Content-Range",
+    "Accept-Ranges",
+    "Content-Length",
+]
+
 CORS_ALLOW_METHODS = [
     "DELETE",
     "GET",
@@ -161,4 +182,95 @@ local_ip = socket.gethostbyname(hostname)
 
 FRONTEND_URL = f'http://{local_ip}:3000'
 
-SQS_PRE_LABEL_QUEUE_URL = 'https://sqs.ap-south-1.amazonaws.com/381491826341/tally-ai-doc-ai-taggo-pre-label-queue'
\ No newline at end of file
+SQS_PRE_LABEL_QUEUE_URL = 'https://sqs.ap-south-1.amazonaws.com/381491826341/tally-ai-doc-ai-taggo-pre-label-queue'
+SQS_REGION = 'ap-south-1'
+
+# Storage and queue backends (db_connect/backends.py): 's3'/'sqs' in deployments,
+# 'local' or 'memory' storage and 'memory' queue to run offline
+STORAGE_BACKEND = 's3'
+QUEUE_BACKEND = 'sqs'
+LOCAL_STORAGE_DIR = BASE_DIR / 'local_storage'
+
+# Shared boto3 client tuning: connection pool, retries with backoff and timeouts
+AWS_MAX_POOL_CONNECTIONS = 50
+AWS_MAX_ATTEMPTS = 5
+AWS_CONNECT_TIMEOUT = 5
+AWS_READ_TIMEOUT = 30
+
+# Direct-to-S3 uploads (create_upload / complete_upload)
+MAX_UPLOAD_SIZE = 100 * 1024 * 1024
+PRESIGNED_UPLOAD_EXPIRY = 3600
+
+# Thread pool sizes for bulk S3 uploads, SQS pre-label fan-out and background
+# derivative builds after upload
+BULK_UPLOAD_WORKERS = 16
+PRE_LABEL_WORKERS = 8
+DERIVATIVE_WORKERS = 2
+
+# ZIP archives sent to bulk_upload_documents: most files, and most bytes once
+# uncompressed (each file is also held to MAX_UPLOAD_SIZE)
+BULK_UPLOAD_MAX_FILES = 1000
+BULK_UPLOAD_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# A running pre-label job whose worker has not checked in for this long (the
+# process restarted or died) is reported as failed by pre_label_status
+PRE_LABEL_STALE_SECONDS = 5 * 60
+
+# get_json label cache, shared by every worker through the LABEL_CACHE_ALIAS cache:
+# Redis by default (redis-py required; while it is unreachable get_json reads S3).
+# 'labels_db' is the opt-in fallback where there is no Redis; it costs a Postgres
+# read of the encoded label per request and a cull on every fill. None falls back
+# to a per-process LRU of LABEL_CACHE_SIZE entries, which the db_connect.E001
+# check only allows with DEBUG on.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'labels': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+    },
+    'labels_db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'taggo_label_cache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+LABEL_CACHE_SIZE = 512
+LABEL_CACHE_TTL = 300
+LABEL_CACHE_MAX_ENTRY_SIZE = 4 * 1024 * 1024
+LABEL_CACHE_ALIAS = 'labels'
+
+# Write-behind buffer for label autosaves (save endpoint). The journal is local to
+# each host, so only enable it where requests for a label always reach one host.
+LABEL_WRITE_BEHIND = False
+LABEL_JOURNAL_DIR = BASE_DIR / 'label_journal'
+LABEL_FLUSH_INTERVAL = 5
+
+# Region OCR (get_ocr_text): process pool size, result cache and limits.
+# Word indexing at ingest OCRs whole pages on its own OCR_INDEX_WORKERS pool.
+OCR_WORKERS = 4
+OCR_INDEX_WORKERS = 1
+OCR_CACHE_SIZE = 2048
+OCR_TIMEOUT = 30
+OCR_MAX_BATCH = 50
+# Per-process cache of word index pages; a rebuild in another process is seen
+# once the entry is WORD_INDEX_CACHE_SECONDS old
+WORD_INDEX_CACHE_SIZE = 512
+WORD_INDEX_CACHE_SECONDS = 60
+
+# ASGI triage endpoints (db_connect/async_views.py)
+ASGI_APPLICATION = 'backend.asgi.application'
+ASYNC_S3_MAX_CONNECTIONS = 100
+
+# Request timing (db_connect/metrics.py): Server-Timing header and the metrics/ endpoint.
+# Scrapers send "Authorization: Bearer <METRICS_TOKEN>"; without a token the
+# endpoint is only served with DEBUG on.
+SERVER_TIMING_HEADER = True
+METRICS_TOKEN = None
+
+# claim_next work queue: how long a claim holds an annotation without a heartbeat.
+# With ASSIGN_REVIEWER_ON_SUBMIT = False, submitted annotations wait unassigned for
+# reviewers to claim instead of going to a random reviewer.
+CLAIM_LEASE_SECONDS = 15 * 60
+ASSIGN_REVIEWER_ON_SUBMIT = True
@@ -1,3 +1,52 @@
 from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from db_connect.perf import RouteBudgetTestCase, call
+import json
 
 # Create your tests here.
+class RouteBudgetTests(RouteBudgetTestCase):
+    urlconf = "custom_auth.urls"
+    routes = {
+        "token_obtain_pair": "route_token_obtain_pair",
+        "token_refresh": "route_token_refresh",
+        "logout": "route_logout",
+        "get_user_data": "route_get_user_data",
+        "change_password": "route_change_password",
+    }
+    excluded = {
+        "login": "server-rendered session login page; the frontend signs in through token/",
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("labeller", password="labeller")
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {AccessToken.for_user(self.user)}"
+        self.password_changes = 0
+
+    def grow(self, rows):
+        existing = User.objects.count()
+        User.objects.bulk_create((User(username=f"user{i}") for i in range(existing, rows)), batch_size=5000)
+
+    def route_token_obtain_pair(self):
+        return call("post", "/token/", {"username": "labeller", "password": "labeller"})
+
+    def route_token_refresh(self):
+        return call("post", "/token/refresh/", {"refresh": str(RefreshToken.for_user(self.user))})
+
+    def route_logout(self):
+        return call("post", "/logout/")
+
+    def route_get_user_data(self):
+        return call("get", "/get_user_data/")
+
+    def route_change_password(self):
+        # A user of its own, so every call starts from a known password
+        self.password_changes += 1
+        user = User.objects.create_user(f"password-change-{self.password_changes}", password="old")
+        return call(
+            "post", "/change_password/",
+            json.dumps({"old_password": "old", "new_password": "new"}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}",
+        )
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DbConnectConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'db_connect'
+
+    def ready(self):
+        from . import checks  # noqa: F401
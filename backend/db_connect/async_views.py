@@ -0,0 +1,327 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, HttpResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from botocore.exceptions import ClientError
+import asyncio, contextlib, contextvars, functools, json, logging, time
+from .models import Annotation
+from .backends import get_storage
+from . import metrics
+from . import label_cache, label_journal
+from .documents import build_derivative
+from .label_store import safe_record_revision
+from .transitions import submit_annotation, reject_annotation, accept_annotation, TransitionError, LeaseError, check_lease
+from .triage_views import (
+    DOCUMENT_CHUNK_SIZE,
+    document_get_params,
+    document_error_response,
+    document_response,
+    document_redirect,
+    wants_redirect,
+    label_bucket,
+    label_response,
+    write_label,
+    _patch_label,
+)
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+except ImportError:  # falls back to the shared storage client on worker threads
+    get_session = None
+
+# Async (ASGI) versions of the triage I/O endpoints, mounted under async/.
+# S3 calls go through aiobotocore when it is installed so a request waiting
+# on S3 does not hold a thread; otherwise (or with an offline storage
+# backend) the blocking storage call runs on a worker thread. Database
+# access uses the async ORM, with transactional transitions run through
+# sync_to_async.
+
+logger = logging.getLogger(__name__)
+
+# aiobotocore clients. Under the ASGI server (backend/asgi.py calls
+# share_clients()) the event loop lives as long as the process, so each loop
+# keeps one pooled client until close_clients() at lifespan shutdown.
+# Otherwise (WSGI runs every async view on a short-lived loop of its own)
+# async_api_view opens a client for the request and closes it when the view
+# returns.
+_clients = {}
+_shared = False
+_request_client = contextvars.ContextVar('async_s3_client', default=None)
+
+def share_clients():
+    global _shared
+    _shared = True
+
+def _use_aiobotocore():
+    return get_session is not None and settings.STORAGE_BACKEND == 's3'
+
+def _create_client():
+    config = AioConfig(
+        max_pool_connections=settings.ASYNC_S3_MAX_CONNECTIONS,
+        retries={'max_attempts': settings.AWS_MAX_ATTEMPTS, 'mode': 'standard'},
+        connect_timeout=settings.AWS_CONNECT_TIMEOUT,
+        read_timeout=settings.AWS_READ_TIMEOUT,
+    )
+    return get_session().create_client('s3', config=config)
+
+@contextlib.asynccontextmanager
+async def request_client():
+    if _shared or not _use_aiobotocore() or _request_client.get() is not None:
+        yield
+        return
+    async with _create_client() as client:
+        token = _request_client.set(client)
+        try:
+            yield
+        finally:
+            _request_client.reset(token)
+
+async def _s3():
+    client = _request_client.get()
+    if client is not None:
+        return client
+    if not _shared:
+        raise RuntimeError('No S3 client: call inside async_api_view or run under backend/asgi.py')
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = await _create_client().__aenter__()
+        _clients[loop] = client
+    return client
+
+async def close_clients():
+    # Closes the client of the running loop; those of other loops cannot be awaited from here
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+async def s3_call(method, **params):
+    if not _use_aiobotocore():
+        return await sync_to_async(getattr(get_storage(), method), thread_sensitive=False)(**params)
+    start = time.perf_counter()
+    try:
+        return await getattr(await _s3(), method)(**params)
+    finally:
+        metrics.record('storage', time.perf_counter() - start)
+
+async def read_body(s3_response):
+    body = s3_response['Body']
+    if not _use_aiobotocore():
+        return await sync_to_async(body.read, thread_sensitive=False)()
+    async with body as stream:
+        return await stream.read()
+
+async def document_body(s3_response):
+    if _request_client.get() is not None:
+        # The request's client is closed once the view returns, and WSGI
+        # iterates an async body on another loop anyway: read it here
+        return [await read_body(s3_response)]
+    return iter_body(s3_response)
+
+async def iter_body(s3_response):
+    body = s3_response['Body']
+    if not _use_aiobotocore():
+        while True:
+            chunk = await sync_to_async(body.read, thread_sensitive=False)(DOCUMENT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        async for chunk in body.iter_chunks(DOCUMENT_CHUNK_SIZE):
+            yield chunk
+
+def async_api_view(methods):
+    """
+    Async counterpart of @api_view + IsAuthenticated: JWT authentication,
+    method check and CSRF exemption (the API authenticates by header).
+
+    Only JWT is accepted, so async/get_document needs a token where the sync
+    get_document route (no permission classes) did not.
+    """
+    authenticator = JWTAuthentication()
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+            try:
+                result = await sync_to_async(authenticator.authenticate)(request)
+            except AuthenticationFailed as e:
+                return JsonResponse({'detail': str(e.detail)}, status=401)
+            if result is None:
+                return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+            request.user = result[0]
+            async with request_client():
+                return await view(request, *args, **kwargs)
+
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+@async_api_view(['GET'])
+async def get_document(request, id: str):
+    try:
+        document = await Annotation.objects.values("s3_file_key", "s3_pdf_key").aget(id=id)
+        s3_file_key = document['s3_pdf_key'] or await sync_to_async(build_derivative)(id, document['s3_file_key'])
+
+        redirect = document_redirect(s3_file_key) if wants_redirect(request) else None
+        if redirect is not None:
+            return redirect
+
+        try:
+            s3_response = await s3_call('get_object', **document_get_params(request, s3_file_key))
+        except ClientError as e:
+            response = document_error_response(request, e)
+            if response is None:
+                raise
+            return response
+
+        return document_response(id, s3_response, await document_body(s3_response))
+
+    except Exception as e:
+        logger.error(f"Error retrieving document: {e}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@async_api_view(['GET'])
+async def get_json(request, status: str, id: str):
+    try:
+        if status == 'uploaded':
+            status_in_db = (await Annotation.objects.only('status').aget(id=id)).status
+            if status_in_db == 'uploaded':
+                return JsonResponse({'status': 'success', 'data': None}, safe=False)
+
+            status = status_in_db
+
+        bucket = label_bucket(status)
+        if bucket is None:
+            return JsonResponse({'status': 'error', 'message': 'Invalid status'}, status=400)
+
+        s3_file_key = f"{id}.json"
+        if_none_match = request.headers.get('If-None-Match')
+
+        if label_journal.enabled():
+            pending = await sync_to_async(label_journal.read, thread_sensitive=False)(bucket, s3_file_key)
+            if pending is not None:
+                return JsonResponse({'status': 'success', 'data': json.loads(pending)}, safe=False)
+
+        cached = await label_cache.aget(bucket, s3_file_key)
+        if cached is None:
+            s3_response = await s3_call('get_object', Bucket=bucket, Key=s3_file_key)
+            etag = s3_response['ETag']
+            if etag == if_none_match:
+                body = None
+            else:
+                data = json.loads(await read_body(s3_response))
+                body = JsonResponse({'status': 'success', 'data': data}, safe=False).content
+                await label_cache.aput(bucket, s3_file_key, etag, body)
+        else:
+            etag, body = cached
+
+        return label_response(etag, body, if_none_match)
+
+    except Exception as e:
+        logger.error(f"Error retrieving JSON document: {e}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@async_api_view(['POST', 'PATCH'])
+async def save(request, status: str, id: str):
+    try:
+        if status in ['pre-labelling', 'in-labelling', 'in-review', 'accepted']:
+            bucket = settings.S3_LABELLING_BUCKET
+        elif status == 'completed':
+            bucket = settings.S3_LABEL_BUCKET
+        else:
+            return JsonResponse({'status': 'error', 'message': 'Invalid status'}, status=400)
+
+        await sync_to_async(check_lease)(id, request.user)
+        s3_file_key = f"{id}.json"
+
+        if request.method == 'PATCH':
+            # Read-modify-write with a version check; kept on the sync path
+            etag = await sync_to_async(_patch_label)(request, bucket, s3_file_key)
+            if isinstance(etag, HttpResponse):
+                return etag
+        elif label_journal.enabled():
+            await sync_to_async(label_journal.write, thread_sensitive=False)(bucket, s3_file_key, request.body, request.user.id)
+            etag = None
+        else:
+            etag = (await s3_call('put_object', Bucket=bucket, Key=s3_file_key, Body=request.body))['ETag']
+        await label_cache.ainvalidate(bucket, s3_file_key)
+
+        response = JsonResponse({'status': 'success', 'message': f'{status} JSON data saved successfully', 'etag': etag}, safe=False)
+        if etag:
+            response['ETag'] = etag
+        return response
+
+    except LeaseError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=409)
+    except Exception as e:
+        logger.error(f"Error saving JSON data: {e}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+async def _write_label(bucket, s3_file_key, json_data, user):
+    if label_journal.enabled():
+        # Journal flushes are ordered by a file lock; keep them on the sync path
+        await sync_to_async(write_label, thread_sensitive=False)(bucket, s3_file_key, json_data, user)
+        return
+    await s3_call('put_object', Bucket=bucket, Key=s3_file_key, Body=json_data.encode('utf-8'))
+    await sync_to_async(safe_record_revision)(bucket, s3_file_key, json_data.encode('utf-8'), user.id)
+    await label_cache.ainvalidate(bucket, s3_file_key)
+
+@async_api_view(['POST'])
+async def submit(request, status: str, id: str):
+    try:
+        if status != 'in-labelling':
+            return JsonResponse({'status': 'error', 'message': 'Invalid status'}, status=400)
+
+        await sync_to_async(check_lease)(id, request.user)
+        await _write_label(settings.S3_LABELLING_BUCKET, f"{id}.json", request.body.decode('utf-8'), request.user)
+        await sync_to_async(submit_annotation)(id, request.user)
+
+        return JsonResponse({'status': 'success', 'message': f'{status} JSON data saved successfully'}, safe=False)
+
+    except LeaseError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=409)
+    except Exception as e:
+        logger.error(f"Error saving JSON data: {e}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@async_api_view(['POST'])
+async def reject(request, status: str, id: str):
+    try:
+        if status not in ['in-review', 'accepted']:
+            return JsonResponse({'status': 'error', 'message': 'Cannot reject!'}, status=400)
+
+        await sync_to_async(check_lease)(id, request.user)
+        await _write_label(settings.S3_LABELLING_BUCKET, f"{id}.json", request.body.decode('utf-8'), request.user)
+        try:
+            await sync_to_async(reject_annotation)(id, request.user)
+        except TransitionError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=409 if isinstance(e, LeaseError) else 400)
+        return JsonResponse({'status': 'success', 'message': 'Annotation rejected'}, safe=False)
+
+    except LeaseError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=409)
+    except Exception as e:
+        logger.error(f"Error rejecting annotation: {e}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@async_api_view(['POST'])
+async def accept(request, status: str, id: str):
+    try:
+        if status != 'in-review':
+            return JsonResponse({'status': 'error', 'message': 'Cannot accept!'}, status=400)
+
+        await sync_to_async(check_lease)(id, request.user)
+        await _write_label(settings.S3_LABELLING_BUCKET, f"{id}.json", request.body.decode('utf-8'), request.user)
+        await sync_to_async(accept_annotation)(id, request.user)
+        return JsonResponse({'status': 'success', 'message': 'Annotation accepted!'}, safe=False)
+
+    except LeaseError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=409)
+    except Exception as e:
+        logger.error(f"Error accepting annotation: {e}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
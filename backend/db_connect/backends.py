@@ -0,0 +1,311 @@
+"""
+Object storage and message queue backends.
+
+Call sites use the subset of the boto3 S3 and SQS client APIs the app needs,
+so the same code runs against AWS or, for development and load tests, a
+local directory or process memory. STORAGE_BACKEND picks 's3', 'local' or
+'memory' and QUEUE_BACKEND picks 'sqs' or 'memory'. Clients are created on
+first use and shared by every request and worker thread.
+"""
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+import hashlib, io, logging, os, re, tempfile, threading, time, uuid
+import boto3
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_storage = None
+_queue = None
+
+# (service, operation) -> [calls, errors, seconds]
+_call_stats = defaultdict(lambda: [0, 0, 0.0])
+
+def call_stats():
+    with _lock:
+        return {
+            f"{service}.{operation}": {'calls': calls, 'errors': errors, 'seconds': round(seconds, 6)}
+            for (service, operation), (calls, errors, seconds) in _call_stats.items()
+        }
+
+def _record_call(service, operation, seconds, failed):
+    with _lock:
+        stats = _call_stats[(service, operation)]
+        stats[0] += 1
+        stats[1] += int(failed)
+        stats[2] += seconds
+    metrics.record(service, seconds)
+
+class Instrumented:
+    """Proxies a client, timing every method call."""
+
+    def __init__(self, service, client):
+        self._service = service
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = attr(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                _record_call(self._service, name, time.perf_counter() - start, failed)
+        return call
+
+def client_config(max_pool_connections=None):
+    # Standard retry mode backs off exponentially with jitter on throttling and 5xx
+    return Config(
+        max_pool_connections=max_pool_connections or settings.AWS_MAX_POOL_CONNECTIONS,
+        retries={'max_attempts': settings.AWS_MAX_ATTEMPTS, 'mode': 'standard'},
+        connect_timeout=settings.AWS_CONNECT_TIMEOUT,
+        read_timeout=settings.AWS_READ_TIMEOUT,
+        tcp_keepalive=True,
+    )
+
+def _error(code, operation, message=''):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+def _etag(data):
+    return f'"{hashlib.md5(data).hexdigest()}"'
+
+def _as_bytes(body):
+    if isinstance(body, str):
+        return body.encode('utf-8')
+    if hasattr(body, 'read'):
+        return body.read()
+    return bytes(body)
+
+def _byte_range(header, size):
+    # Single "bytes=start-end" range as S3 accepts it, or None if unsatisfiable
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    if match.group(1) == '':
+        start, end = max(size - int(match.group(2)), 0), size - 1
+    else:
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    if start >= size or start > end:
+        return None
+    return start, end
+
+class FakeS3Storage(ABC):
+    """
+    Offline stand-in for the S3 client: get/put/head with ETags, Range and
+    conditional requests, raising ClientError with S3's error codes.
+    Presigned URLs point at the local object and are only useful in tests.
+    """
+    scheme = 'local'
+
+    def __init__(self):
+        self._write_lock = threading.Lock()
+
+    @abstractmethod
+    def _load(self, bucket, key):
+        """Return (data, last_modified, content_type), or None if missing."""
+
+    @abstractmethod
+    def _store(self, bucket, key, data, content_type):
+        """Write the object, replacing any existing one."""
+
+    @abstractmethod
+    def _delete(self, bucket, key):
+        """Remove the object if it exists."""
+
+    def _get(self, bucket, key, operation):
+        stored = self._load(bucket, key)
+        if stored is None:
+            raise _error('NoSuchKey', operation, f'{bucket}/{key} does not exist')
+        return stored
+
+    def get_object(self, Bucket, Key, Range=None, IfNoneMatch=None, IfModifiedSince=None, **kwargs):
+        data, last_modified, content_type = self._get(Bucket, Key, 'GetObject')
+        etag = _etag(data)
+        if IfNoneMatch is not None and IfNoneMatch == etag:
+            raise _error('304', 'GetObject', 'Not Modified')
+        if IfNoneMatch is None and IfModifiedSince is not None and last_modified.replace(microsecond=0) <= IfModifiedSince:
+            raise _error('304', 'GetObject', 'Not Modified')
+
+        response = {'ETag': etag, 'LastModified': last_modified, 'ContentType': content_type}
+        if Range:
+            byte_range = _byte_range(Range, len(data))
+            if byte_range is None:
+                raise _error('InvalidRange', 'GetObject', 'The requested range is not satisfiable')
+            start, end = byte_range
+            response['ContentRange'] = f'bytes {start}-{end}/{len(data)}'
+            data = data[start:end + 1]
+        response['ContentLength'] = len(data)
+        response['Body'] = StreamingBody(io.BytesIO(data), len(data))
+        return response
+
+    def head_object(self, Bucket, Key, **kwargs):
+        stored = self._load(Bucket, Key)
+        if stored is None:
+            raise _error('404', 'HeadObject', 'Not Found')
+        data, last_modified, content_type = stored
+        return {'ETag': _etag(data), 'LastModified': last_modified,
+                'ContentType': content_type, 'ContentLength': len(data)}
+
+    def put_object(self, Bucket, Key, Body=b'', IfMatch=None, IfNoneMatch=None, ContentType=None, **kwargs):
+        data = _as_bytes(Body)
+        with self._write_lock:
+            if IfMatch is not None or IfNoneMatch is not None:
+                stored = self._load(Bucket, Key)
+                current = _etag(stored[0]) if stored else None
+                if IfMatch is not None and IfMatch != current:
+                    raise _error('PreconditionFailed', 'PutObject', 'At least one of the preconditions failed')
+                if IfNoneMatch == '*' and current is not None:
+                    raise _error('PreconditionFailed', 'PutObject', 'At least one of the preconditions failed')
+            self._store(Bucket, Key, data, ContentType or 'binary/octet-stream')
+        return {'ETag': _etag(data)}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        # Like S3, deleting a missing key succeeds
+        with self._write_lock:
+            self._delete(Bucket, Key)
+        return {}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, **kwargs):
+        self.put_object(Bucket=Bucket, Key=Key, Body=Fileobj, **(ExtraArgs or {}))
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, **kwargs):
+        return f"{self.scheme}://{Params['Bucket']}/{Params['Key']}"
+
+    def generate_presigned_post(self, Bucket, Key, Fields=None, Conditions=None, ExpiresIn=3600, **kwargs):
+        return {'url': f"{self.scheme}://{Bucket}/", 'fields': {**(Fields or {}), 'key': Key}}
+
+class MemoryStorage(FakeS3Storage):
+    scheme = 'memory'
+
+    def __init__(self):
+        super().__init__()
+        self._objects = {}
+
+    def _load(self, bucket, key):
+        return self._objects.get((bucket, key))
+
+    def _store(self, bucket, key, data, content_type):
+        self._objects[(bucket, key)] = (data, datetime.now(dt_timezone.utc), content_type)
+
+    def _delete(self, bucket, key):
+        self._objects.pop((bucket, key), None)
+
+class FileSystemStorage(FakeS3Storage):
+    """Objects live at LOCAL_STORAGE_DIR/<bucket>/<key>."""
+
+    def __init__(self, root):
+        super().__init__()
+        self.root = os.path.abspath(root)
+
+    def _path(self, bucket, key):
+        path = os.path.abspath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.join(self.root, bucket) + os.sep):
+            raise _error('InvalidArgument', 'Key', f'Invalid key {key}')
+        return path
+
+    def _load(self, bucket, key):
+        path = self._path(bucket, key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            modified = os.path.getmtime(path)
+        except FileNotFoundError:
+            return None
+        return data, datetime.fromtimestamp(modified, tz=dt_timezone.utc), 'binary/octet-stream'
+
+    def _store(self, bucket, key, data, content_type):
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial object
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _delete(self, bucket, key):
+        try:
+            os.remove(self._path(bucket, key))
+        except FileNotFoundError:
+            pass
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, **kwargs):
+        return 'file://' + self._path(Params['Bucket'], Params['Key'])
+
+class MemoryQueue:
+    """Offline stand-in for the SQS client; messages stay in process memory."""
+
+    def __init__(self):
+        self._queues = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        message_id = str(uuid.uuid4())
+        with self._lock:
+            self._queues[QueueUrl].append({'MessageId': message_id, 'Body': MessageBody})
+        return {'MessageId': message_id}
+
+    def send_message_batch(self, QueueUrl, Entries, **kwargs):
+        successful = [
+            {'Id': entry['Id'], **self.send_message(QueueUrl, entry['MessageBody'])}
+            for entry in Entries
+        ]
+        return {'Successful': successful, 'Failed': []}
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, **kwargs):
+        with self._lock:
+            queue = self._queues[QueueUrl]
+            messages = [queue.popleft() for _ in range(min(MaxNumberOfMessages, len(queue)))]
+        return {'Messages': messages} if messages else {}
+
+def _build_storage():
+    backend = settings.STORAGE_BACKEND
+    if backend == 's3':
+        return boto3.client('s3', config=client_config())
+    if backend == 'local':
+        return FileSystemStorage(settings.LOCAL_STORAGE_DIR)
+    if backend == 'memory':
+        return MemoryStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}")
+
+def _build_queue():
+    backend = settings.QUEUE_BACKEND
+    if backend == 'sqs':
+        return boto3.client('sqs', region_name=settings.SQS_REGION, config=client_config())
+    if backend == 'memory':
+        return MemoryQueue()
+    raise ValueError(f"Unknown QUEUE_BACKEND {backend!r}")
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        with _lock:
+            if _storage is None:
+                _storage = Instrumented('storage', _build_storage())
+    return _storage
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        with _lock:
+            if _queue is None:
+                _queue = Instrumented('queue', _build_queue())
+    return _queue
+
+def reset():
+    # Drop the shared clients, e.g. after changing backend settings in tests
+    global _storage, _queue
+    with _lock:
+        _storage = _queue = None
@@ -0,0 +1,268 @@
+"""
+Load benchmark for the annotation API (see the `benchmark` management
+command). Builds a synthetic corpus, then runs annotator, reviewer and admin
+workloads through the real URL routing and views on worker threads, with
+storage and queue served in memory (db_connect/backends.py), and reports
+latency percentiles, throughput and SQL query counts per endpoint.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from django.contrib.auth.models import User, Group
+from django.db import connection, close_old_connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from django.conf import settings
+from rest_framework.test import APIClient
+import json, random, threading, time
+from .models import Annotation
+from .backends import get_storage
+
+LABELLER_GROUP = 'labellers'
+REVIEWER_GROUP = 'reviewers'
+
+# Status mix of the synthetic corpus
+STATUS_WEIGHTS = {
+    'uploaded': 10,
+    'pre-labelled': 30,
+    'in-labelling': 25,
+    'in-review': 15,
+    'accepted': 5,
+    'completed': 15,
+}
+
+TABLE_COLUMNS = ['Description', 'HSN', 'Quantity', 'Rate', 'Amount']
+
+INSERT_BATCH_SIZE = 5000
+
+def synthetic_label(size, rng):
+    """A label document in the triage format, padded with table rows to about `size` bytes."""
+    def value(text):
+        page_no = rng.randint(1, 3)
+        return {'text': text, 'location': {'pageNo': page_no, 'ltwh': [rng.random() for _ in range(4)] + [page_no]}}
+
+    label = {
+        name: value(f"{name}-{rng.randint(0, 10 ** 6)}")
+        for name in ['InvoiceDate', 'InvoiceNumber', 'SupplierName', 'SupplierAddress', 'SupplierGSTIN',
+                     'BuyerName', 'BuyerAddress', 'BuyerGSTIN', 'SubAmount', 'TotalAmount']
+    }
+    label['Table'] = []
+    while len(json.dumps(label)) < size:
+        label['Table'].append({column: value(str(rng.randint(0, 10 ** 6))) for column in TABLE_COLUMNS})
+    return label
+
+def build_corpus(annotations, labellers, reviewers, label_size, labelled_sample, seed=0, stdout=None):
+    """
+    Creates users in the labeller/reviewer groups, `annotations` rows spread
+    over STATUS_WEIGHTS, and label JSONs in storage for a sample of the rows
+    the workloads touch. Returns the admin user.
+    """
+    rng = random.Random(seed)
+    admin = User.objects.create_superuser('bench-admin', password='bench-admin')
+    labeller_group = Group.objects.get_or_create(name=LABELLER_GROUP)[0]
+    reviewer_group = Group.objects.get_or_create(name=REVIEWER_GROUP)[0]
+    labeller_users = User.objects.bulk_create(User(username=f'bench-labeller-{i}') for i in range(labellers))
+    reviewer_users = User.objects.bulk_create(User(username=f'bench-reviewer-{i}') for i in range(reviewers))
+    labeller_group.user_set.add(*labeller_users)
+    reviewer_group.user_set.add(*reviewer_users)
+
+    statuses, weights = zip(*STATUS_WEIGHTS.items())
+    now = timezone.now()
+    for offset in range(0, annotations, INSERT_BATCH_SIZE):
+        rows = []
+        for i in range(offset, min(offset + INSERT_BATCH_SIZE, annotations)):
+            status = rng.choices(statuses, weights)[0]
+            labelled_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 60))
+            labeller, reviewer = rng.choice(labeller_users), rng.choice(reviewer_users)
+            row = Annotation(status=status, s3_file_key=f'bench/{i}.pdf')
+            if status == 'in-labelling':
+                row.assigned_to_user = labeller
+            elif status in ('in-review', 'accepted', 'completed'):
+                row.assigned_to_user = reviewer
+                row.labelled_by, row.labelled_at = labeller, labelled_at
+                if status != 'in-review':
+                    row.reviewed_by, row.reviewed_at = reviewer, labelled_at + timedelta(hours=1)
+            rows.append(row)
+        Annotation.objects.bulk_create(rows)
+        if stdout:
+            stdout.write(f"Inserted {offset + len(rows)}/{annotations} annotations")
+
+    store_labels(label_size, labelled_sample, rng)
+    return admin
+
+def store_labels(label_size, labelled_sample, rng):
+    # Labels only need to exist for the rows annotators and reviewers open
+    storage = get_storage()
+    sample = Annotation.objects.filter(status__in=['in-labelling', 'in-review']).values_list('id', 'status')
+    for annotation_id, status in sample[:labelled_sample]:
+        storage.put_object(
+            Bucket=settings.S3_LABELLING_BUCKET, Key=f'{annotation_id}.json',
+            Body=json.dumps(synthetic_label(label_size, rng)),
+        )
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)  # url name -> [(seconds, queries, status)]
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds, queries, status):
+        with self.lock:
+            self.samples[name].append((seconds, queries, status))
+
+    def report(self, elapsed):
+        endpoints = {}
+        for name, samples in sorted(self.samples.items()):
+            latencies = sorted(seconds * 1000 for seconds, _, _ in samples)
+            queries = [count for _, count, _ in samples]
+            endpoints[name] = {
+                'requests': len(samples),
+                'errors': sum(1 for _, _, status in samples if status >= 500),
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+                'mean_queries': round(sum(queries) / len(queries), 2),
+                'max_queries': max(queries),
+            }
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+            'endpoints': endpoints,
+        }
+
+class Session:
+    """One simulated user: an authenticated client that records every request."""
+
+    def __init__(self, user, recorder, rng):
+        self.user = user
+        self.recorder = recorder
+        self.rng = rng
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def request(self, method, path, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            if method == 'get':
+                response = self.client.get(path)
+            else:
+                response = getattr(self.client, method)(path, data, format='json')
+            seconds = time.perf_counter() - start
+        self.recorder.add(resolve(path.split('?')[0]).url_name, seconds, len(queries), response.status_code)
+        return response
+
+    def own_annotation(self, status):
+        ids = list(
+            Annotation.objects.filter(assigned_to_user=self.user, status=status)
+            .values_list('id', flat=True)[:20]
+        )
+        return self.rng.choice(ids) if ids else None
+
+def annotator_iteration(session, label_size):
+    user = session.user.username
+    session.request('get', f'/get_annotations/{user}/in-labelling/20/1/null')
+    annotation_id = session.own_annotation('in-labelling')
+    if annotation_id is None:
+        return
+    response = session.request('get', f'/get_json/in-labelling/{annotation_id}/')
+    label = (response.json().get('data') if response.status_code == 200 else None) or synthetic_label(label_size, session.rng)
+    # A few autosaves per document, then submit
+    for _ in range(3):
+        label['InvoiceNumber']['text'] = str(session.rng.randint(0, 10 ** 6))
+        session.request('post', f'/save/in-labelling/{annotation_id}/', label)
+    if session.rng.random() < 0.5:
+        session.request('post', f'/submit/in-labelling/{annotation_id}/', label)
+
+def reviewer_iteration(session, label_size):
+    user = session.user.username
+    session.request('get', f'/get_annotations/{user}/in-review/20/1/null')
+    annotation_id = session.own_annotation('in-review')
+    if annotation_id is None:
+        return
+    response = session.request('get', f'/get_json/in-review/{annotation_id}/')
+    label = (response.json().get('data') if response.status_code == 200 else None) or synthetic_label(label_size, session.rng)
+    action = 'accept' if session.rng.random() < 0.8 else 'reject'
+    session.request('post', f'/{action}/in-review/{annotation_id}/', label)
+
+def admin_iteration(session, label_size, usernames):
+    page = session.rng.randint(1, 50)
+    session.request('get', f'/get_annotations/all/all/20/{page}/null')
+    session.request('get', '/get_annotations_count/')
+    session.request('get', '/get_smart_assign_data/')
+    end = timezone.now()
+    start = end - timedelta(days=30)
+    session.request(
+        'get',
+        f'/dashboard_view/?username={session.rng.choice(usernames)}'
+        f'&start_date={start.date().isoformat()}&end_date={end.date().isoformat()}',
+    )
+    session.request(
+        'get', f'/dashboard_stats/?username=all&start_date={start.date().isoformat()}&end_date={end.date().isoformat()}',
+    )
+    if session.rng.random() < 0.2:
+        session.request('post', '/smart_assign/', {'status': 'pre-labelled', 'userGroup': LABELLER_GROUP, 'percentage': 1})
+
+def run_workload(annotators, reviewers, admins, duration, label_size, seed=0):
+    """
+    Runs each simulated user on its own thread for `duration` seconds and
+    returns the report.
+    """
+    recorder = Recorder()
+    labellers = list(User.objects.filter(groups__name=LABELLER_GROUP).order_by('id'))
+    reviewer_users = list(User.objects.filter(groups__name=REVIEWER_GROUP).order_by('id'))
+    admin_user = User.objects.filter(is_superuser=True).order_by('id').first()
+    usernames = [user.username for user in labellers + reviewer_users]
+    deadline = time.monotonic() + duration
+
+    def worker(index, user, iteration, *args):
+        rng = random.Random(seed + index)
+        session = Session(user, recorder, rng)
+        try:
+            while time.monotonic() < deadline:
+                iteration(session, label_size, *args)
+        finally:
+            close_old_connections()
+            connection.close()
+
+    threads = []
+    for i in range(annotators):
+        threads.append((labellers[i % len(labellers)], annotator_iteration, ()))
+    for i in range(reviewers):
+        threads.append((reviewer_users[i % len(reviewer_users)], reviewer_iteration, ()))
+    for _ in range(admins):
+        threads.append((admin_user, admin_iteration, (usernames,)))
+    threads = [
+        threading.Thread(target=worker, args=(index, user, iteration, *args), daemon=True)
+        for index, (user, iteration, args) in enumerate(threads)
+    ]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.report(time.perf_counter() - start)
+
+def compare(report, baseline, tolerance):
+    """
+    Regressions against a saved report: endpoints whose p95 grew by more than
+    `tolerance` (a fraction) or whose worst-case query count went up.
+    """
+    regressions = []
+    for name, current in report['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if previous is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current['max_queries'] > previous['max_queries']:
+            regressions.append(f"{name}: queries {previous['max_queries']} -> {current['max_queries']}")
+    return regressions
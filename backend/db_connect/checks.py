@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+@register()
+def label_cache_check(app_configs, **kwargs):
+    # Every worker has to see label invalidations, or they serve stale labels and ETags
+    if settings.DEBUG:
+        return []
+    alias = settings.LABEL_CACHE_ALIAS
+    if alias is None:
+        reason = 'LABEL_CACHE_ALIAS is None, so the label cache would be per process'
+    elif alias not in settings.CACHES:
+        reason = f'LABEL_CACHE_ALIAS names an unknown cache {alias!r}'
+    elif settings.CACHES[alias]['BACKEND'] in PROCESS_LOCAL_CACHES:
+        reason = f'the {alias!r} cache is per process'
+    else:
+        return []
+    return [Error(
+        f'{reason}; label invalidations would not reach other workers.',
+        hint='Point LABEL_CACHE_ALIAS at a cache shared by all workers (database, Redis or Memcached).',
+        id='db_connect.E001',
+    )]
+
+@register()
+def pymupdf_check(app_configs, **kwargs):
+    # PyMuPDF is optional, but without it every PDF word index build fails in the background
+    from .word_index import fitz
+    if fitz is not None:
+        return []
+    return [Warning(
+        'PyMuPDF is not installed, so PDF documents cannot be word-indexed.',
+        hint='pip install PyMuPDF',
+        id='db_connect.W001',
+    )]
@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import transaction, close_old_connections
+from PIL import Image, ImageSequence
+import logging, hashlib, io, threading
+from .models import Annotation
+from .backends import get_storage
+from .metrics import timed
+from .word_index import schedule_word_index
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # page metadata for PDFs is optional
+    PdfReader = None
+
+logger = logging.getLogger(__name__)
+
+_builder = None
+_builder_lock = threading.Lock()
+
+def derivative_key(annotation_id):
+    return f"derivatives/{annotation_id}.pdf"
+
+def image_to_pdf(data):
+    """
+    Converts an image (every frame of a multi-frame TIFF/GIF) to a single PDF.
+    Returns (pdf_bytes, page_sizes) with sizes in PDF points.
+    """
+    with timed('pdf'):
+        image = Image.open(io.BytesIO(data))
+        pages = [frame.convert('RGB') for frame in ImageSequence.Iterator(image)]
+        pdf_bytes = io.BytesIO()
+        pages[0].save(pdf_bytes, format='PDF', save_all=True, append_images=pages[1:], resolution=72.0)
+    return pdf_bytes.getvalue(), [list(page.size) for page in pages]
+
+def pdf_page_sizes(data):
+    if PdfReader is None:
+        return None
+    reader = PdfReader(io.BytesIO(data))
+    return [[float(page.mediabox.width), float(page.mediabox.height)] for page in reader.pages]
+
+def prepare_derivative(annotation_id, s3_file_key, data):
+    """
+    Makes sure a ready-to-serve PDF exists for the document and returns the
+    Annotation fields describing it (PDF key, page count, page sizes, content
+    hash). Images are converted once here so get_document never has to.
+    """
+    if s3_file_key.lower().endswith('.pdf'):
+        pdf_key = s3_file_key
+        page_sizes = pdf_page_sizes(data)
+    else:
+        pdf_bytes, page_sizes = image_to_pdf(data)
+        pdf_key = derivative_key(annotation_id)
+        get_storage().put_object(Bucket=settings.S3_DOC_BUCKET, Key=pdf_key, Body=pdf_bytes, ContentType='application/pdf')
+
+    return {
+        's3_pdf_key': pdf_key,
+        'page_count': len(page_sizes) if page_sizes is not None else None,
+        'page_sizes': page_sizes,
+        'content_hash': hashlib.sha256(data).hexdigest(),
+    }
+
+def build_derivative(annotation_id, s3_file_key, data=None):
+    # Same as prepare_derivative, for an existing row; returns the PDF key to serve
+    if data is None:
+        data = get_storage().get_object(Bucket=settings.S3_DOC_BUCKET, Key=s3_file_key)['Body'].read()
+    fields = prepare_derivative(annotation_id, s3_file_key, data)
+    Annotation.objects.filter(id=annotation_id).update(**fields)
+    return fields['s3_pdf_key']
+
+def _get_builder():
+    global _builder
+    if _builder is None:
+        with _builder_lock:
+            if _builder is None:
+                _builder = ThreadPoolExecutor(max_workers=settings.DERIVATIVE_WORKERS, thread_name_prefix='derivative')
+    return _builder
+
+def _build_in_background(annotation_id, s3_file_key):
+    close_old_connections()
+    try:
+        build_derivative(annotation_id, s3_file_key)
+    except Exception as e:
+        logger.error(f"Error building derivative for {annotation_id}: {e}")
+    finally:
+        close_old_connections()
+
+def ingest_document(annotation_id, s3_file_key):
+    """
+    Ingest-time hook. Once the upload commits, the derivative and word index
+    are built on background workers that read the object from storage, so the
+    upload request never handles the file bytes. Until the derivative exists
+    (or if building it failed) get_document builds it on first view.
+    """
+    def schedule():
+        _get_builder().submit(_build_in_background, annotation_id, s3_file_key)
+        schedule_word_index(annotation_id)
+    transaction.on_commit(schedule)
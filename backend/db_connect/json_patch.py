@@ -0,0 +1,136 @@
+# Minimal RFC 6902 (JSON Patch) implementation for label documents.
+import copy
+
+class JsonPatchError(ValueError):
+    pass
+
+class JsonPatchTestFailed(JsonPatchError):
+    pass
+
+def _parse_pointer(pointer):
+    # RFC 6901 JSON Pointer -> list of reference tokens
+    if pointer == '':
+        return []
+    if not pointer.startswith('/'):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+def _array_index(container, token, allow_end=False):
+    if allow_end and token == '-':
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == '0'):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"Array index out of range: {token!r}")
+    return index
+
+def _resolve(document, tokens):
+    for token in tokens:
+        if isinstance(document, list):
+            document = document[_array_index(document, token)]
+        elif isinstance(document, dict):
+            if token not in document:
+                raise JsonPatchError(f"Path not found: {token!r}")
+            document = document[token]
+        else:
+            raise JsonPatchError(f"Cannot traverse into {type(document).__name__}")
+    return document
+
+def _get(document, pointer):
+    return _resolve(document, _parse_pointer(pointer))
+
+def _add(document, pointer, value):
+    tokens = _parse_pointer(pointer)
+    if not tokens:
+        return value
+    parent = _resolve(document, tokens[:-1])
+    if isinstance(parent, list):
+        parent.insert(_array_index(parent, tokens[-1], allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    else:
+        raise JsonPatchError(f"Cannot add to {type(parent).__name__}")
+    return document
+
+def _remove(document, pointer):
+    tokens = _parse_pointer(pointer)
+    if not tokens:
+        raise JsonPatchError("Cannot remove the document root")
+    parent = _resolve(document, tokens[:-1])
+    if isinstance(parent, list):
+        return document, parent.pop(_array_index(parent, tokens[-1]))
+    if isinstance(parent, dict):
+        if tokens[-1] not in parent:
+            raise JsonPatchError(f"Path not found: {pointer!r}")
+        return document, parent.pop(tokens[-1])
+    raise JsonPatchError(f"Cannot remove from {type(parent).__name__}")
+
+def apply_patch(document, patch):
+    """
+    Applies a list of JSON Patch operations and returns the patched document.
+    The input document is left untouched; a failing operation raises
+    JsonPatchError and nothing is applied.
+    """
+    if not isinstance(patch, list):
+        raise JsonPatchError("Patch must be a list of operations")
+    document = copy.deepcopy(document)
+    for operation in patch:
+        try:
+            op, path = operation['op'], operation['path']
+        except (KeyError, TypeError):
+            raise JsonPatchError(f"Invalid operation: {operation!r}")
+
+        try:
+            if op == 'add':
+                document = _add(document, path, copy.deepcopy(operation['value']))
+            elif op == 'remove':
+                document, _ = _remove(document, path)
+            elif op == 'replace':
+                _get(document, path)
+                if _parse_pointer(path):
+                    document, _ = _remove(document, path)
+                document = _add(document, path, copy.deepcopy(operation['value']))
+            elif op == 'move':
+                if path.startswith(operation['from'] + '/'):
+                    raise JsonPatchError("Cannot move a value into one of its children")
+                document, value = _remove(document, operation['from'])
+                document = _add(document, path, value)
+            elif op == 'copy':
+                document = _add(document, path, copy.deepcopy(_get(document, operation['from'])))
+            elif op == 'test':
+                if _get(document, path) != operation['value']:
+                    raise JsonPatchTestFailed(f"Test failed at {path!r}")
+            else:
+                raise JsonPatchError(f"Unknown operation: {op!r}")
+        except KeyError as e:
+            raise JsonPatchError(f"Operation {op!r} is missing member {e}")
+    return document
+
+def _escape(token):
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+def make_patch(source, target, path=''):
+    """
+    Returns a JSON Patch turning source into target. Objects and equal-length
+    arrays are diffed member by member; anything else is replaced whole.
+    """
+    if source == target:
+        return []
+    if isinstance(source, dict) and isinstance(target, dict):
+        patch = []
+        for key in source:
+            if key not in target:
+                patch.append({'op': 'remove', 'path': f"{path}/{_escape(key)}"})
+        for key, value in target.items():
+            if key in source:
+                patch.extend(make_patch(source[key], value, f"{path}/{_escape(key)}"))
+            else:
+                patch.append({'op': 'add', 'path': f"{path}/{_escape(key)}", 'value': value})
+        return patch
+    if isinstance(source, list) and isinstance(target, list) and len(source) == len(target):
+        patch = []
+        for index, (old, new) in enumerate(zip(source, target)):
+            patch.extend(make_patch(old, new, f"{path}/{index}"))
+        return patch
+    return [{'op': 'replace', 'path': path, 'value': target}]
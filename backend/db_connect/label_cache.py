@@ -0,0 +1,83 @@
+from asgiref.sync import sync_to_async
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+import logging, threading, time
+
+# Cache of encoded get_json responses, keyed by (bucket, key). Each entry
+# carries the S3 ETag of the label version it was built from.
+#
+# Deployments share it through the Django cache named by LABEL_CACHE_ALIAS, so
+# an invalidation is seen by every worker. Without an alias, entries live in a
+# per-process LRU that other processes never hear invalidations for; the
+# label_cache system check only allows that under DEBUG. A shared cache that is
+# down is treated as empty: get_json falls back to S3.
+
+logger = logging.getLogger(__name__)
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+# After an invalidation, fills are refused for this long so that a read which
+# fetched the old version before the write cannot put it back
+TOMBSTONE_SECONDS = 10
+_TOMBSTONE = 'invalidated'
+
+def _shared():
+    alias = getattr(settings, 'LABEL_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+def _shared_key(bucket, key):
+    return f"label:{bucket}:{key}"
+
+def _call(shared, method, *args):
+    try:
+        return getattr(shared, method)(*args)
+    except Exception as e:
+        logger.error(f"Label cache {method} failed: {e}")
+        return None
+
+def get(bucket, key):
+    """Returns (etag, body) or None."""
+    shared = _shared()
+    if shared is not None:
+        entry = _call(shared, 'get', _shared_key(bucket, key))
+        return tuple(entry) if entry and entry != _TOMBSTONE else None
+
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get((bucket, key))
+        if entry and entry[2] > now:
+            _entries.move_to_end((bucket, key))
+            return entry[0], entry[1]
+        _entries.pop((bucket, key), None)
+    return None
+
+def put(bucket, key, etag, body):
+    if len(body) > settings.LABEL_CACHE_MAX_ENTRY_SIZE:
+        return
+    shared = _shared()
+    if shared is not None:
+        # add() leaves a tombstone or a newer entry in place
+        _call(shared, 'add', _shared_key(bucket, key), (etag, body), settings.LABEL_CACHE_TTL)
+        return
+
+    expires = time.monotonic() + settings.LABEL_CACHE_TTL
+    with _lock:
+        _entries[(bucket, key)] = (etag, body, expires)
+        _entries.move_to_end((bucket, key))
+        while len(_entries) > settings.LABEL_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+def invalidate(bucket, key):
+    shared = _shared()
+    if shared is not None:
+        _call(shared, 'set', _shared_key(bucket, key), _TOMBSTONE, TOMBSTONE_SECONDS)
+        return
+    with _lock:
+        _entries.pop((bucket, key), None)
+
+# For async views: the shared cache does network I/O
+aget = sync_to_async(get)
+aput = sync_to_async(put)
+ainvalidate = sync_to_async(invalidate)
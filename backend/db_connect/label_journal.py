@@ -0,0 +1,156 @@
+from django.conf import settings
+from contextlib import contextmanager
+from urllib.parse import quote, unquote
+import logging, os, threading, atexit, glob, fcntl, json
+from .backends import get_storage
+
+# Write-behind buffer for label autosaves. A save is acknowledged once the
+# body is durably in a local journal file (one file per bucket/key, so repeat
+# saves coalesce by overwriting it). A background thread uploads pending files
+# to S3 every LABEL_FLUSH_INTERVAL seconds. To flush, a file is first renamed
+# to a ".flushing-<pid>" claim, so a save landing mid-upload is kept for the
+# next round instead of being deleted. Flushes of the same key hold an flock,
+# so an older body can never land in S3 after a newer one; the lock file is
+# removed again afterwards, so the directory only holds pending work. The
+# journal is local to one host: enable it (LABEL_WRITE_BEHIND) only where every
+# request for a label reaches the same host. Each file starts
+# with a one-line JSON header (the author of the save). Flushing records no
+# label revision: like direct saves, autosaves only become history at a
+# transition (triage_views.write_label).
+
+logger = logging.getLogger(__name__)
+
+_flusher = None
+_flusher_lock = threading.Lock()
+_wakeup = threading.Event()
+
+def _journal_dir():
+    path = str(settings.LABEL_JOURNAL_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _path(bucket, key):
+    return os.path.join(_journal_dir(), quote(f"{bucket}/{key}", safe=''))
+
+def _split(path):
+    bucket, key = unquote(os.path.basename(path).split('.flushing-')[0]).split('/', 1)
+    return bucket, key
+
+def enabled():
+    return settings.LABEL_WRITE_BEHIND
+
+def _parse(entry):
+    header, body = entry.split(b'\n', 1)
+    return json.loads(header), body
+
+def write(bucket, key, body, author_id=None):
+    """Durably records the latest body for bucket/key; S3 is updated later."""
+    path = _path(bucket, key)
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(json.dumps({'author': author_id}).encode('utf-8') + b'\n')
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _ensure_flusher()
+
+def read(bucket, key):
+    # Pending body for bucket/key if it has not reached S3 yet, else None
+    path = _path(bucket, key)
+    for candidate in [path] + glob.glob(glob.escape(path) + '.flushing-*'):
+        # The pending file is newest; a claim is mid-upload and still newer than S3
+        try:
+            with open(candidate, 'rb') as f:
+                return _parse(f.read())[1]
+        except FileNotFoundError:
+            continue
+    return None
+
+@contextmanager
+def _key_lock(path):
+    lock_path = f"{path}.lock"
+    while True:
+        lock = open(lock_path, 'a')
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            current = os.stat(lock_path).st_ino == os.fstat(lock.fileno()).st_ino
+        except FileNotFoundError:
+            current = False
+        if current:
+            break
+        # The previous holder removed this file; lock the one that replaced it
+        lock.close()
+    try:
+        yield
+    finally:
+        os.remove(lock_path)
+        lock.close()
+
+def _flush_path(path):
+    with _key_lock(path):
+        claimed = f"{path}.flushing-{os.getpid()}"
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            return True
+
+        bucket, key = _split(path)
+        try:
+            with open(claimed, 'rb') as f:
+                _, body = _parse(f.read())
+            get_storage().put_object(Bucket=bucket, Key=key, Body=body)
+        except Exception as e:
+            logger.error(f"Error flushing {bucket}/{key}: {e}")
+            # Put it back unless a newer save has already replaced it
+            if not os.path.exists(path):
+                os.rename(claimed, path)
+            else:
+                os.remove(claimed)
+            return False
+
+        os.remove(claimed)
+        return True
+
+def flush(bucket, key):
+    """
+    Synchronously pushes a pending body for bucket/key to S3, if any. Returns
+    False if the upload failed (the body stays pending).
+    """
+    return _flush_path(_path(bucket, key))
+
+def flush_all():
+    for path in glob.glob(os.path.join(_journal_dir(), '*')):
+        name = os.path.basename(path)
+        if '.tmp-' in name or '.flushing-' in name or name.endswith('.lock'):
+            continue
+        _flush_path(path)
+
+def _recover():
+    # Claims left behind by a process that died mid-flush become pending again
+    for claimed in glob.glob(os.path.join(_journal_dir(), '*.flushing-*')):
+        path = claimed.split('.flushing-')[0]
+        if not os.path.exists(path):
+            try:
+                os.rename(claimed, path)
+            except FileNotFoundError:
+                pass
+
+def _run():
+    _recover()
+    while True:
+        _wakeup.wait(settings.LABEL_FLUSH_INTERVAL)
+        _wakeup.clear()
+        try:
+            flush_all()
+        except Exception as e:
+            logger.error(f"Error in label journal flusher: {e}")
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is None:
+        with _flusher_lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_run, name='label-journal-flusher', daemon=True)
+                _flusher.start()
+                atexit.register(flush_all)
@@ -0,0 +1,81 @@
+from django.conf import settings
+import logging, hashlib, gzip
+from .models import LabelRevision
+from .backends import get_storage
+
+try:
+    import zstandard
+except ImportError:  # gzip is used when zstd is not installed
+    zstandard = None
+
+# Versioned, content-addressed history of label documents. The current label
+# stays at {id}.json for the pre-label worker and get_json; versions written by
+# a transition or a restore are also kept as compressed blobs under revisions/
+# keyed by their SHA-256, so identical labels across documents are stored
+# once. Autosaves are not recorded, whether or not write-behind is on.
+# Nothing is pruned: history grows by a row, plus a blob for new content,
+# per recorded version.
+
+logger = logging.getLogger(__name__)
+
+def _compress(body):
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=10).compress(body)
+    return 'gzip', gzip.compress(body, compresslevel=9)
+
+def _decompress(encoding, data):
+    if encoding == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+def blob_key(content_hash, encoding):
+    extension = 'zst' if encoding == 'zstd' else 'gz'
+    return f"revisions/{content_hash[:2]}/{content_hash}.json.{extension}"
+
+def record_revision(bucket, key, body, author_id=None):
+    """
+    Records body as the newest revision of the label at bucket/key. Returns
+    the new LabelRevision, or None when it matches the latest one.
+    """
+    annotation_id = key[:-len('.json')]
+    content_hash = hashlib.sha256(body).hexdigest()
+
+    latest = (
+        LabelRevision.objects.filter(annotation_id=annotation_id)
+        .order_by('-created_at', '-id')
+        .values_list('content_hash', flat=True)
+        .first()
+    )
+    if latest == content_hash:
+        return None
+
+    blob = (
+        LabelRevision.objects.filter(content_hash=content_hash)
+        .values('blob_key', 'encoding', 'compressed_size')
+        .first()
+    )
+    if blob is None:
+        encoding, data = _compress(body)
+        blob = {'blob_key': blob_key(content_hash, encoding), 'encoding': encoding, 'compressed_size': len(data)}
+        get_storage().put_object(Bucket=settings.S3_LABELLING_BUCKET, Key=blob['blob_key'], Body=data)
+
+    return LabelRevision.objects.create(
+        annotation_id=annotation_id,
+        bucket=bucket,
+        author_id=author_id,
+        content_hash=content_hash,
+        size=len(body),
+        **blob,
+    )
+
+def safe_record_revision(bucket, key, body, author_id=None):
+    # Revisions are history only; failing to record one never fails the write
+    try:
+        return record_revision(bucket, key, body, author_id)
+    except Exception as e:
+        logger.error(f"Error recording revision for {bucket}/{key}: {e}")
+        return None
+
+def read_revision(revision):
+    data = get_storage().get_object(Bucket=settings.S3_LABELLING_BUCKET, Key=revision.blob_key)['Body'].read()
+    return _decompress(revision.encoding, data)
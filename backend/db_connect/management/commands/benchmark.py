@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from db_connect import backends
+from db_connect.benchmark import build_corpus, store_labels, run_workload, compare
+from db_connect.models import Annotation
+import json, random
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the annotation API against a synthetic corpus in a throwaway database, "
+        "with storage and queues in memory, and report latency, throughput and query counts"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--annotations", type=int, default=100000, help="Rows in the synthetic corpus")
+        parser.add_argument("--labellers", type=int, default=50)
+        parser.add_argument("--reviewers", type=int, default=10)
+        parser.add_argument("--label-size", type=int, default=20000, help="Approximate label JSON size in bytes")
+        parser.add_argument("--labelled-sample", type=int, default=5000, help="Rows given a label JSON in storage")
+        parser.add_argument("--annotator-threads", type=int, default=8)
+        parser.add_argument("--reviewer-threads", type=int, default=2)
+        parser.add_argument("--admin-threads", type=int, default=1)
+        parser.add_argument("--duration", type=int, default=60, help="Seconds to run the workload")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--keepdb", action="store_true", help="Reuse the benchmark database and its corpus")
+        parser.add_argument("--output", help="Write the report as JSON to this path")
+        parser.add_argument("--baseline", help="Fail if p95 latency or query counts regress against this report")
+        parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 growth over the baseline")
+
+    def handle(self, *args, **options):
+        # Never touch the configured database: run in a test database as the test runner does
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options["keepdb"])
+        try:
+            with override_settings(STORAGE_BACKEND="memory", QUEUE_BACKEND="memory",
+                                   LABEL_WRITE_BEHIND=False, ALLOWED_HOSTS=["*"]):
+                backends.reset()
+                report = self.run(options)
+        finally:
+            backends.reset()
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+
+        self.print_report(report)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                regressions = compare(report, json.load(f), options["tolerance"])
+            if regressions:
+                raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
+
+    def run(self, options):
+        if not (options["keepdb"] and Annotation.objects.exists()):
+            build_corpus(
+                options["annotations"], options["labellers"], options["reviewers"],
+                options["label_size"], options["labelled_sample"], seed=options["seed"], stdout=self.stdout,
+            )
+        else:
+            # Storage is in memory, so labels have to be put back on every run
+            store_labels(options["label_size"], options["labelled_sample"], random.Random(options["seed"]))
+
+        self.stdout.write(f"Running workload for {options['duration']}s")
+        return run_workload(
+            options["annotator_threads"], options["reviewer_threads"], options["admin_threads"],
+            options["duration"], options["label_size"], seed=options["seed"],
+        )
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{report['requests']} requests in {report['elapsed_s']}s ({report['throughput_rps']} req/s)"
+        )
+        self.stdout.write(
+            f"{'endpoint':<28}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}"
+        )
+        for name, endpoint in report["endpoints"].items():
+            self.stdout.write(
+                f"{name:<28}{endpoint['requests']:>9}{endpoint['errors']:>8}{endpoint['p50_ms']:>10}"
+                f"{endpoint['p95_ms']:>10}{endpoint['p99_ms']:>10}{endpoint['max_queries']:>9}"
+            )
@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from django.core.management.base import BaseCommand
+from db_connect.documents import build_derivative
+from db_connect.models import Annotation
+
+
+class Command(BaseCommand):
+    help = "Build PDF derivatives and page metadata for documents ingested before they existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def build(self, row):
+        try:
+            return build_derivative(*row)
+        except Exception as e:
+            self.stderr.write(f"Error building derivative for {row[0]}: {e}")
+            return None
+
+    def handle(self, *args, **options):
+        rows = (
+            Annotation.objects.filter(content_hash=None)
+            .exclude(status="pending")
+            .values_list("id", "s3_file_key")
+            .iterator(chunk_size=1000)
+        )
+        built = failed = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            # One batch in flight at a time, so memory stays bounded whatever the table size
+            while batch := list(islice(rows, options["batch_size"])):
+                for pdf_key in executor.map(self.build, batch):
+                    if pdf_key:
+                        built += 1
+                    else:
+                        failed += 1
+                self.stdout.write(f"Built {built}, failed {failed}")
+        self.stdout.write(self.style.SUCCESS(f"Built {built} derivatives, {failed} failed"))
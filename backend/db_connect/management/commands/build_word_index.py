@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from db_connect.models import Annotation, PageWordIndex
+from db_connect.word_index import build_word_index
+
+
+class Command(BaseCommand):
+    help = "OCR documents page by page into the word index used by get_region_text"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Rebuild documents that already have an index")
+
+    def handle(self, *args, **options):
+        annotations = Annotation.objects.exclude(status="pending")
+        if not options["all"]:
+            annotations = annotations.exclude(
+                id__in=PageWordIndex.objects.values("annotation_id")
+            )
+
+        indexed = failed = 0
+        for annotation_id in annotations.values_list("id", flat=True).iterator(chunk_size=1000):
+            try:
+                build_word_index(annotation_id)
+                indexed += 1
+            except Exception as e:
+                self.stderr.write(f"{annotation_id}: {e}")
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} documents, {failed} failed"))
@@ -0,0 +1,39 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from db_connect.backends import get_storage
+from db_connect.models import Annotation
+
+
+class Command(BaseCommand):
+    help = "Delete direct uploads that were created but never completed, and any object they left in S3"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than", type=int, default=None,
+            help="Age in seconds; defaults to PRESIGNED_UPLOAD_EXPIRY plus an hour, after which the browser can no longer upload",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        older_than = options["older_than"]
+        if older_than is None:
+            older_than = settings.PRESIGNED_UPLOAD_EXPIRY + 3600
+        abandoned = Annotation.objects.filter(
+            status="pending", inserted_time__lt=timezone.now() - timedelta(seconds=older_than)
+        )
+
+        deleted = 0
+        for annotation_id, s3_file_key in abandoned.values_list("id", "s3_file_key").iterator(chunk_size=1000):
+            if options["dry_run"]:
+                self.stdout.write(f"Would delete {annotation_id}")
+                deleted += 1
+                continue
+            # Conditional, so an upload completed since the scan is kept along with its file
+            removed, _ = Annotation.objects.filter(id=annotation_id, status="pending").delete()
+            if removed:
+                # The file may have landed without complete_upload being called
+                get_storage().delete_object(Bucket=settings.S3_DOC_BUCKET, Key=s3_file_key)
+                deleted += 1
+        self.stdout.write(self.style.SUCCESS(f"{'Found' if options['dry_run'] else 'Deleted'} {deleted} abandoned uploads"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from db_connect import label_journal
+
+
+class Command(BaseCommand):
+    help = "Upload every buffered label autosave to S3 (e.g. before a deploy)"
+
+    def handle(self, *args, **options):
+        label_journal.flush_all()
+        self.stdout.write(self.style.SUCCESS("Label journal flushed"))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from db_connect.models import AnnotationEvent, UserDailyStats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user daily rollups from the annotation event log"
+
+    def handle(self, *args, **options):
+        events = AnnotationEvent._meta.db_table
+        rollups = UserDailyStats._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Block transitions (not readers) so none is counted twice or lost during the rebuild
+            cursor.execute(f"LOCK TABLE {events} IN SHARE MODE")
+            cursor.execute(f"DELETE FROM {rollups}")
+            cursor.execute(
+                f"""
+                INSERT INTO {rollups} (user_id, day, labelled, reviewed, accepted, rejected)
+                SELECT actor_id,
+                       (timestamp AT TIME ZONE 'Asia/Kolkata')::date,
+                       COUNT(*) FILTER (WHERE action = 'labelled'),
+                       COUNT(*) FILTER (WHERE action IN ('accepted', 'rejected')),
+                       COUNT(*) FILTER (WHERE action = 'accepted'),
+                       COUNT(*) FILTER (WHERE action = 'rejected')
+                FROM {events}
+                WHERE actor_id IS NOT NULL AND action IN ('labelled', 'accepted', 'rejected')
+                GROUP BY 1, 2
+                """
+            )
+            rows = cursor.rowcount
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily rollup rows"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from db_connect.models import Annotation, AnnotationStatusCount
+
+
+class Command(BaseCommand):
+    help = "Recompute the annotation status counters from the annotation table"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Block writers (not readers) so the recount matches what the trigger will build on
+            with connection.cursor() as cursor:
+                cursor.execute(f"LOCK TABLE {Annotation._meta.db_table} IN SHARE MODE")
+
+            rows = (
+                Annotation.objects.values("status")
+                .annotate(
+                    assigned=Count("id", filter=~Q(assigned_to_user=None)),
+                    unassigned=Count("id", filter=Q(assigned_to_user=None)),
+                )
+                .order_by()
+            )
+            counters = []
+            for row in rows:
+                counters.append(AnnotationStatusCount(status=row["status"], assigned=True, count=row["assigned"]))
+                counters.append(AnnotationStatusCount(status=row["status"], assigned=False, count=row["unassigned"]))
+
+            AnnotationStatusCount.objects.all().delete()
+            AnnotationStatusCount.objects.bulk_create(counters)
+
+        for counter in counters:
+            self.stdout.write(str(counter))
+        self.stdout.write(self.style.SUCCESS("Status counters reconciled"))
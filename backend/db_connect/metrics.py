@@ -0,0 +1,168 @@
+"""
+Per-request timing and process-wide histograms.
+
+ServerTimingMiddleware opens a timing scope for every request. Database
+queries (through a connection execute wrapper), storage/queue calls
+(backends.Instrumented) and CPU-heavy sections wrapped in `timed()` add to
+the current scope; the totals go out in a Server-Timing header and into
+histograms labelled by URL name, served in Prometheus text format by
+metrics_view. Histograms are per process.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+import hmac, threading, time
+
+# Upper bounds in seconds, Prometheus' default buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current = ContextVar('request_timings', default=None)
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+            series = [(labels, list(values)) for labels, values in series]
+        for labels, values in series:
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {values[-1]}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {values[-2]}')
+            lines.append(f'{self.name}_count{{{label_text}}} {values[-1]}')
+        return '\n'.join(lines)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+request_duration = Histogram(
+    'taggo_request_duration_seconds', 'Request latency.', ('view', 'method', 'status'), DURATION_BUCKETS,
+)
+section_duration = Histogram(
+    'taggo_request_section_seconds', 'Time per request spent in the database, storage and CPU-heavy sections.',
+    ('view', 'section'), DURATION_BUCKETS,
+)
+request_queries = Histogram(
+    'taggo_request_db_queries', 'SQL queries per request.', ('view',), QUERY_BUCKETS,
+)
+
+def record(section, seconds, count=1):
+    # Adds to the current request's scope; a no-op outside requests (worker threads, commands)
+    timings = _current.get()
+    if timings is not None:
+        total = timings.setdefault(section, [0, 0.0])
+        total[0] += count
+        total[1] += seconds
+
+@contextmanager
+def timed(section):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(section, time.perf_counter() - start)
+
+def _db_wrapper(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record('db', time.perf_counter() - start)
+
+def _install_db_wrapper(sender, connection, **kwargs):
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+connection_created.connect(_install_db_wrapper)
+
+def server_timing(timings, total):
+    parts = []
+    for section, (count, seconds) in timings.items():
+        part = f'{section};dur={seconds * 1000:.1f}'
+        if section == 'db':
+            part += f';desc="{count} queries"'
+        parts.append(part)
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+@sync_and_async_middleware
+class ServerTimingMiddleware:
+    # Runs natively under both WSGI and ASGI, so async views are not pushed onto a thread
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings = {}
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        timings = {}
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    def finish(self, request, response, timings, total):
+        # Unmatched paths share one label so 404 probes cannot grow the series without bound
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unmatched'
+        request_duration.observe((view, request.method, str(response.status_code)), total)
+        for section, (count, seconds) in timings.items():
+            section_duration.observe((view, section), seconds)
+        request_queries.observe((view,), timings.get('db', (0, 0.0))[0])
+
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = server_timing(timings, total)
+            # Lets the cross-origin frontend read it from the Resource Timing API
+            response['Timing-Allow-Origin'] = '*'
+        return response
+
+def metrics_view(request):
+    # Open only under DEBUG; otherwise METRICS_TOKEN must be set and presented
+    if settings.METRICS_TOKEN:
+        presented = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(presented.encode(), f'Bearer {settings.METRICS_TOKEN}'.encode()):
+            return HttpResponse(status=401)
+    elif not settings.DEBUG:
+        return HttpResponse(status=403)
+    body = '\n'.join(histogram.render() for histogram in (request_duration, section_duration, request_queries))
+    return HttpResponse(body + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
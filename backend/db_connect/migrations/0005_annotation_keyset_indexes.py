@@ -0,0 +1,25 @@
+# Generated by Django 4.2.19 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_connect', '0004_annotation_completed_time_annotation_labelled_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='annotation',
+            index=models.Index(fields=['status', 'assigned_to_user', '-inserted_time', '-id'], name='annotation_status_user_time'),
+        ),
+        migrations.AddIndex(
+            model_name='annotation',
+            index=models.Index(fields=['assigned_to_user', '-inserted_time', '-id'], name='annotation_user_time'),
+        ),
+        migrations.AddIndex(
+            model_name='annotation',
+            index=models.Index(fields=['-inserted_time', '-id'], name='annotation_time'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.19 on 2026-10-18 11:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('db_connect', '0005_annotation_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnnotationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('uploaded', 'Uploaded'), ('assigned', 'Assigned'), ('unassigned', 'Unassigned'), ('labelled', 'Labelled'), ('accepted', 'Accepted'), ('rejected', 'Rejected'), ('legacy', 'Legacy')], max_length=50)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('from_status', models.CharField(blank=True, max_length=50, null=True)),
+                ('to_status', models.CharField(blank=True, max_length=50, null=True)),
+                ('message', models.TextField(blank=True, default='')),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('annotation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='db_connect.annotation')),
+                ('assignee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['annotation', '-timestamp', '-id'], name='event_annotation_time')],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Copies the legacy history strings into AnnotationEvent rows.
+
+from datetime import datetime
+import re
+import pytz
+from django.db import migrations
+
+IST = pytz.timezone('Asia/Kolkata')
+HISTORY_RE = re.compile(r'^(\d{2}:\d{2}:\d{2} \(\d{2}-\w{3}-\d{2}\)): (.*)$')
+ACTOR_RE = re.compile(r' by (\S+?)(?:\(smart assign\))?$')
+ACTIONS = [
+    ('unassigned by', 'unassigned'),
+    ('uploaded by', 'uploaded'),
+    ('assigned to', 'assigned'),
+    ('labelled by', 'labelled'),
+    ('accepted by', 'accepted'),
+    ('rejected by', 'rejected'),
+]
+
+
+def backfill_events(apps, schema_editor):
+    Annotation = apps.get_model('db_connect', 'Annotation')
+    AnnotationEvent = apps.get_model('db_connect', 'AnnotationEvent')
+    User = apps.get_model('auth', 'User')
+    user_ids = dict(User.objects.values_list('username', 'id'))
+
+    batch = []
+    annotations = Annotation.objects.exclude(history=[]).values_list('id', 'inserted_time', 'history')
+    for annotation_id, inserted_time, history in annotations.iterator(chunk_size=2000):
+        for entry in history or []:
+            match = HISTORY_RE.match(str(entry))
+            timestamp, message = inserted_time, str(entry)
+            if match:
+                message = match.group(2)
+                try:
+                    timestamp = IST.localize(datetime.strptime(match.group(1), '%H:%M:%S (%d-%b-%y)'))
+                except ValueError:
+                    pass
+            action = next((action for prefix, action in ACTIONS if message.startswith(prefix)), 'legacy')
+            actor = ACTOR_RE.search(message)
+            batch.append(AnnotationEvent(
+                annotation_id=annotation_id,
+                action=action,
+                actor_id=user_ids.get(actor.group(1)) if actor else None,
+                timestamp=timestamp,
+                message=message,
+            ))
+        if len(batch) >= 5000:
+            AnnotationEvent.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        AnnotationEvent.objects.bulk_create(batch)
+
+
+def restore_history(apps, schema_editor):
+    Annotation = apps.get_model('db_connect', 'Annotation')
+    AnnotationEvent = apps.get_model('db_connect', 'AnnotationEvent')
+
+    history = {}
+    for event in AnnotationEvent.objects.order_by('timestamp', 'id').values('annotation_id', 'timestamp', 'message').iterator():
+        ist_time = event['timestamp'].astimezone(IST).strftime('%H:%M:%S (%d-%b-%y)')
+        history.setdefault(event['annotation_id'], []).append(f"{ist_time}: {event['message']}")
+    for annotation_id, entries in history.items():
+        Annotation.objects.filter(id=annotation_id).update(history=entries)
+    AnnotationEvent.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_connect', '0006_annotationevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_events, restore_history),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.19 on 2026-10-18 11:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_connect', '0007_backfill_annotationevent'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='annotation',
+            name='history',
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.19 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+# Keeps db_connect_annotationstatuscount in step with every insert, delete and
+# status/assignee change on db_connect_annotation, in the same transaction.
+# Done in the database so writes made outside Django (the pre-label worker)
+# are counted too.
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION db_connect_annotation_status_count() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+        AND OLD.status = NEW.status
+        AND (OLD.assigned_to_user_id IS NULL) = (NEW.assigned_to_user_id IS NULL) THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE db_connect_annotationstatuscount SET count = count - 1
+        WHERE status = OLD.status AND assigned = (OLD.assigned_to_user_id IS NOT NULL);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO db_connect_annotationstatuscount (status, assigned, count)
+        VALUES (NEW.status, NEW.assigned_to_user_id IS NOT NULL, 1)
+        ON CONFLICT (status, assigned) DO UPDATE
+        SET count = db_connect_annotationstatuscount.count + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER db_connect_annotation_status_count
+AFTER INSERT OR DELETE OR UPDATE OF status, assigned_to_user_id ON db_connect_annotation
+FOR EACH ROW EXECUTE FUNCTION db_connect_annotation_status_count();
+
+INSERT INTO db_connect_annotationstatuscount (status, assigned, count)
+SELECT status, assigned_to_user_id IS NOT NULL, COUNT(*)
+FROM db_connect_annotation
+GROUP BY status, assigned_to_user_id IS NOT NULL;
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS db_connect_annotation_status_count ON db_connect_annotation;
+DROP FUNCTION IF EXISTS db_connect_annotation_status_count();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_connect', '0008_remove_annotation_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnnotationStatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=50)),
+                ('assigned', models.BooleanField()),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('status', 'assigned'), name='unique_status_assigned')],
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
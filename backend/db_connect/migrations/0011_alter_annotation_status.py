@@ -0,0 +1,18 @@
+# Generated by Django 4.2.19 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_connect', '0010_annotation_pre_label_enqueued_at_prelabeljob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='annotation',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('uploaded', 'Uploaded'), ('pre-labelled', 'Pre-labelled'), ('in-labelling', 'In-Labelling'), ('in-review', 'In-Review'), ('accepted', 'Accepted'), ('completed', 'Completed')], default='uploaded', max_length=50),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.19 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_connect', '0011_alter_annotation_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='annotation',
+            name='s3_pdf_key',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='annotation',
+            name='page_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='annotation',
+            name='page_sizes',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='annotation',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.19 on 2026-10-18 16:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('db_connect', '0012_annotation_derivative_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabelRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('blob_key', models.CharField(max_length=255)),
+                ('encoding', models.CharField(max_length=10)),
+                ('size', models.IntegerField()),
+                ('compressed_size', models.IntegerField()),
+                ('annotation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='db_connect.annotation')),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['annotation', '-created_at', '-id'], name='revision_annotation_time')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.19 on 2026-10-18 17:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_connect', '0013_labelrevision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageWordIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page', models.IntegerField()),
+                ('words', models.JSONField(default=list)),
+                ('grid', models.JSONField(default=dict)),
+                ('annotation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='word_index', to='db_connect.annotation')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('annotation', 'page'), name='unique_annotation_page')],
+            },
+        ),
+    ]
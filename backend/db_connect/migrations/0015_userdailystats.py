@@ -0,0 +1,54 @@
+# Generated by Django 4.2.19 on 2026-10-18 18:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Seeds the rollups from the event log, bucketed by IST day like the transitions do
+BACKFILL = """
+INSERT INTO db_connect_userdailystats (user_id, day, labelled, reviewed, accepted, rejected)
+SELECT actor_id,
+       (timestamp AT TIME ZONE 'Asia/Kolkata')::date,
+       COUNT(*) FILTER (WHERE action = 'labelled'),
+       COUNT(*) FILTER (WHERE action IN ('accepted', 'rejected')),
+       COUNT(*) FILTER (WHERE action = 'accepted'),
+       COUNT(*) FILTER (WHERE action = 'rejected')
+FROM db_connect_annotationevent
+WHERE actor_id IS NOT NULL AND action IN ('labelled', 'accepted', 'rejected')
+GROUP BY 1, 2;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('db_connect', '0014_pagewordindex'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='annotation',
+            index=models.Index(fields=['labelled_by', '-labelled_at'], name='annotation_labeller_time'),
+        ),
+        migrations.AddIndex(
+            model_name='annotation',
+            index=models.Index(fields=['reviewed_by', '-reviewed_at'], name='annotation_reviewer_time'),
+        ),
+        migrations.CreateModel(
+            name='UserDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('labelled', models.IntegerField(default=0)),
+                ('reviewed', models.IntegerField(default=0)),
+                ('accepted', models.IntegerField(default=0)),
+                ('rejected', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'day'), name='unique_user_day')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+    ]
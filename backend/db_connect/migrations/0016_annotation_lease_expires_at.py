@@ -0,0 +1,22 @@
+# Generated by Django 4.2.19 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_connect', '0015_userdailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='annotation',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='annotation',
+            index=models.Index(condition=models.Q(('lease_expires_at__isnull', False)), fields=['status', 'lease_expires_at'], name='annotation_lease'),
+        ),
+    ]
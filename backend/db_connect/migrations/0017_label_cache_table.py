@@ -0,0 +1,20 @@
+# Generated by Django 4.2.19 on 2026-10-18 20:00
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_tables(apps, schema_editor):
+    # Creates the DatabaseCache tables in CACHES (the opt-in labels_db label cache)
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_connect', '0016_annotation_lease_expires_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_tables, migrations.RunPython.noop),
+    ]
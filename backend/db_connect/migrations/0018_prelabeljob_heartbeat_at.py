@@ -0,0 +1,19 @@
+# Generated by Django 4.2.19 on 2026-10-18 21:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_connect', '0017_label_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prelabeljob',
+            name='heartbeat_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
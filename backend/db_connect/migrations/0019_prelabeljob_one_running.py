@@ -0,0 +1,29 @@
+# Generated by Django 4.2.19 on 2026-10-18 22:00
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fail_extra_running_jobs(apps, schema_editor):
+    # Only the newest running job can stay running under the constraint
+    PreLabelJob = apps.get_model('db_connect', 'PreLabelJob')
+    running = PreLabelJob.objects.filter(status='running').order_by('-created_at')
+    extra = list(running.values_list('id', flat=True)[1:])
+    PreLabelJob.objects.filter(id__in=extra).update(
+        status='failed', error='Superseded by a newer job', finished_at=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_connect', '0018_prelabeljob_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_extra_running_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='prelabeljob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'running')), fields=('status',), name='one_running_prelabeljob'),
+        ),
+    ]
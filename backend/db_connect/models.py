@@ -8,12 +8,12 @@ import pytz
 class Annotation(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     assigned_to_user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
-    history = models.JSONField(default=list)
     labelled_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='labelled_by')
     labelled_at = models.DateTimeField(null=True, blank=True)
     reviewed_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='reviewed_by')
     reviewed_at = models.DateTimeField(null=True, blank=True)
     STATUS_CHOICES = [
+        ('pending', 'Pending'),
         ('uploaded', 'Uploaded'),
         ('pre-labelled', 'Pre-labelled'),
         ('in-labelling', 'In-Labelling'),
@@ -27,6 +27,23 @@ class Annotation(models.Model):
     s3_file_key = models.CharField(max_length=255)
     s3_pre_label_key = models.CharField(max_length=255, null=True, blank=True)
     s3_label_key = models.CharField(max_length=255, null=True, blank=True)
+    pre_label_enqueued_at = models.DateTimeField(null=True, blank=True)
+    s3_pdf_key = models.CharField(max_length=255, null=True, blank=True)
+    page_count = models.IntegerField(null=True, blank=True)
+    page_sizes = models.JSONField(null=True, blank=True)
+    content_hash = models.CharField(max_length=64, null=True, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'assigned_to_user', '-inserted_time', '-id'], name='annotation_status_user_time'),
+            models.Index(fields=['assigned_to_user', '-inserted_time', '-id'], name='annotation_user_time'),
+            models.Index(fields=['-inserted_time', '-id'], name='annotation_time'),
+            models.Index(fields=['labelled_by', '-labelled_at'], name='annotation_labeller_time'),
+            models.Index(fields=['reviewed_by', '-reviewed_at'], name='annotation_reviewer_time'),
+            models.Index(fields=['status', 'lease_expires_at'], name='annotation_lease',
+                         condition=models.Q(lease_expires_at__isnull=False)),
+        ]
 
     def save(self, *args, **kwargs):
         ist = pytz.timezone('Asia/Kolkata')
@@ -38,3 +55,129 @@ class Annotation(models.Model):
 
     def __str__(self):
         return f"Annotation {self.id} - {self.status}"
+
+
+class AnnotationEvent(models.Model):
+    ACTION_CHOICES = [
+        ('uploaded', 'Uploaded'),
+        ('assigned', 'Assigned'),
+        ('unassigned', 'Unassigned'),
+        ('labelled', 'Labelled'),
+        ('accepted', 'Accepted'),
+        ('rejected', 'Rejected'),
+        ('legacy', 'Legacy'),
+    ]
+    annotation = models.ForeignKey(Annotation, on_delete=models.CASCADE, related_name='events')
+    actor = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    action = models.CharField(max_length=50, choices=ACTION_CHOICES)
+    timestamp = models.DateTimeField(default=timezone.now)
+    from_status = models.CharField(max_length=50, null=True, blank=True)
+    to_status = models.CharField(max_length=50, null=True, blank=True)
+    assignee = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    message = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['annotation', '-timestamp', '-id'], name='event_annotation_time'),
+        ]
+
+    def __str__(self):
+        return f"{self.annotation_id} - {self.action}"
+
+
+class AnnotationStatusCount(models.Model):
+    # Maintained by a database trigger on db_connect_annotation (see migration 0009)
+    status = models.CharField(max_length=50)
+    assigned = models.BooleanField()
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['status', 'assigned'], name='unique_status_assigned'),
+        ]
+
+    def __str__(self):
+        return f"{self.status} ({'assigned' if self.assigned else 'unassigned'}): {self.count}"
+
+
+class UserDailyStats(models.Model):
+    # Per-user work done on one IST day, counted by the status transitions (transitions.py)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    labelled = models.IntegerField(default=0)
+    reviewed = models.IntegerField(default=0)
+    accepted = models.IntegerField(default=0)
+    rejected = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_user_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.day}: {self.labelled} labelled, {self.reviewed} reviewed"
+
+
+class PreLabelJob(models.Model):
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='running')
+    force = models.BooleanField(default=False)
+    total = models.IntegerField(default=0)
+    enqueued = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Bumped by the worker as it goes; a running job that stops bumping it has lost its worker
+    heartbeat_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            # Two jobs running side by side would enqueue the same documents twice
+            models.UniqueConstraint(fields=['status'], condition=models.Q(status='running'), name='one_running_prelabeljob'),
+        ]
+
+    def __str__(self):
+        return f"PreLabelJob {self.id} - {self.status} ({self.enqueued}/{self.total})"
+
+
+class LabelRevision(models.Model):
+    annotation = models.ForeignKey(Annotation, on_delete=models.CASCADE, related_name='revisions')
+    bucket = models.CharField(max_length=255)
+    author = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+    content_hash = models.CharField(max_length=64, db_index=True)
+    blob_key = models.CharField(max_length=255)
+    encoding = models.CharField(max_length=10)
+    size = models.IntegerField()
+    compressed_size = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['annotation', '-created_at', '-id'], name='revision_annotation_time'),
+        ]
+
+    def __str__(self):
+        return f"{self.annotation_id} @ {self.created_at} ({self.content_hash[:12]})"
+
+
+class PageWordIndex(models.Model):
+    # OCR word boxes of one document page; see db_connect/word_index.py
+    annotation = models.ForeignKey(Annotation, on_delete=models.CASCADE, related_name='word_index')
+    page = models.IntegerField()
+    words = models.JSONField(default=list)
+    grid = models.JSONField(default=dict)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['annotation', 'page'], name='unique_annotation_page'),
+        ]
+
+    def __str__(self):
+        return f"{self.annotation_id} page {self.page}"
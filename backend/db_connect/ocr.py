@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from PIL import Image
+import hashlib, io, multiprocessing, threading
+import pytesseract
+from .metrics import timed
+
+# Region OCR for the triage PdfViewer. Crops are decoded and recognised in
+# memory on a bounded process pool (tesseract is CPU bound), and results are
+# cached by the SHA-256 of the crop bytes so repeated selections are free.
+# Pool processes are started with forkserver (spawn where unavailable): forking
+# a threaded web worker can copy locks held by other threads into the child.
+# Ingest-time page OCR for the word index runs on a pool of its own, so a bulk
+# ingest cannot queue ahead of interactive crops and run them into OCR_TIMEOUT.
+
+INTERACTIVE = 'interactive'
+INDEX = 'index'
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+_results = OrderedDict()
+_results_lock = threading.Lock()
+
+def _get_pool(name):
+    pool = _pools.get(name)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                workers = settings.OCR_WORKERS if name == INTERACTIVE else settings.OCR_INDEX_WORKERS
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                pool = _pools[name] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+    return pool
+
+def _replace_pool(name, broken):
+    with _pool_lock:
+        if _pools.get(name) is broken:
+            del _pools[name]
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def _map(fn, items, timeout, pool_name=INTERACTIVE):
+    """
+    fn over items on the named pool, results in order. A worker that dies (a
+    crashed or OOM-killed tesseract) breaks the whole pool; it is replaced and
+    the batch retried once.
+    """
+    for attempt in range(2):
+        pool = _get_pool(pool_name)
+        try:
+            futures = [pool.submit(fn, item) for item in items]
+            return [future.result(timeout=timeout) for future in futures]
+        except BrokenProcessPool:
+            _replace_pool(pool_name, pool)
+            if attempt:
+                raise
+
+def image_to_text(data):
+    # Runs in a pool process
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    return pytesseract.image_to_string(image).strip()
+
+def _cached(content_hash):
+    with _results_lock:
+        if content_hash in _results:
+            _results.move_to_end(content_hash)
+            return _results[content_hash]
+    return None
+
+def _store(content_hash, text):
+    with _results_lock:
+        _results[content_hash] = text
+        _results.move_to_end(content_hash)
+        while len(_results) > settings.OCR_CACHE_SIZE:
+            _results.popitem(last=False)
+
+def ocr_images(images):
+    """
+    OCRs a list of image byte strings and returns their texts in order.
+    Cached crops are answered immediately; the rest run in parallel on the
+    pool, and identical crops within one call are only recognised once.
+    """
+    hashes = [hashlib.sha256(data).hexdigest() for data in images]
+    texts = [_cached(content_hash) for content_hash in hashes]
+
+    pending = {}
+    for data, content_hash, text in zip(images, hashes, texts):
+        if text is None and content_hash not in pending:
+            pending[content_hash] = data
+
+    with timed('ocr'):
+        for content_hash, text in zip(pending, _map(image_to_text, list(pending.values()), settings.OCR_TIMEOUT)):
+            _store(content_hash, text)
+
+    return [_cached(content_hash) if text is None else text for content_hash, text in zip(hashes, texts)]
+
+def image_to_words(data):
+    """
+    Runs in a pool process. Returns (width, height, words) where each word is
+    [x0, y0, x1, y1, text, block, paragraph, line, word] in pixels.
+    """
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    result = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    words = []
+    for i, text in enumerate(result['text']):
+        text = text.strip()
+        if not text:
+            continue
+        left, top = result['left'][i], result['top'][i]
+        words.append([
+            left, top, left + result['width'][i], top + result['height'][i], text,
+            result['block_num'][i], result['par_num'][i], result['line_num'][i], result['word_num'][i],
+        ])
+    return image.width, image.height, words
+
+def ocr_pages(pages):
+    # image_to_words for every page image, on the indexing pool
+    with timed('ocr'):
+        return _map(image_to_words, pages, settings.OCR_TIMEOUT * 4, INDEX)
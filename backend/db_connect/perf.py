@@ -0,0 +1,136 @@
+"""
+Per-route query-count and latency budgets (used by the apps' tests.py).
+
+A RouteBudgetTestCase lists a request builder for every URL name of one
+urlconf. Its test grows the fixture data through each scale in PERF_SCALES,
+measures every route at each scale and then checks that:
+
+- the number of SQL queries is the same at every scale (no per-row queries),
+- it stays within the route's max_queries in perf_budgets.json,
+- with PERF_CHECK_LATENCY=1, the median latency stays within the route's
+  median_ms. Timings depend on the machine, so they are off by default.
+
+Storage and queues use the in-memory backends, so this runs offline against
+a local Postgres. PERF_SCALES=10,1000,100000 runs the large scale;
+PERF_UPDATE_BUDGETS=1 rewrites the budget file from the measurements.
+"""
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, URLPattern, URLResolver
+from pathlib import Path
+import json, os, statistics, time
+from . import backends
+
+BUDGETS_PATH = Path(__file__).with_name('perf_budgets.json')
+
+# Each route is timed this many times per scale
+REPEAT = 5
+
+# Headroom written into budgets by PERF_UPDATE_BUDGETS
+LATENCY_HEADROOM = 3.0
+
+def check_latency():
+    return os.environ.get('PERF_CHECK_LATENCY', '').lower() in ('1', 'true', 'yes')
+
+def scales():
+    return [int(scale) for scale in os.environ.get('PERF_SCALES', '10,1000').split(',')]
+
+def url_names(urlconf):
+    names = set()
+    for pattern in get_resolver(urlconf).url_patterns:
+        if isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+        elif isinstance(pattern, URLResolver):
+            names |= url_names(pattern.urlconf_name)
+    return names
+
+def load_budgets():
+    with open(BUDGETS_PATH) as f:
+        return json.load(f)
+
+def save_budgets(measured):
+    budgets = load_budgets()
+    for name, (queries, median_ms) in measured.items():
+        budgets[name] = {'max_queries': max(queries), 'median_ms': round(max(median_ms) * LATENCY_HEADROOM, 1)}
+    with open(BUDGETS_PATH, 'w') as f:
+        json.dump(dict(sorted(budgets.items())), f, indent=2)
+        f.write('\n')
+
+def drain(response):
+    # Streams the body so the measured request does all of its work; async views stream an async iterator
+    if getattr(response, 'is_async', False):
+        async def read():
+            return b''.join([chunk async for chunk in response.streaming_content])
+        return async_to_sync(read)()
+    if hasattr(response, 'streaming_content'):
+        return b''.join(response.streaming_content)
+    return response.content
+
+def call(method, path, data=None, **extra):
+    # What a route builder returns: the request to make
+    return method, path, data, extra
+
+# The label cache on the process-local default cache, so no Redis is needed
+@override_settings(STORAGE_BACKEND='memory', QUEUE_BACKEND='memory', LABEL_WRITE_BEHIND=False, LABEL_CACHE_ALIAS='default')
+class RouteBudgetTestCase(TestCase):
+    """
+    Subclasses set `urlconf`, `routes` (URL name -> method name of a builder
+    returning call(...)), `excluded` (URL name -> reason) and implement
+    grow(rows) to bring the fixture data up to `rows`.
+    """
+    urlconf = None
+    routes = {}
+    excluded = {}
+
+    def setUp(self):
+        backends.reset()
+        self.addCleanup(backends.reset)
+
+    def grow(self, rows):
+        raise NotImplementedError
+
+    def measure(self, builder):
+        queries, latencies = [], []
+        for _ in range(REPEAT):
+            method, path, data, extra = builder()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = getattr(self.client, method)(path, data, **extra)
+                latencies.append((time.perf_counter() - start) * 1000)
+            drain(response)
+            self.assertLess(response.status_code, 500, f"{method.upper()} {path}: {response.status_code}")
+            queries.append(len(captured))
+        # Setup work (e.g. the first-request cache fill) can differ; report the steady state
+        return queries[-1], statistics.median(latencies)
+
+    def test_route_budgets(self):
+        if self.urlconf is None:
+            return
+        self.assertEqual(
+            url_names(self.urlconf) - set(self.routes) - set(self.excluded), set(),
+            "Every route needs a budget (or an entry in excluded)",
+        )
+
+        measured = {name: ([], []) for name in self.routes}
+        for rows in scales():
+            self.grow(rows)
+            for name, builder in self.routes.items():
+                queries, median_ms = self.measure(getattr(self, builder))
+                measured[name][0].append(queries)
+                measured[name][1].append(median_ms)
+
+        if os.environ.get('PERF_UPDATE_BUDGETS'):
+            save_budgets(measured)
+            return
+
+        budgets = load_budgets()
+        latency = check_latency()
+        for name, (queries, median_ms) in measured.items():
+            with self.subTest(route=name):
+                self.assertEqual(len(set(queries)), 1, f"query count grows with data: {queries}")
+                self.assertIn(name, budgets, "no budget in perf_budgets.json")
+                self.assertLessEqual(max(queries), budgets[name]['max_queries'])
+                if latency:
+                    self.assertLessEqual(max(median_ms), budgets[name]['median_ms'])
@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from datetime import timedelta
+import logging, threading, json
+from .models import Annotation, PreLabelJob
+from .backends import get_queue
+
+logger = logging.getLogger(__name__)
+
+# SQS accepts at most 10 entries per SendMessageBatch call
+SQS_BATCH_SIZE = 10
+
+def pre_label_message(annotation_id, s3_file_key):
+    return json.dumps(
+        {
+            "id": str(annotation_id),
+            "s3_doc_bucket": settings.S3_DOC_BUCKET,
+            "s3_file_key": s3_file_key,
+            "s3_pre_label_bucket": settings.S3_LABELLING_BUCKET,
+            "database": settings.DATABASES["default"],
+        }
+    )
+
+def send_pre_label_batch(rows):
+    """
+    Sends up to 10 (id, s3_file_key) rows in one SendMessageBatch call and
+    returns (sent_ids, failed_ids).
+    """
+    entries = [
+        {"Id": str(index), "MessageBody": pre_label_message(annotation_id, s3_file_key)}
+        for index, (annotation_id, s3_file_key) in enumerate(rows)
+    ]
+    try:
+        response = get_queue().send_message_batch(
+            QueueUrl=settings.SQS_PRE_LABEL_QUEUE_URL, Entries=entries
+        )
+    except Exception as e:
+        logger.error(f"Error sending pre-label batch: {e}")
+        return [], [annotation_id for annotation_id, _ in rows]
+
+    failed = {int(entry["Id"]) for entry in response.get("Failed", [])}
+    sent_ids = [row[0] for index, row in enumerate(rows) if index not in failed]
+    failed_ids = [row[0] for index, row in enumerate(rows) if index in failed]
+    return sent_ids, failed_ids
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def run_pre_label_job(job_id):
+    close_old_connections()
+    job = PreLabelJob.objects.get(id=job_id)
+    workers = settings.PRE_LABEL_WORKERS
+    try:
+        annotations = Annotation.objects.filter(status="uploaded")
+        if not job.force:
+            annotations = annotations.filter(pre_label_enqueued_at=None)
+        rows = annotations.order_by().values_list("id", "s3_file_key").iterator(chunk_size=2000)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Keep a bounded window of batches in flight while the queryset streams
+            for window in _chunks(_chunks(rows, SQS_BATCH_SIZE), workers * 4):
+                sent, failed = [], []
+                for sent_ids, failed_ids in executor.map(send_pre_label_batch, window):
+                    sent.extend(sent_ids)
+                    failed.extend(failed_ids)
+                if sent:
+                    Annotation.objects.filter(id__in=sent).update(pre_label_enqueued_at=timezone.now())
+                job.enqueued += len(sent)
+                job.failed += len(failed)
+                job.heartbeat_at = timezone.now()
+                job.save(update_fields=["enqueued", "failed", "heartbeat_at"])
+
+        job.status = "completed"
+    except Exception as e:
+        logger.error(f"Error in pre-label job {job_id}: {e}")
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at"])
+        close_old_connections()
+
+def fail_if_stale(job):
+    """
+    Marks a running job failed if its worker stopped heartbeating, which
+    happens when the process running it restarts. Returns the job as stored.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.PRE_LABEL_STALE_SECONDS)
+    if job.status != "running" or job.heartbeat_at >= cutoff:
+        return job
+    PreLabelJob.objects.filter(id=job.id, status="running", heartbeat_at__lt=cutoff).update(
+        status="failed", error="Worker stopped before the job finished", finished_at=timezone.now(),
+    )
+    job.refresh_from_db()
+    return job
+
+class PreLabelJobRunning(Exception):
+    def __init__(self, job):
+        super().__init__("A pre-label job is already running")
+        self.job = job
+
+def start_pre_label_job(user, force=False):
+    """
+    Starts a job on a background thread. Raises PreLabelJobRunning while
+    another job is running; the one_running_prelabeljob constraint settles
+    concurrent starts.
+    """
+    running = PreLabelJob.objects.filter(status="running").first()
+    if running is not None and fail_if_stale(running).status == "running":
+        raise PreLabelJobRunning(running)
+
+    annotations = Annotation.objects.filter(status="uploaded")
+    if not force:
+        annotations = annotations.filter(pre_label_enqueued_at=None)
+    try:
+        with transaction.atomic():
+            job = PreLabelJob.objects.create(created_by=user, force=force, total=annotations.count())
+    except IntegrityError:
+        raise PreLabelJobRunning(PreLabelJob.objects.filter(status="running").first())
+    threading.Thread(target=run_pre_label_job, args=(job.id,), daemon=True).start()
+    return job
@@ -0,0 +1,34 @@
+# Fixed projection used by every view that lists or navigates annotations.
+# Rows come back as dicts in a single query (assignee username is joined in),
+# so serializing a page never triggers per-row lookups.
+ANNOTATION_FIELDS = (
+    "id",
+    "assigned_to_user_id",
+    "labelled_by_id",
+    "labelled_at",
+    "reviewed_by_id",
+    "reviewed_at",
+    "inserted_time",
+    "completed_time",
+    "status",
+    "s3_file_key",
+    "s3_pre_label_key",
+    "s3_label_key",
+)
+
+def annotation_values(queryset):
+    return queryset.values(*ANNOTATION_FIELDS, "assigned_to_user__username")
+
+def serialize_annotation(row):
+    data = dict(row)
+    data["assigned_to_user"] = data.pop("assigned_to_user__username")
+    return data
+
+def serialize_instance(annotation):
+    # Same shape for a model instance; the assignee must already be loaded
+    data = {field: getattr(annotation, field) for field in ANNOTATION_FIELDS}
+    data["assigned_to_user"] = annotation.assigned_to_user.username if annotation.assigned_to_user else None
+    return data
+
+def serialize_annotations(rows):
+    return [serialize_annotation(row) for row in rows]
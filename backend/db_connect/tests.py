@@ -1,3 +1,1225 @@
-from django.test import TestCase
+from datetime import timedelta
+from django.test import TestCase, SimpleTestCase, RequestFactory, override_settings
+from django.http import HttpResponse
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.utils import timezone
+from django.db import connection, transaction
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIClient
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from rest_framework_simplejwt.tokens import AccessToken
+from PIL import Image
+from .models import Annotation, AnnotationEvent, PageWordIndex, LabelRevision, PreLabelJob
+from .json_patch import apply_patch, make_patch, JsonPatchError, JsonPatchTestFailed
+from . import word_index
+from .word_index import build_grid, region_text
+from .backends import FakeS3Storage, MemoryStorage, MemoryQueue
+from botocore.exceptions import ClientError
+from .benchmark import (synthetic_label, percentile, compare, build_corpus, Recorder, Session,
+                        annotator_iteration, reviewer_iteration, admin_iteration)
+from . import async_views, backends, label_cache, label_journal, ocr, pre_label
+from .checks import label_cache_check, pymupdf_check
+from .metrics import ServerTimingMiddleware
+from .backends import get_storage
+from .label_store import record_revision
+from .utils import record_event, ist_day, id_prefix_filter
+from .transitions import submit_annotation, accept_annotation, reject_annotation, LeaseError
+from .triage_views import neighbor_rows, write_label
+from .perf import RouteBudgetTestCase, call
+from unittest import mock
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import asyncio, base64, io, json, os, random, tempfile, zipfile
+
+def encode_token(value):
+    # A cursor with arbitrary content, as a client could send
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
 
 # Create your tests here.
+class AnnotationListingQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", password="admin")
+        cls.users = [User.objects.create_user(f"labeller{i}") for i in range(5)]
+        Annotation.objects.bulk_create(
+            Annotation(status="in-labelling", assigned_to_user=cls.users[i % 5], s3_file_key=f"{i}.pdf")
+            for i in range(100)
+        )
+        # auto_now_add can hand out equal timestamps in a bulk insert; spread them out
+        now = timezone.now()
+        for i, annotation in enumerate(Annotation.objects.order_by("id")):
+            Annotation.objects.filter(id=annotation.id).update(inserted_time=now - timedelta(minutes=i))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_get_annotations_page_is_constant_queries(self):
+        # COUNT(*) for the paginator + one projected page query
+        with self.assertNumQueries(2):
+            response = self.client.get("/get_annotations/all/all/100/1/null")
+        self.assertEqual(response.status_code, 200)
+        annotations = response.json()["annotations"]
+        self.assertEqual(len(annotations), 100)
+        self.assertTrue(all(a["assigned_to_user"].startswith("labeller") for a in annotations))
+
+    def test_get_annotations_cursor_page_is_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/get_annotations/all/all/100/1/null?paginate=cursor")
+        self.assertEqual(len(response.json()["annotations"]), 100)
+
+    def test_tampered_cursor_is_rejected(self):
+        for value in (["2026-01-01T00:00:00+00:00", "not-a-uuid"], ["2026-01-01T00:00:00+00:00", 7], "cursor"):
+            token = encode_token(value)
+            with self.subTest(cursor=value):
+                response = self.client.get(f"/get_annotations/all/all/10/1/null?after={token}")
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get("/get_annotations/all/all/10/1/null?after=%%%").status_code, 400)
+
+    def test_get_next_and_prev_are_constant_queries(self):
+        ids = list(Annotation.objects.order_by("-inserted_time").values_list("id", flat=True))
+        # The current row and its neighbour come back from one UNION ALL query
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/get_next/{ids[50]}/")
+        self.assertEqual(response.json()["annotation"]["id"], str(ids[51]))
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/get_prev/{ids[50]}/")
+        self.assertEqual(response.json()["annotation"]["id"], str(ids[49]))
+
+
+class AnnotationEventTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", password="admin")
+        self.labeller = User.objects.create_user("labeller")
+        self.annotation = Annotation.objects.create(status="pre-labelled", s3_file_key="doc.pdf")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_assign_records_event(self):
+        response = self.client.post(
+            "/assign_annotation", {"id": str(self.annotation.id), "username": "labeller"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(f"/get_history/{self.annotation.id}/")
+        events = response.json()["events"]
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["action"], "assigned")
+        self.assertEqual(events[0]["actor"], "admin")
+        self.assertEqual(events[0]["assignee"], "labeller")
+        self.assertTrue(events[0]["description"].endswith("assigned to labeller by admin"))
+
+    def test_history_paging_params(self):
+        for params in ({"perPage": "ten"}, {"page": "last"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(f"/get_history/{self.annotation.id}/", params).status_code, 400)
+        self.assertEqual(self.client.get(f"/get_history/{self.annotation.id}/", {"perPage": 0}).json()["events"], [])
+
+
+class SmartAssignTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", password="admin")
+        group = Group.objects.create(name="labellers")
+        for i in range(3):
+            User.objects.create_user(f"labeller{i}").groups.add(group)
+        Annotation.objects.bulk_create(
+            Annotation(status="pre-labelled", s3_file_key=f"{i}.pdf") for i in range(10)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_round_robin_counts(self):
+        response = self.client.post(
+            "/smart_assign/", {"status": "pre-labelled", "userGroup": "labellers", "percentage": 100}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["assigned"], {"labeller0": 4, "labeller1": 3, "labeller2": 3})
+        self.assertFalse(Annotation.objects.filter(assigned_to_user=None).exists())
+        self.assertEqual(Annotation.objects.filter(status="in-labelling").count(), 10)
+        self.assertEqual(AnnotationEvent.objects.filter(action="assigned").count(), 10)
+
+    def test_batches_commit_separately(self):
+        with mock.patch("db_connect.views.SMART_ASSIGN_BATCH_SIZE", 4), \
+                mock.patch("db_connect.views.transaction.atomic", wraps=transaction.atomic) as atomic:
+            response = self.client.post(
+                "/smart_assign/", {"status": "pre-labelled", "userGroup": "labellers", "percentage": 100}, format="json"
+            )
+        # The view's own atomic() blocks; the ORM's internal ones pass arguments
+        self.assertEqual(atomic.call_args_list.count(mock.call()), 3)
+        # Round robin carries on where the previous batch stopped
+        self.assertEqual(response.json()["assigned"], {"labeller0": 4, "labeller1": 3, "labeller2": 3})
+        self.assertFalse(Annotation.objects.filter(assigned_to_user=None).exists())
+
+
+class StatusCountTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", password="admin")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_counters_follow_transitions(self):
+        annotations = [Annotation.objects.create(status="pre-labelled", s3_file_key=f"{i}.pdf") for i in range(3)]
+        Annotation.objects.filter(id=annotations[0].id).update(status="in-labelling", assigned_to_user=self.admin)
+        annotations[1].delete()
+
+        response = self.client.get("/get_annotations_count/")
+        self.assertEqual(response.json()["total"], 2)
+        self.assertEqual(response.json()["inprogress"]["pre-labelled"], 1)
+        self.assertEqual(response.json()["inprogress"]["in-labelling"], 1)
+
+        response = self.client.get("/get_smart_assign_data/")
+        self.assertEqual(response.json()["status"], {"in-labelling": "0/1", "pre-labelled": "1/1"})
+
+
+class JsonPatchTests(SimpleTestCase):
+    def test_operations(self):
+        document = {"boxes": [{"text": "a"}, {"text": "b"}], "meta": {"page": 1}}
+        patched = apply_patch(document, [
+            {"op": "add", "path": "/boxes/-", "value": {"text": "c"}},
+            {"op": "replace", "path": "/boxes/0/text", "value": "z"},
+            {"op": "remove", "path": "/boxes/1"},
+            {"op": "move", "from": "/meta/page", "path": "/page"},
+            {"op": "copy", "from": "/page", "path": "/meta/first"},
+            {"op": "test", "path": "/page", "value": 1},
+        ])
+        self.assertEqual(patched, {"boxes": [{"text": "z"}, {"text": "c"}], "meta": {"first": 1}, "page": 1})
+        # The input is never modified
+        self.assertEqual(document["boxes"][0]["text"], "a")
+
+    def test_errors(self):
+        with self.assertRaises(JsonPatchTestFailed):
+            apply_patch({"a": 1}, [{"op": "test", "path": "/a", "value": 2}])
+        with self.assertRaises(JsonPatchError):
+            apply_patch({"a": []}, [{"op": "remove", "path": "/a/0"}])
+        with self.assertRaises(JsonPatchError):
+            apply_patch({"a": 1}, [{"op": "replace", "path": "/a"}])
+
+    def test_make_patch_round_trips(self):
+        source = {"boxes": [{"text": "a"}, {"text": "b"}], "a/b": 1, "gone": True}
+        target = {"boxes": [{"text": "a"}, {"text": "c"}], "a/b": 2, "new": [1, 2]}
+        self.assertEqual(apply_patch(source, make_patch(source, target)), target)
+        self.assertEqual(make_patch(source, source), [])
+
+
+class WordIndexTests(TestCase):
+    def test_region_text_reads_words_in_rectangle(self):
+        annotation = Annotation.objects.create(status="pre-labelled", s3_file_key="doc.pdf")
+        words = [
+            [0.10, 0.10, 0.20, 0.12, "Invoice", 1, 1, 1, 1],
+            [0.22, 0.10, 0.30, 0.12, "No", 1, 1, 1, 2],
+            [0.10, 0.14, 0.25, 0.16, "12345", 1, 1, 2, 1],
+            [0.70, 0.80, 0.90, 0.82, "Total", 2, 1, 1, 1],
+        ]
+        PageWordIndex.objects.create(annotation=annotation, page=1, words=words, grid=build_grid(words))
+
+        self.assertEqual(region_text(annotation.id, 1, 0.05, 0.05, 0.35, 0.20), "Invoice No\n12345")
+        self.assertEqual(region_text(annotation.id, 1, 0.6, 0.7, 1.0, 1.0), "Total")
+        self.assertEqual(region_text(annotation.id, 1, 0.4, 0.4, 0.5, 0.5), "")
+        self.assertIsNone(region_text(annotation.id, 2, 0, 0, 1, 1))
+
+    def test_cached_pages_expire(self):
+        annotation = Annotation.objects.create(status="pre-labelled", s3_file_key="doc.pdf")
+        words = [[0.1, 0.1, 0.2, 0.12, "Old", 1, 1, 1, 1]]
+        PageWordIndex.objects.create(annotation=annotation, page=1, words=words, grid=build_grid(words))
+        self.assertEqual(region_text(annotation.id, 1, 0, 0, 1, 1), "Old")
+
+        # A rebuild in another process does not clear this process's cache, but the entry runs out
+        words = [[0.1, 0.1, 0.2, 0.12, "New", 1, 1, 1, 1]]
+        PageWordIndex.objects.filter(annotation=annotation).update(words=words)
+        self.assertEqual(region_text(annotation.id, 1, 0, 0, 1, 1), "Old")
+        later = word_index.time.monotonic() + settings.WORD_INDEX_CACHE_SECONDS
+        with mock.patch.object(word_index.time, "monotonic", return_value=later):
+            self.assertEqual(region_text(annotation.id, 1, 0, 0, 1, 1), "New")
+
+    def test_missing_pymupdf_is_reported(self):
+        with mock.patch.object(word_index, "fitz", None):
+            self.assertEqual([error.id for error in pymupdf_check(None)], ["db_connect.W001"])
+
+@override_settings(STORAGE_BACKEND="memory", QUEUE_BACKEND="memory")
+class DocumentRedirectTests(TestCase):
+    def test_redirect_only_for_true_values(self):
+        backends.reset()
+        self.addCleanup(backends.reset)
+        annotation = Annotation.objects.create(status="in-labelling", s3_file_key="doc.pdf", s3_pdf_key="doc.pdf")
+        get_storage().put_object(Bucket=settings.S3_DOC_BUCKET, Key="doc.pdf", Body=b"%PDF-1.4")
+        client = APIClient()
+        presigned = "https://docs.example.com/doc.pdf?X-Amz-Signature=abc"
+        with mock.patch("db_connect.triage_views.presigned_document_url", return_value=presigned):
+            for value, status in (("1", 302), ("True", 302), ("0", 200), ("false", 200), ("", 200)):
+                with self.subTest(redirect=value):
+                    response = client.get(f"/get_document/{annotation.id}", {"redirect": value})
+                    self.assertEqual(response.status_code, status)
+
+        # The memory backend presigns memory:// URLs, which cannot be redirected to; stream instead
+        response = client.get(f"/get_document/{annotation.id}", {"redirect": "1"})
+        self.assertEqual(response.status_code, 200)
+
+class IdSearchTests(TestCase):
+    def test_prefix_search(self):
+        annotations = [Annotation.objects.create(status="uploaded", s3_file_key=f"{i}.pdf") for i in range(20)]
+        target = str(annotations[0].id)
+        expected = {str(a.id) for a in annotations if str(a.id).startswith(target[:2])}
+
+        found = Annotation.objects.filter(id_prefix_filter(target[:2])).values_list("id", flat=True)
+        self.assertEqual({str(i) for i in found}, expected)
+        self.assertEqual(list(Annotation.objects.filter(id_prefix_filter(target[:13].upper()))), [annotations[0]])
+        self.assertIsNone(id_prefix_filter("not-a-uuid"))
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser("admin", password="admin"))
+        response = client.get("/search_annotations/", {"q": target[:9], "limit": 5}).json()
+        self.assertEqual([row["id"] for row in response["annotations"]], [target])
+        # A limit below one still returns the first match rather than failing
+        response = client.get("/search_annotations/", {"q": target[:9], "limit": -3})
+        self.assertEqual([row["id"] for row in response.json()["annotations"]], [target])
+
+class NeighborTests(TestCase):
+    def test_window_in_listing_order(self):
+        labeller = User.objects.create_user("labeller")
+        annotations = [
+            Annotation.objects.create(status="in-labelling", s3_file_key=f"{i}.pdf", assigned_to_user=labeller)
+            for i in range(7)
+        ]
+        Annotation.objects.create(status="in-labelling", s3_file_key="other.pdf")
+        # Ties on inserted_time are broken by id
+        Annotation.objects.filter(id__in=[a.id for a in annotations[2:5]]).update(inserted_time=annotations[3].inserted_time)
+        listing = list(
+            Annotation.objects.filter(assigned_to_user=labeller).order_by("-inserted_time", "-id").values_list("id", flat=True)
+        )
+        current = listing[3]
+
+        with self.assertNumQueries(1):
+            row, next_rows, prev_rows = neighbor_rows(labeller, current, 2, 5)
+        self.assertEqual(row["id"], current)
+        self.assertEqual([r["id"] for r in next_rows], listing[4:6])
+        self.assertEqual([r["id"] for r in prev_rows], listing[2::-1])
+
+        client = APIClient()
+        client.force_authenticate(labeller)
+        response = client.get(f"/get_next/{listing[-1]}/").json()
+        self.assertEqual(response["message"], "No more documents to label")
+        self.assertEqual(client.get(f"/get_prev/{current}/").json()["annotation"]["id"], str(listing[2]))
+        self.assertEqual(client.get("/get_neighbors/not-a-uuid/").status_code, 404)
+
+@override_settings(STORAGE_BACKEND="memory", QUEUE_BACKEND="memory", LABEL_WRITE_BEHIND=False)
+class ClaimNextTests(TestCase):
+    def setUp(self):
+        backends.reset()
+        self.addCleanup(backends.reset)
+        self.labellers = [User.objects.create_user(f"labeller{i}") for i in range(2)]
+        Group.objects.create(name="labellers").user_set.add(*self.labellers)
+        self.queue = [Annotation.objects.create(status="pre-labelled", s3_file_key=f"{i}.pdf") for i in range(3)]
+
+    def claim(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client, client.post("/claim_next/").json()
+
+    def test_claims_lease_oldest_first(self):
+        first, second = self.labellers
+        client, response = self.claim(first)
+        self.assertEqual(response["annotation"]["id"], str(self.queue[0].id))
+        self.assertEqual(response["annotation"]["status"], "in-labelling")
+        # A live lease is handed back rather than a second document
+        self.assertEqual(self.claim(first)[1]["annotation"]["id"], str(self.queue[0].id))
+        self.assertEqual(self.claim(second)[1]["annotation"]["id"], str(self.queue[1].id))
+
+        self.assertEqual(client.post(f"/claim_heartbeat/{self.queue[0].id}/").status_code, 200)
+        self.assertEqual(client.post(f"/claim_heartbeat/{self.queue[1].id}/").status_code, 409)
+
+        # An expired lease goes back to the front of the queue
+        Annotation.objects.filter(id=self.queue[0].id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.claim(second)[1]["annotation"]["id"], str(self.queue[1].id))
+        third = User.objects.create_user("labeller2")
+        Group.objects.get(name="labellers").user_set.add(third)
+        self.assertEqual(self.claim(third)[1]["annotation"]["id"], str(self.queue[0].id))
+        self.assertEqual(client.post(f"/claim_heartbeat/{self.queue[0].id}/").status_code, 409)
+
+        submit_annotation(self.queue[0].id, third)
+        self.assertIsNone(Annotation.objects.get(id=self.queue[0].id).lease_expires_at)
+
+    def test_role_checks(self):
+        self.assertEqual(self.claim(User.objects.create_user("outsider"))[1]["status"], "error")
+        client = APIClient()
+        client.force_authenticate(self.labellers[0])
+        self.assertEqual(client.post("/claim_next/", {"role": "reviewer"}, format="json").status_code, 403)
+
+        # Reviewers pull from in-review; superusers may claim for either role
+        reviewer = User.objects.create_user("reviewer")
+        Group.objects.create(name="reviewers").user_set.add(reviewer)
+        self.assertEqual(self.claim(reviewer)[1]["message"], "No documents to claim")
+        Annotation.objects.filter(id=self.queue[2].id).update(status="in-review")
+        self.assertEqual(self.claim(reviewer)[1]["annotation"]["id"], str(self.queue[2].id))
+        admin = User.objects.create_superuser("admin")
+        self.assertEqual(self.claim(admin)[1]["annotation"]["id"], str(self.queue[0].id))
+
+    def expire(self, annotation):
+        Annotation.objects.filter(id=annotation.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_manual_reassignment_ends_the_lease(self):
+        first, second = self.labellers
+        self.claim(first)
+        admin = APIClient()
+        admin.force_authenticate(User.objects.create_superuser("admin"))
+        admin.post("/assign_annotation", {"id": str(self.queue[0].id), "username": second.username}, format="json")
+        self.assertIsNone(Annotation.objects.get(id=self.queue[0].id).lease_expires_at)
+
+        # No lease left to expire, so the next claim does not take it back from the new assignee
+        third = User.objects.create_user("labeller2")
+        Group.objects.get(name="labellers").user_set.add(third)
+        self.assertEqual(self.claim(third)[1]["annotation"]["id"], str(self.queue[1].id))
+        self.assertEqual(Annotation.objects.get(id=self.queue[0].id).assigned_to_user, second)
+
+    def test_writes_after_the_lease_was_reclaimed(self):
+        first, second = self.labellers
+        stale, _ = self.claim(first)
+        self.expire(self.queue[0])
+        fresh, response = self.claim(second)
+        self.assertEqual(response["annotation"]["id"], str(self.queue[0].id))
+
+        label = json.dumps({"InvoiceNumber": {"text": "1"}})
+        for path in (f"/save/in-labelling/{self.queue[0].id}/", f"/submit/in-labelling/{self.queue[0].id}/"):
+            response = stale.post(path, label, content_type="application/json")
+            self.assertEqual(response.status_code, 409)
+        with self.assertRaises(LeaseError):
+            submit_annotation(self.queue[0].id, first)
+
+        response = fresh.post(f"/submit/in-labelling/{self.queue[0].id}/", label, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Annotation.objects.get(id=self.queue[0].id).labelled_by, second)
+
+class DailyStatsTests(TestCase):
+    def test_transitions_update_rollups(self):
+        labeller = User.objects.create_user("labeller")
+        reviewer = User.objects.create_user("reviewer")
+        Group.objects.create(name="reviewers").user_set.add(reviewer)
+        first = Annotation.objects.create(status="in-labelling", s3_file_key="1.pdf", assigned_to_user=labeller)
+        second = Annotation.objects.create(status="in-labelling", s3_file_key="2.pdf", assigned_to_user=labeller)
+        submit_annotation(first.id, labeller)
+        submit_annotation(second.id, labeller)
+        accept_annotation(first.id, reviewer)
+        reject_annotation(second.id, reviewer)
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser("admin", password="admin"))
+        today = ist_day().isoformat()
+        response = client.get("/dashboard_stats/", {"username": "all", "start_date": today, "end_date": today}).json()
+        users = {row["username"]: row for row in response["users"]}
+        self.assertEqual(users["labeller"]["labelled"], 2)
+        self.assertEqual((users["reviewer"]["reviewed"], users["reviewer"]["accepted"], users["reviewer"]["rejected"]), (2, 1, 1))
+        self.assertEqual(response["totals"]["reviewed"], 2)
+        self.assertEqual(response["daily"][0]["day"], today)
+
+        response = client.get("/dashboard_view/", {
+            "username": "labeller", "perPage": 1,
+            "start_date": (ist_day() - timedelta(days=1)).isoformat(), "end_date": (ist_day() + timedelta(days=1)).isoformat(),
+        }).json()
+        self.assertEqual((response["total_labelled"], response["pages_labelled"]), (2, 2))
+        self.assertEqual(len(response["labelled_files"]), 1)
+        self.assertFalse(response["is_last_page_labelled"])
+
+        # A rejected document labelled again is one more transition in the rollups,
+        # but the dashboard lists documents, and its totals count what it lists
+        submit_annotation(second.id, labeller)
+        stats = client.get("/dashboard_stats/", {"username": "labeller", "start_date": today, "end_date": today}).json()
+        self.assertEqual(stats["totals"]["labelled"], 3)
+        response = client.get("/dashboard_view/", {
+            "username": "labeller", "perPage": 10,
+            "start_date": (ist_day() - timedelta(days=1)).isoformat(), "end_date": (ist_day() + timedelta(days=1)).isoformat(),
+        }).json()
+        self.assertEqual(response["total_labelled"], len(response["labelled_files"]))
+        self.assertEqual(response["total_labelled"], 2)
+        self.assertTrue(response["is_last_page_labelled"])
+
+    def test_invalid_dates(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser("admin", password="admin"))
+        for path in ("/dashboard_stats/", "/dashboard_view/"):
+            response = client.get(path, {"start_date": "2024-02-30", "end_date": "2024-03-01"})
+            self.assertEqual(response.status_code, 400)
+
+class MemoryBackendTests(SimpleTestCase):
+    def setUp(self):
+        self.storage = MemoryStorage()
+        self.etag = self.storage.put_object(Bucket="docs", Key="a.pdf", Body=b"0123456789")["ETag"]
+
+    def test_range_and_conditional_get(self):
+        response = self.storage.get_object(Bucket="docs", Key="a.pdf", Range="bytes=2-4")
+        self.assertEqual(response["Body"].read(), b"234")
+        self.assertEqual(response["ContentRange"], "bytes 2-4/10")
+        with self.assertRaises(ClientError) as error:
+            self.storage.get_object(Bucket="docs", Key="a.pdf", IfNoneMatch=self.etag)
+        self.assertEqual(error.exception.response["Error"]["Code"], "304")
+        with self.assertRaises(ClientError) as error:
+            self.storage.get_object(Bucket="docs", Key="a.pdf", Range="bytes=20-")
+        self.assertEqual(error.exception.response["Error"]["Code"], "InvalidRange")
+
+    def test_put_if_match(self):
+        self.storage.put_object(Bucket="docs", Key="a.pdf", Body=b"new", IfMatch=self.etag)
+        with self.assertRaises(ClientError) as error:
+            self.storage.put_object(Bucket="docs", Key="a.pdf", Body=b"newer", IfMatch=self.etag)
+        self.assertEqual(error.exception.response["Error"]["Code"], "PreconditionFailed")
+
+    def test_fake_s3_storage_is_abstract(self):
+        with self.assertRaises(TypeError):
+            FakeS3Storage()
+
+    def test_queue_batch(self):
+        queue = MemoryQueue()
+        response = queue.send_message_batch(QueueUrl="q", Entries=[{"Id": "0", "MessageBody": "a"}, {"Id": "1", "MessageBody": "b"}])
+        self.assertEqual([entry["Id"] for entry in response["Successful"]], ["0", "1"])
+        self.assertEqual(len(queue.receive_message(QueueUrl="q", MaxNumberOfMessages=10)["Messages"]), 2)
+
+class BenchmarkHelperTests(SimpleTestCase):
+    def test_synthetic_label_size(self):
+        label = synthetic_label(20000, random.Random(0))
+        self.assertGreaterEqual(len(json.dumps(label)), 20000)
+        self.assertIn("location", label["Table"][0]["Amount"])
+
+    def test_percentile_and_compare(self):
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+        baseline = {"endpoints": {"get json": {"p95_ms": 10.0, "max_queries": 1}}}
+        report = {"endpoints": {"get json": {"p95_ms": 11.0, "max_queries": 2}}}
+        self.assertEqual(compare(report, baseline, 0.2), ["get json: queries 1 -> 2"])
+
+@override_settings(STORAGE_BACKEND="memory", QUEUE_BACKEND="memory", LABEL_WRITE_BEHIND=False)
+class BenchmarkWorkloadTests(TestCase):
+    def setUp(self):
+        backends.reset()
+        self.addCleanup(backends.reset)
+
+    def test_one_iteration_of_each_workload(self):
+        admin = build_corpus(60, 2, 2, 2000, 20)
+        labeller = User.objects.get(username="bench-labeller-0")
+        reviewer = User.objects.get(username="bench-reviewer-0")
+        recorder = Recorder()
+        rng = random.Random(0)
+        annotator_iteration(Session(labeller, recorder, rng), 2000)
+        reviewer_iteration(Session(reviewer, recorder, rng), 2000)
+        admin_iteration(Session(admin, recorder, rng), 2000, [labeller.username, reviewer.username])
+
+        endpoints = recorder.report(1.0)["endpoints"]
+        self.assertTrue({"get annotations", "get json", "dashboard_view", "dashboard_stats"} <= set(endpoints))
+        self.assertEqual({name: e["errors"] for name, e in endpoints.items() if e["errors"]}, {})
+
+class InlineExecutor:
+    def submit(self, fn, *args):
+        fn(*args)
+
+@override_settings(STORAGE_BACKEND="memory", QUEUE_BACKEND="memory")
+class UploadDerivativeTests(TestCase):
+    def setUp(self):
+        backends.reset()
+        self.addCleanup(backends.reset)
+
+    @mock.patch("db_connect.documents.schedule_word_index")
+    def test_derivative_built_after_the_request(self, schedule_word_index):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser("admin", password="admin"))
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = client.post("/upload_document/", {"document": SimpleUploadedFile("doc.png", png_bytes(), "image/png")})
+        self.assertEqual(response.status_code, 200)
+        annotation = Annotation.objects.get()
+        self.assertIsNone(annotation.s3_pdf_key)
+
+        # The worker's connection handling would end the test transaction
+        with mock.patch("db_connect.documents._get_builder", return_value=InlineExecutor()), \
+                mock.patch("db_connect.documents.close_old_connections"):
+            for callback in callbacks:
+                callback()
+        annotation.refresh_from_db()
+        self.assertEqual((annotation.s3_pdf_key, annotation.page_count), (f"derivatives/{annotation.id}.pdf", 1))
+        schedule_word_index.assert_called_once_with(annotation.id)
+
+    def test_storage_and_queue_calls_run_outside_the_transaction(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser("admin", password="admin"))
+        storage, queue = get_storage()._client, backends.get_queue()._client
+        upload_fileobj = storage.upload_fileobj
+        depth, seen = len(connection.atomic_blocks), []
+
+        def upload(*args):
+            seen.append(len(connection.atomic_blocks))
+            return upload_fileobj(*args)
+
+        def send(**kwargs):
+            seen.append(len(connection.atomic_blocks))
+            raise RuntimeError("queue unavailable")
+
+        with mock.patch.object(storage, "upload_fileobj", side_effect=upload), \
+                mock.patch.object(queue, "send_message", side_effect=send):
+            response = client.post("/upload_document/", {"document": SimpleUploadedFile("doc.png", png_bytes(), "image/png")})
+        self.assertEqual(seen, [depth, depth])
+
+        # The document is kept; the next pre-label job enqueues it
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()["pre_label_enqueued"])
+        self.assertIsNone(Annotation.objects.get().pre_label_enqueued_at)
+
+class FakePool:
+    # Runs submissions inline; a broken one fails like a pool whose worker died
+    def __init__(self, broken):
+        self.broken = broken
+        self.shut_down = False
+
+    def submit(self, fn, item):
+        if self.broken:
+            raise BrokenProcessPool()
+        future = Future()
+        future.set_result(fn(item))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+class OcrTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(ocr, _pools={}, _results=OrderedDict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_broken_pool_is_replaced(self):
+        pools = [FakePool(broken=True), FakePool(broken=False)]
+        with mock.patch.object(ocr, "ProcessPoolExecutor", side_effect=pools):
+            self.assertEqual(ocr._map(len, [b"ab", b"abc"], 1), [2, 3])
+        self.assertTrue(pools[0].shut_down)
+        self.assertIs(ocr._pools[ocr.INTERACTIVE], pools[1])
+
+    def test_page_ocr_has_its_own_pool(self):
+        pools = [FakePool(False), FakePool(False)]
+        with mock.patch.object(ocr, "ProcessPoolExecutor", side_effect=pools), \
+                mock.patch.object(ocr, "image_to_words", side_effect=len), \
+                mock.patch.object(ocr, "image_to_text", side_effect=len):
+            self.assertEqual(ocr.ocr_pages([b"ab"]), [2])
+            self.assertEqual(ocr.ocr_images([b"abc"]), [3])
+        self.assertEqual([ocr._pools[ocr.INDEX], ocr._pools[ocr.INTERACTIVE]], pools)
+
+    def test_pool_broken_twice_raises(self):
+        with mock.patch.object(ocr, "ProcessPoolExecutor", side_effect=[FakePool(True), FakePool(True)]):
+            with self.assertRaises(BrokenProcessPool):
+                ocr._map(len, [b"ab"], 1)
+
+    def test_identical_crops_recognised_once_and_cached(self):
+        with mock.patch.object(ocr, "ProcessPoolExecutor", return_value=FakePool(False)), \
+                mock.patch.object(ocr, "image_to_text", side_effect=lambda data: data.decode()) as image_to_text:
+            self.assertEqual(ocr.ocr_images([b"a", b"b", b"a"]), ["a", "b", "a"])
+            self.assertEqual(ocr.ocr_images([b"b"]), ["b"])
+        self.assertEqual(image_to_text.call_count, 2)
+
+@override_settings(STORAGE_BACKEND="memory", QUEUE_BACKEND="memory")
+class DirectUploadTests(TestCase):
+    def setUp(self):
+        backends.reset()
+        self.addCleanup(backends.reset)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser("admin"))
+
+    def create(self):
+        response = self.client.post("/create_upload/", {"filename": "Scan.PNG"}, format="json").json()
+        self.assertEqual(response["upload"]["fields"]["key"], response["file_path"])
+        return response["id"], response["file_path"]
+
+    def test_create_and_complete(self):
+        id, key = self.create()
+        self.assertTrue(key.endswith(".png"))
+        self.assertEqual(Annotation.objects.get(id=id).status, "pending")
+        # Not a document until completed
+        self.assertEqual(self.client.get("/get_annotations/all/all/20/1/null").json()["annotations"], [])
+        self.assertEqual(self.client.get("/search_annotations/", {"q": id[:4]}).json()["annotations"], [])
+
+        self.assertEqual(self.client.post(f"/complete_upload/{id}/").status_code, 400)
+        get_storage().put_object(Bucket=settings.S3_DOC_BUCKET, Key=key, Body=png_bytes())
+        self.assertEqual(self.client.post(f"/complete_upload/{id}/").status_code, 200)
+        self.assertEqual(Annotation.objects.get(id=id).status, "uploaded")
+        self.assertEqual(self.client.post(f"/complete_upload/{id}/").status_code, 409)
+        self.assertEqual(len(self.client.get("/get_annotations/all/all/20/1/null").json()["annotations"]), 1)
+
+    def test_unknown_ids(self):
+        self.assertEqual(self.client.post("/complete_upload/not-a-uuid/").status_code, 404)
+        self.assertEqual(self.client.post("/complete_upload/00000000-0000-0000-0000-000000000000/").status_code, 404)
+
+    def test_cleanup_abandoned_uploads(self):
+        abandoned, key = self.create()
+        recent, _ = self.create()
+        get_storage().put_object(Bucket=settings.S3_DOC_BUCKET, Key=key, Body=png_bytes())
+        Annotation.objects.filter(id=abandoned).update(
+            inserted_time=timezone.now() - timedelta(seconds=settings.PRESIGNED_UPLOAD_EXPIRY + 3601),
+        )
+
+        call_command("cleanup_uploads", stdout=io.StringIO())
+        self.assertEqual([str(id) for id in Annotation.objects.values_list("id", flat=True)], [recent])
+        with self.assertRaises(ClientError):
+            get_storage().head_object(Bucket=settings.S3_DOC_BUCKET, Key=key)
+
+def zip_bytes(members):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    archive.seek(0)
+    archive.name = "batch.zip"
+    return archive
+
+@override_settings(STORAGE_BACKEND="memory", QUEUE_BACKEND="memory")
+@mock.patch("db_connect.views.schedule_word_index")
+class BulkUploadTests(TestCase):
+    def setUp(self):
+        backends.reset()
+        self.addCleanup(backends.reset)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser("admin"))
+
+    def upload(self, members):
+        return self.client.post("/bulk_upload_documents/", {"archive": zip_bytes(members)})
+
+    def test_member_directories_stay_out_of_the_key(self, schedule_word_index):
+        response = self.upload({"scans.v2/page": png_bytes(), "scans/Page.PNG": png_bytes()})
+        self.assertEqual(response.status_code, 200)
+        keys = sorted(entry["file_path"] for entry in response.json()["files"])
+        self.assertEqual(sorted(Annotation.objects.values_list("s3_file_key", flat=True)), keys)
+        self.assertTrue(all("/" not in key for key in keys))
+        self.assertEqual(sorted(os.path.splitext(key)[1] for key in keys), ["", ".png"])
+
+    @override_settings(BULK_UPLOAD_MAX_FILES=2)
+    def test_too_many_members_rejected(self, schedule_word_index):
+        response = self.upload({f"doc{i}.png": png_bytes() for i in range(3)})
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Annotation.objects.exists())
+
+    @override_settings(BULK_UPLOAD_MAX_BYTES=1000)
+    def test_uncompressed_size_limit_checked_before_reading(self, schedule_word_index):
+        # Compresses to almost nothing; the declared size is what counts
+        archive = zip_bytes({"blank.png": bytes(10_000)})
+        with mock.patch("zipfile.ZipFile.open") as open_member:
+            response = self.client.post("/bulk_upload_documents/", {"archive": archive})
+        self.assertEqual(response.status_code, 413)
+        open_member.assert_not_called()
+        self.assertFalse(Annotation.objects.exists())
+
+    @override_settings(MAX_UPLOAD_SIZE=1000)
+    def test_member_size_limit(self, schedule_word_index):
+        response = self.upload({"small.png": b"x", "large.png": bytes(10_000)})
+        self.assertEqual(response.status_code, 413)
+        self.assertIn("large.png", response.json()["message"])
+
+@override_settings(STORAGE_BACKEND="memory", QUEUE_BACKEND="memory")
+class PreLabelJobTests(TestCase):
+    def setUp(self):
+        backends.reset()
+        self.addCleanup(backends.reset)
+        self.admin = User.objects.create_superuser("admin")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        for i in range(12):
+            Annotation.objects.create(status="uploaded", s3_file_key=f"{i}.pdf")
+
+    def test_dispatch(self):
+        with mock.patch.object(pre_label.threading, "Thread") as thread:
+            response = self.client.post("/pre_label/", {}, format="json").json()
+        self.assertEqual(response["total"], 12)
+        thread.return_value.start.assert_called_once()
+
+        # Run the job here rather than on its thread, inside the test transaction
+        with mock.patch.object(pre_label, "close_old_connections"):
+            pre_label.run_pre_label_job(response["job_id"])
+        job = PreLabelJob.objects.get(id=response["job_id"])
+        self.assertEqual((job.status, job.enqueued, job.failed), ("completed", 12, 0))
+        self.assertFalse(Annotation.objects.filter(pre_label_enqueued_at=None).exists())
+        messages = backends.get_queue().receive_message(QueueUrl=settings.SQS_PRE_LABEL_QUEUE_URL, MaxNumberOfMessages=20)
+        self.assertEqual(len(messages["Messages"]), 12)
+
+        # Already enqueued documents are skipped unless forced
+        self.assertEqual(self.client.post("/pre_label/", {}, format="json").json()["total"], 0)
+
+    def test_refused_while_a_job_is_running(self):
+        running = PreLabelJob.objects.create(created_by=self.admin, total=12)
+        response = self.client.post("/pre_label/", {}, format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["job_id"], str(running.id))
+
+        # The constraint holds even when the check is raced
+        with mock.patch.object(pre_label, "fail_if_stale", side_effect=lambda job: PreLabelJob(status="failed")), \
+                mock.patch.object(pre_label.threading, "Thread") as thread:
+            with self.assertRaises(pre_label.PreLabelJobRunning):
+                pre_label.start_pre_label_job(self.admin)
+        thread.assert_not_called()
+
+        # A running job that lost its worker does not block a new one
+        PreLabelJob.objects.filter(id=running.id).update(
+            heartbeat_at=timezone.now() - timedelta(seconds=settings.PRE_LABEL_STALE_SECONDS + 1),
+        )
+        with mock.patch.object(pre_label.threading, "Thread"):
+            response = self.client.post("/pre_label/", {}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PreLabelJob.objects.get(id=running.id).status, "failed")
+
+    def test_status(self):
+        self.assertEqual(self.client.get("/pre_label_status/not-a-uuid/").status_code, 404)
+
+        job = PreLabelJob.objects.create(created_by=self.admin, total=12)
+        self.assertEqual(self.client.get(f"/pre_label_status/{job.id}/").json()["job_status"], "running")
+
+        # A job whose worker stopped checking in, e.g. after a restart, is reported as failed
+        PreLabelJob.objects.filter(id=job.id).update(
+            heartbeat_at=timezone.now() - timedelta(seconds=settings.PRE_LABEL_STALE_SECONDS + 1),
+        )
+        response = self.client.get(f"/pre_label_status/{job.id}/").json()
+        self.assertEqual(response["job_status"], "failed")
+        self.assertIsNotNone(response["finished_at"])
+
+@override_settings(STORAGE_BACKEND="memory", QUEUE_BACKEND="memory", LABEL_WRITE_BEHIND=False)
+class RevisionTests(TestCase):
+    def setUp(self):
+        backends.reset()
+        self.addCleanup(backends.reset)
+        self.labeller = User.objects.create_user("labeller")
+        self.annotation = Annotation.objects.create(status="in-labelling", s3_file_key="doc.png", assigned_to_user=self.labeller)
+        self.key = f"{self.annotation.id}.json"
+        self.revision = record_revision(settings.S3_LABELLING_BUCKET, self.key, b'{"a": 1}', self.labeller.id)
+        self.client = APIClient()
+        self.client.force_authenticate(self.labeller)
+
+    def test_diff_from_errors(self):
+        path = f"/get_revision/{self.annotation.id}/{self.revision.id}/"
+        self.assertEqual(self.client.get(path, {"diff_from": "latest"}).status_code, 400)
+        self.assertEqual(self.client.get(path, {"diff_from": self.revision.id + 1}).status_code, 404)
+        self.assertEqual(self.client.get(path, {"diff_from": self.revision.id}).json()["patch"], [])
+
+    def test_autosave_records_no_revision(self):
+        self.client.post(f"/save/in-labelling/{self.annotation.id}/", '{"a": 2}', content_type="application/json")
+        self.assertEqual(LabelRevision.objects.filter(annotation_id=self.annotation.id).count(), 1)
+
+    def test_restore_needs_the_lease(self):
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user("other"))
+        Annotation.objects.filter(id=self.annotation.id).update(lease_expires_at=timezone.now() + timedelta(minutes=5))
+        path = f"/restore_revision/{self.annotation.id}/{self.revision.id}/"
+        self.assertEqual(other.post(path).status_code, 409)
+        self.assertEqual(self.client.post(path).status_code, 200)
+
+class LabelJournalTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(
+            STORAGE_BACKEND="memory", LABEL_WRITE_BEHIND=True, LABEL_JOURNAL_DIR=self.directory,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        backends.reset()
+        self.addCleanup(backends.reset)
+        # Flush explicitly instead of from the background thread
+        patcher = mock.patch.object(label_journal, "_ensure_flusher")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.author = User.objects.create_user("labeller")
+
+    def stored(self, key):
+        return get_storage().get_object(Bucket="labels", Key=key)["Body"].read()
+
+    def test_saves_coalesce_and_flush(self):
+        label_journal.write("labels", "a.json", b'{"v": 1}', self.author.id)
+        label_journal.write("labels", "a.json", b'{"v": 2}', self.author.id)
+        self.assertEqual(label_journal.read("labels", "a.json"), b'{"v": 2}')
+
+        label_journal.flush_all()
+        self.assertEqual(self.stored("a.json"), b'{"v": 2}')
+        self.assertIsNone(label_journal.read("labels", "a.json"))
+        # Neither the pending file nor its lock file is left behind
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_revisions_match_direct_writes(self):
+        # Autosaves are not history on either path; transitions are
+        key = f"{Annotation.objects.create(status='in-labelling', s3_file_key='doc.pdf').id}.json"
+        for write_behind in (True, False):
+            with self.subTest(write_behind=write_behind), override_settings(LABEL_WRITE_BEHIND=write_behind):
+                LabelRevision.objects.all().delete()
+                client = APIClient()
+                client.force_authenticate(self.author)
+                client.post(f"/save/in-labelling/{key[:-5]}/", '{"v": 1}', content_type="application/json")
+                label_journal.flush_all()
+                self.assertEqual(LabelRevision.objects.count(), 0)
+
+                write_label(settings.S3_LABELLING_BUCKET, key, '{"v": 2}', self.author)
+                self.assertEqual(LabelRevision.objects.count(), 1)
+
+    def test_failed_flush_stays_pending(self):
+        label_journal.write("labels", "a.json", b'{"v": 1}', self.author.id)
+        with mock.patch.object(MemoryStorage, "put_object", side_effect=ClientError({"Error": {"Code": "500"}}, "PutObject")):
+            self.assertFalse(label_journal.flush("labels", "a.json"))
+        self.assertEqual(label_journal.read("labels", "a.json"), b'{"v": 1}')
+        self.assertTrue(label_journal.flush("labels", "a.json"))
+        self.assertEqual(self.stored("a.json"), b'{"v": 1}')
+
+    def test_claim_left_by_a_crash_is_replayed(self):
+        label_journal.write("labels", "a.json", b'{"v": 1}', self.author.id)
+        path = label_journal._path("labels", "a.json")
+        os.rename(path, f"{path}.flushing-99999")
+        # A crashed flush is still newer than storage
+        self.assertEqual(label_journal.read("labels", "a.json"), b'{"v": 1}')
+
+        label_journal._recover()
+        label_journal.flush_all()
+        self.assertEqual(self.stored("a.json"), b'{"v": 1}')
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_lock_file_removed_on_release(self):
+        path = label_journal._path("labels", "a.json")
+        with label_journal._key_lock(path):
+            self.assertTrue(os.path.exists(f"{path}.lock"))
+        self.assertFalse(os.path.exists(f"{path}.lock"))
+
+@override_settings(LABEL_CACHE_ALIAS="default")
+class LabelCacheTests(TestCase):
+    def test_invalidation_blocks_stale_fill(self):
+        label_cache.put("labels", "a.json", '"1"', b"one")
+        self.assertEqual(label_cache.get("labels", "a.json"), ('"1"', b"one"))
+        label_cache.invalidate("labels", "a.json")
+        # A read that fetched the old version before the write must not repopulate it
+        label_cache.put("labels", "a.json", '"1"', b"one")
+        self.assertIsNone(label_cache.get("labels", "a.json"))
+
+    def test_unreachable_cache_is_a_miss(self):
+        shared = mock.Mock(**{"get.side_effect": ConnectionError, "add.side_effect": ConnectionError})
+        with mock.patch.object(label_cache, "_shared", return_value=shared):
+            label_cache.put("labels", "a.json", '"1"', b"one")
+            self.assertIsNone(label_cache.get("labels", "a.json"))
+
+    @override_settings(DEBUG=False, LABEL_CACHE_ALIAS=None)
+    def test_per_process_cache_refused_outside_debug(self):
+        self.assertEqual([error.id for error in label_cache_check(None)], ["db_connect.E001"])
+
+class ServerTimingTests(TestCase):
+    def test_header_and_metrics(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser("admin", password="admin"))
+        response = client.get("/get_annotations_count/")
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertIn("total;dur=", response["Server-Timing"])
+
+        self.assertEqual(client.get("/metrics/").status_code, 403)
+        with override_settings(METRICS_TOKEN="scrape"):
+            self.assertEqual(client.get("/metrics/", HTTP_AUTHORIZATION="Bearer wrong").status_code, 401)
+            metrics = client.get("/metrics/", HTTP_AUTHORIZATION="Bearer scrape").content.decode()
+        self.assertIn('taggo_request_duration_seconds_count{view="get_annotations_count",method="GET",status="200"}', metrics)
+        self.assertIn('taggo_request_section_seconds_bucket{view="get_annotations_count",section="db",le="+Inf"}', metrics)
+
+    def test_async_requests_stay_async(self):
+        async def view(request):
+            return HttpResponse("ok")
+
+        middleware = ServerTimingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get("/unknown/"))
+        self.assertIn("total;dur=", response["Server-Timing"])
+
+@override_settings(STORAGE_BACKEND="s3")
+class AsyncClientTests(SimpleTestCase):
+    def setUp(self):
+        self.session = mock.MagicMock()
+        self.session.create_client.return_value.__aenter__ = mock.AsyncMock(side_effect=lambda: mock.AsyncMock())
+        self.session.create_client.return_value.__aexit__ = mock.AsyncMock(return_value=False)
+        patcher = mock.patch.multiple(async_views, get_session=mock.Mock(return_value=self.session),
+                                      AioConfig=mock.DEFAULT, _clients={}, _shared=False, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_request_client_closed_with_the_request(self):
+        async def run():
+            async with async_views.request_client():
+                return await async_views._s3() is await async_views._s3()
+
+        # Each async_to_sync call outside a running loop gets its own loop, as under WSGI
+        for _ in range(3):
+            self.assertTrue(async_to_sync(run)())
+        self.assertEqual(self.session.create_client.return_value.__aexit__.await_count, 3)
+        self.assertEqual(async_views._clients, {})
+        with self.assertRaises(RuntimeError):
+            async_to_sync(async_views._s3)()
+
+    def test_shared_client_kept_on_the_loop(self):
+        async def run():
+            async with async_views.request_client():
+                return await async_views._s3() is await async_views._s3()
+
+        async_views.share_clients()
+        self.assertTrue(async_to_sync(run)())
+        self.assertEqual(len(async_views._clients), 1)
+        self.session.create_client.return_value.__aexit__.assert_not_awaited()
+
+    def test_close_clients_closes_running_loop_client(self):
+        async def run():
+            with mock.patch.object(async_views, "_clients", {asyncio.get_running_loop(): client}):
+                await async_views.close_clients()
+                return len(async_views._clients)
+
+        client = mock.AsyncMock()
+        self.assertEqual(async_to_sync(run)(), 0)
+        client.close.assert_awaited_once()
+
+def png_bytes():
+    image = io.BytesIO()
+    Image.new("RGB", (40, 20), "white").save(image, format="PNG")
+    return image.getvalue()
+
+@override_settings(METRICS_TOKEN="scrape")
+class RouteBudgetTests(RouteBudgetTestCase):
+    urlconf = "db_connect.urls"
+    routes = {
+        "get annotations": "route_get_annotations",
+        "search annotations": "route_search_annotations",
+        "get document": "route_get_document",
+        "upload document": "route_upload_document",
+        "bulk upload documents": "route_bulk_upload_documents",
+        "create upload": "route_create_upload",
+        "complete upload": "route_complete_upload",
+        "get json": "route_get_json",
+        "assign annotation": "route_assign_annotation",
+        "save json": "route_save",
+        "accept annotation": "route_accept",
+        "submit annotation": "route_submit",
+        "reject annotation": "route_reject",
+        "get region text": "route_get_region_text",
+        "get next": "route_get_next",
+        "get prev": "route_get_prev",
+        "get neighbors": "route_get_neighbors",
+        "claim next": "route_claim_next",
+        "claim heartbeat": "route_claim_heartbeat",
+        "get history": "route_get_history",
+        "get revisions": "route_get_revisions",
+        "get revision": "route_get_revision",
+        "restore revision": "route_restore_revision",
+        "smart assign": "route_smart_assign",
+        "get_user_groups": "route_get_smart_assign_data",
+        "get_annotations_count": "route_get_annotations_count",
+        "get_groups_with_users": "route_get_groups_with_users",
+        "dashboard_view": "route_dashboard_view",
+        "dashboard_stats": "route_dashboard_stats",
+        "pre_label_status": "route_pre_label_status",
+        "metrics": "route_metrics",
+        "async get document": "route_async_get_document",
+        "async get json": "route_async_get_json",
+        "async save json": "route_async_save",
+        "async submit annotation": "route_async_submit",
+        "async accept annotation": "route_async_accept",
+        "async reject annotation": "route_async_reject",
+    }
+    excluded = {
+        "get ocr text": "runs tesseract, not the database",
+        "get ocr text batch": "runs tesseract, not the database",
+        "pre_label": "starts a background job outside the test transaction",
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser("admin", password="admin")
+        self.labeller = User.objects.create_user("labeller")
+        self.reviewer = User.objects.create_user("reviewer")
+        Group.objects.create(name="labellers").user_set.add(self.labeller)
+        Group.objects.create(name="reviewers").user_set.add(self.reviewer)
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {AccessToken.for_user(self.admin)}"
+        self.png = png_bytes()
+        self.saves = 0
+        # accept hands a fifth of documents to a superuser at random; keep the query count deterministic
+        patcher = mock.patch("db_connect.transitions.random")
+        patcher.start().random.return_value = 1.0
+        self.addCleanup(patcher.stop)
+
+    def grow(self, rows):
+        # Every status, assigned the way the workflow leaves them
+        statuses = ["uploaded", "pre-labelled", "in-labelling", "in-review", "accepted", "completed"]
+        existing = Annotation.objects.count()
+        now = timezone.now()
+        annotations = []
+        for i in range(existing, rows):
+            status = statuses[i % len(statuses)]
+            annotation = Annotation(status=status, s3_file_key=f"{i}.pdf")
+            if status == "in-labelling":
+                annotation.assigned_to_user = self.labeller
+            elif status in ("in-review", "accepted", "completed"):
+                annotation.assigned_to_user = self.reviewer
+                annotation.labelled_by, annotation.labelled_at = self.labeller, now - timedelta(minutes=i)
+            if status in ("accepted", "completed"):
+                annotation.reviewed_by, annotation.reviewed_at = self.reviewer, now - timedelta(minutes=i)
+            annotations.append(annotation)
+        Annotation.objects.bulk_create(annotations, batch_size=5000)
+        AnnotationEvent.objects.bulk_create(
+            (AnnotationEvent(annotation=annotation, action="uploaded") for annotation in annotations),
+            batch_size=5000,
+        )
+
+    def label(self):
+        # Distinct content per save so every write records a new revision
+        self.saves += 1
+        return json.dumps({"InvoiceNumber": {"text": str(self.saves), "location": {"pageNo": 1, "ltwh": [0, 0, 1, 1, 1]}}})
+
+    def fresh(self, status, assignee=None, **fields):
+        annotation = Annotation.objects.create(status=status, s3_file_key="doc.png", assigned_to_user=assignee, **fields)
+        get_storage().put_object(Bucket=settings.S3_LABELLING_BUCKET, Key=f"{annotation.id}.json", Body=self.label())
+        return annotation
+
+    def post_json(self, path, data):
+        return call("post", path, data if isinstance(data, str) else json.dumps(data), content_type="application/json")
+
+    def route_get_annotations(self):
+        return call("get", "/get_annotations/all/all/20/1/null")
+
+    def route_search_annotations(self):
+        return call("get", "/search_annotations/", {"q": str(Annotation.objects.order_by("?").first().id)[:4]})
+
+    def route_get_document(self):
+        annotation = self.fresh("in-labelling", self.labeller)
+        annotation.s3_pdf_key = f"derivatives/{annotation.id}.pdf"
+        annotation.save(update_fields=["s3_pdf_key"])
+        get_storage().put_object(Bucket=settings.S3_DOC_BUCKET, Key=annotation.s3_pdf_key, Body=b"%PDF-1.4")
+        return call("get", f"/get_document/{annotation.id}")
+
+    def route_upload_document(self):
+        return call("post", "/upload_document/", {"document": SimpleUploadedFile("doc.png", self.png, "image/png")})
+
+    def route_bulk_upload_documents(self):
+        documents = [SimpleUploadedFile(f"doc{i}.png", self.png, "image/png") for i in range(2)]
+        return call("post", "/bulk_upload_documents/", {"documents": documents})
+
+    def route_create_upload(self):
+        return self.post_json("/create_upload/", {"filename": "doc.pdf"})
+
+    def route_complete_upload(self):
+        annotation = Annotation(status="pending")
+        annotation.s3_file_key = f"{annotation.id}.png"
+        annotation.save()
+        get_storage().put_object(Bucket=settings.S3_DOC_BUCKET, Key=annotation.s3_file_key, Body=self.png)
+        return call("post", f"/complete_upload/{annotation.id}/")
+
+    def route_get_json(self):
+        return call("get", f"/get_json/in-labelling/{self.fresh('in-labelling', self.labeller).id}/")
+
+    def route_assign_annotation(self):
+        annotation = self.fresh("pre-labelled")
+        return self.post_json("/assign_annotation", {"id": str(annotation.id), "username": "labeller"})
+
+    def route_save(self):
+        return self.post_json(f"/save/in-labelling/{self.fresh('in-labelling', self.labeller).id}/", self.label())
+
+    def route_accept(self):
+        return self.post_json(f"/accept/in-review/{self.fresh('in-review', self.reviewer).id}/", self.label())
+
+    def route_submit(self):
+        return self.post_json(f"/submit/in-labelling/{self.fresh('in-labelling', self.labeller).id}/", self.label())
+
+    def route_reject(self):
+        annotation = self.fresh("in-review", self.reviewer, labelled_by=self.labeller)
+        return self.post_json(f"/reject/in-review/{annotation.id}/", self.label())
+
+    def route_get_region_text(self):
+        annotation = self.fresh("in-labelling", self.labeller)
+        words = [[0.1, 0.1, 0.2, 0.12, "Invoice", 1, 1, 1, 1]]
+        PageWordIndex.objects.create(annotation=annotation, page=1, words=words, grid=build_grid(words))
+        return call("get", f"/get_region_text/{annotation.id}/?page=1&x0=0&y0=0&x1=1&y1=1")
+
+    def route_get_next(self):
+        annotation = Annotation.objects.filter(status="in-labelling").order_by("inserted_time").first()
+        return call("get", f"/get_next/{annotation.id}/")
+
+    def route_get_prev(self):
+        annotation = Annotation.objects.filter(status="in-labelling").order_by("-inserted_time").first()
+        return call("get", f"/get_prev/{annotation.id}/")
+
+    def route_get_neighbors(self):
+        annotation = Annotation.objects.filter(status="in-labelling").order_by("-inserted_time").first()
+        return call("get", f"/get_neighbors/{annotation.id}/", {"k": 5})
+
+    def route_claim_next(self):
+        # A new labeller each time, so no live lease short-circuits the claim
+        user = User.objects.create_user(f"claimer{User.objects.count()}")
+        Group.objects.get(name="labellers").user_set.add(user)
+        self.fresh("pre-labelled")
+        return call("post", "/claim_next/", HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+
+    def route_claim_heartbeat(self):
+        annotation = self.fresh("in-labelling", self.labeller, lease_expires_at=timezone.now() + timedelta(minutes=5))
+        return call(
+            "post", f"/claim_heartbeat/{annotation.id}/",
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.labeller)}",
+        )
+
+    def route_get_history(self):
+        annotation = self.fresh("in-labelling", self.labeller)
+        for action in ("uploaded", "assigned", "labelled"):
+            record_event(annotation, action, actor=self.admin)
+        return call("get", f"/get_history/{annotation.id}/")
+
+    def revised(self):
+        annotation = self.fresh("in-labelling", self.labeller)
+        key = f"{annotation.id}.json"
+        first = record_revision(settings.S3_LABELLING_BUCKET, key, self.label().encode(), self.labeller.id)
+        record_revision(settings.S3_LABELLING_BUCKET, key, self.label().encode(), self.labeller.id)
+        return annotation, first
+
+    def route_get_revisions(self):
+        annotation, _ = self.revised()
+        return call("get", f"/get_revisions/{annotation.id}/")
+
+    def route_get_revision(self):
+        annotation, revision = self.revised()
+        return call("get", f"/get_revision/{annotation.id}/{revision.id}/")
+
+    def route_restore_revision(self):
+        annotation, revision = self.revised()
+        return call("post", f"/restore_revision/{annotation.id}/{revision.id}/")
+
+    def route_smart_assign(self):
+        # Only rows made here match, so every call assigns the same amount whatever the scale
+        for _ in range(3):
+            Annotation.objects.create(status="accepted", s3_file_key="doc.png")
+        return self.post_json("/smart_assign/", {"status": "accepted", "userGroup": "labellers", "percentage": 100})
+
+    def route_get_smart_assign_data(self):
+        return call("get", "/get_smart_assign_data/")
+
+    def route_get_annotations_count(self):
+        return call("get", "/get_annotations_count/")
+
+    def route_get_groups_with_users(self):
+        return call("get", "/get_groups_with_users/")
+
+    def route_dashboard_view(self):
+        end = timezone.now()
+        start = end - timedelta(days=30)
+        return call("get", "/dashboard_view/", {"username": "labeller", "start_date": start.isoformat(), "end_date": end.isoformat()})
+
+    def route_dashboard_stats(self):
+        end = timezone.now()
+        start = end - timedelta(days=30)
+        return call("get", "/dashboard_stats/", {"username": "all", "start_date": start.isoformat(), "end_date": end.isoformat()})
+
+    def route_pre_label_status(self):
+        job = PreLabelJob.objects.create(created_by=self.admin, total=10)
+        return call("get", f"/pre_label_status/{job.id}/")
+
+    def route_metrics(self):
+        return call("get", "/metrics/", HTTP_AUTHORIZATION="Bearer scrape")
+
+    def route_async_get_document(self):
+        _, path, _, _ = self.route_get_document()
+        return call("get", "/async" + path)
+
+    def route_async_get_json(self):
+        return call("get", f"/async/get_json/in-labelling/{self.fresh('in-labelling', self.labeller).id}/")
+
+    def route_async_save(self):
+        return self.post_json(f"/async/save/in-labelling/{self.fresh('in-labelling', self.labeller).id}/", self.label())
+
+    def route_async_submit(self):
+        return self.post_json(f"/async/submit/in-labelling/{self.fresh('in-labelling', self.labeller).id}/", self.label())
+
+    def route_async_accept(self):
+        return self.post_json(f"/async/accept/in-review/{self.fresh('in-review', self.reviewer).id}/", self.label())
+
+    def route_async_reject(self):
+        annotation = self.fresh("in-review", self.reviewer, labelled_by=self.labeller)
+        return self.post_json(f"/async/reject/in-review/{annotation.id}/", self.label())
@@ -0,0 +1,153 @@
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
+import random
+from .models import Annotation
+from .utils import record_event, record_daily_stats
+
+# Status transitions triggered from the triage screen. Shared by the DRF views
+# in triage_views.py and the async views in async_views.py.
+
+class TransitionError(Exception):
+    pass
+
+class LeaseError(TransitionError):
+    pass
+
+def check_lease(id, user):
+    # A claimed annotation only takes writes from the user holding the claim
+    if Annotation.objects.filter(id=id, lease_expires_at__isnull=False).exclude(assigned_to_user=user).exists():
+        raise LeaseError('Annotation is claimed by another user')
+
+def _lock(id, user):
+    # Row lock for a transition, so a concurrent claim or reassignment waits for it
+    annotation = Annotation.objects.select_for_update().get(id=id)
+    if annotation.lease_expires_at is not None and annotation.assigned_to_user_id != user.id:
+        raise LeaseError('Annotation is claimed by another user')
+    return annotation
+
+def submit_annotation(id, user):
+    with transaction.atomic():
+        annotation = _lock(id, user)
+        from_status = annotation.status
+        annotation.labelled_by = user
+        annotation.status = 'in-review'
+        annotation.lease_expires_at = None
+        if not settings.ASSIGN_REVIEWER_ON_SUBMIT:
+            # Left for a reviewer to claim_next
+            annotation.assigned_to_user = None
+        else:
+            reviewers = User.objects.filter(groups__name='reviewers')
+            if reviewers.exists():
+                annotation.assigned_to_user = reviewers.order_by('?').first()
+        annotation.save()
+        record_event(annotation, 'labelled', actor=user, from_status=from_status,
+                     assignee=annotation.assigned_to_user, message=f'labelled by {user.username}')
+        record_daily_stats(user.id, labelled=1)
+    return annotation
+
+def reject_annotation(id, user):
+    with transaction.atomic():
+        annotation = _lock(id, user)
+        from_status = annotation.status
+
+        if annotation.reviewed_by:
+            annotation.status = 'in-review'
+            annotation.assigned_to_user = annotation.reviewed_by
+        elif annotation.labelled_by:
+            annotation.status = 'in-labelling'
+            annotation.assigned_to_user = annotation.labelled_by
+            annotation.reviewed_by = user
+        else:
+            raise TransitionError('Cannot reject!')
+        annotation.lease_expires_at = None
+
+        annotation.save()
+        record_event(annotation, 'rejected', actor=user, from_status=from_status,
+                     assignee=annotation.assigned_to_user,
+                     message=f'rejected by {user.username}, assigned to {annotation.assigned_to_user.username}')
+        record_daily_stats(user.id, reviewed=1, rejected=1)
+    return annotation
+
+def accept_annotation(id, user):
+    with transaction.atomic():
+        annotation = _lock(id, user)
+        from_status = annotation.status
+        annotation.status = 'accepted'
+        message = f'accepted by {user.username}'
+
+        annotation.reviewed_by = user
+        annotation.lease_expires_at = None
+
+        if random.random() < 0.2:
+            superusers = User.objects.filter(is_superuser=True)
+            if superusers.exists():
+                annotation.assigned_to_user = superusers.order_by('?').first()
+            else:
+                annotation.assigned_to_user = None
+            message += f', assigned to {annotation.assigned_to_user}'
+        annotation.save()
+        record_event(annotation, 'accepted', actor=user, from_status=from_status,
+                     assignee=annotation.assigned_to_user, message=message)
+        record_daily_stats(user.id, reviewed=1, accepted=1)
+    return annotation
+
+# claim_next roles: role -> (group, status of the queue, status of a claimed annotation)
+CLAIM_ROLES = {
+    'labeller': ('labellers', 'pre-labelled', 'in-labelling'),
+    'reviewer': ('reviewers', 'in-review', 'in-review'),
+}
+
+def claim_roles(user):
+    if user.is_superuser:
+        return list(CLAIM_ROLES)
+    groups = set(user.groups.values_list('name', flat=True))
+    return [role for role, (group, _, _) in CLAIM_ROLES.items() if group in groups]
+
+def claim_next(user, role):
+    """
+    Leases the oldest annotation waiting for `role` to `user` and returns it,
+    or None when there is nothing to claim. Annotations whose lease ran out go
+    first, then unassigned ones. Candidates are locked with FOR UPDATE SKIP
+    LOCKED, so concurrent claims take different rows without waiting on each
+    other. A user who still holds a live lease gets that annotation back.
+    """
+    _, queue_status, claimed_status = CLAIM_ROLES[role]
+    now = timezone.now()
+    with transaction.atomic():
+        held = (
+            Annotation.objects.select_related('assigned_to_user')
+            .filter(assigned_to_user=user, status=claimed_status, lease_expires_at__gt=now)
+            .order_by('inserted_time', 'id')
+            .first()
+        )
+        if held:
+            return held
+
+        for candidates in (
+            Annotation.objects.filter(status=claimed_status, lease_expires_at__lte=now),
+            Annotation.objects.filter(status=queue_status, assigned_to_user=None),
+        ):
+            annotation = candidates.order_by('inserted_time', 'id').select_for_update(skip_locked=True).first()
+            if annotation:
+                break
+        else:
+            return None
+
+        from_status = annotation.status
+        annotation.status = claimed_status
+        annotation.assigned_to_user = user
+        annotation.lease_expires_at = now + timedelta(seconds=settings.CLAIM_LEASE_SECONDS)
+        annotation.save(update_fields=['status', 'assigned_to_user', 'lease_expires_at'])
+        record_event(annotation, 'assigned', actor=user, from_status=from_status, assignee=user,
+                     message=f'claimed by {user.username}')
+    return annotation
+
+def extend_lease(id, user):
+    # Single UPDATE; returns the new expiry, or None if the lease is gone (expired, reclaimed or finished)
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.CLAIM_LEASE_SECONDS)
+    updated = Annotation.objects.filter(id=id, assigned_to_user=user, lease_expires_at__gt=now).update(lease_expires_at=expires_at)
+    return expires_at if updated else None
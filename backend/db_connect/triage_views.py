@@ -1,45 +1,162 @@
-from .models import Annotation
-from django.http import JsonResponse, HttpResponse, Http404
+from .models import Annotation, AnnotationEvent, LabelRevision
+from django.http import (
+    JsonResponse, HttpResponse, Http404, StreamingHttpResponse,
+    HttpResponseNotModified, HttpResponseRedirect,
+)
+from django.utils.http import http_date, parse_http_date_safe
+from datetime import datetime, timezone as dt_timezone
+from botocore.exceptions import ClientError
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
-import logging, boto3, json, io, random
-from PIL import Image
+import logging, json
 from django.contrib.auth.models import User
-import pytesseract
-from .utils import get_current_time_ist
+from django.core.paginator import Paginator
+from django.core.exceptions import ValidationError, DisallowedRedirect
+from django.db.models import CharField, Q, Subquery, Value
+from .utils import format_event
+from .transitions import (submit_annotation, reject_annotation, accept_annotation, TransitionError, LeaseError, check_lease,
+                          claim_roles, claim_next as claim_next_annotation, extend_lease)
+from .serializers import annotation_values, serialize_annotation, serialize_instance
+from .documents import build_derivative
+from . import label_cache, label_journal
+from .ocr import ocr_images
+from .word_index import region_text
+from .label_store import safe_record_revision, read_revision
+from .backends import get_storage
+from .json_patch import apply_patch, make_patch, JsonPatchError, JsonPatchTestFailed
 
 logger = logging.getLogger(__name__)
 
-# Upload file to S3
-s3 = boto3.client('s3')
-    
+# Size of each chunk streamed from S3 to the client
+DOCUMENT_CHUNK_SIZE = 64 * 1024
+
+def document_get_params(request, s3_file_key):
+    # get_object parameters for a document request, with conditional and Range headers passed through
+    params = {'Bucket': settings.S3_DOC_BUCKET, 'Key': s3_file_key}
+    if request.headers.get('If-None-Match'):
+        params['IfNoneMatch'] = request.headers['If-None-Match']
+    elif request.headers.get('If-Modified-Since'):
+        modified_since = parse_http_date_safe(request.headers['If-Modified-Since'])
+        if modified_since:
+            params['IfModifiedSince'] = datetime.fromtimestamp(modified_since, tz=dt_timezone.utc)
+    if request.headers.get('Range'):
+        params['Range'] = request.headers['Range']
+    return params
+
+def document_error_response(request, error):
+    # 304/416 for S3 errors that are really conditional/Range outcomes, else None
+    if error.response['Error']['Code'] in ('304', 'NotModified'):
+        response = HttpResponseNotModified()
+        response['ETag'] = request.headers.get('If-None-Match', '')
+        return response
+    if error.response['Error']['Code'] in ('416', 'InvalidRange'):
+        return HttpResponse(status=416)
+    return None
+
+def document_response(id, s3_response, chunks):
+    # Stream the object instead of buffering it in the worker
+    response = StreamingHttpResponse(
+        chunks,
+        content_type='application/pdf',
+        status=206 if 'ContentRange' in s3_response else 200,
+    )
+    response['Content-Length'] = s3_response['ContentLength']
+    response['Accept-Ranges'] = 'bytes'
+    if 'ContentRange' in s3_response:
+        response['Content-Range'] = s3_response['ContentRange']
+
+    # Set headers for PDF content
+    response['ETag'] = s3_response['ETag']
+    response['Last-Modified'] = http_date(s3_response['LastModified'].timestamp())
+    response['Cache-Control'] = 'private, max-age=3600'
+    response['Content-Disposition'] = f'attachment; filename="{id}.pdf"'
+    return response
+
+# ?redirect= values that ask get_document for a presigned URL; anything else streams
+REDIRECT_TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+
+def wants_redirect(request):
+    return request.GET.get('redirect', '').lower() in REDIRECT_TRUE_VALUES
+
+def document_redirect(s3_file_key):
+    """
+    Redirect to a presigned URL for the document, or None when the storage
+    backend presigns a scheme browsers cannot follow (the offline backends
+    hand out memory:// and file:// URLs); the caller streams it instead.
+    """
+    try:
+        return HttpResponseRedirect(presigned_document_url(s3_file_key))
+    except DisallowedRedirect:
+        return None
+
+def presigned_document_url(s3_file_key):
+    return get_storage().generate_presigned_url(
+        'get_object',
+        Params={'Bucket': settings.S3_DOC_BUCKET, 'Key': s3_file_key,
+                'ResponseContentType': 'application/pdf'},
+        ExpiresIn=300,
+    )
+
 @api_view(['GET'])
 # @permission_classes([IsAuthenticated])
 def get_document(request, id: str):
     try:
-        s3_file_key = Annotation.objects.values("s3_file_key").get(id=id)['s3_file_key']
-        
+        document = Annotation.objects.values("s3_file_key", "s3_pdf_key").get(id=id)
+        # Serve the pre-built PDF; documents ingested before derivatives existed get one built now
+        s3_file_key = document['s3_pdf_key'] or build_derivative(id, document['s3_file_key'])
+
+        redirect = document_redirect(s3_file_key) if wants_redirect(request) else None
+        if redirect is not None:
+            return redirect
+
         # Retrieve file content from S3
-        s3_response = s3.get_object(Bucket=settings.S3_DOC_BUCKET, Key=s3_file_key)
-        file_content = s3_response['Body'].read()
-
-        if not s3_file_key.endswith('.pdf'):
-            img = Image.open(io.BytesIO(file_content))
-            pdf_bytes = io.BytesIO()
-            img.save(pdf_bytes, format='PDF')
-            pdf_bytes.seek(0)
-            file_content = pdf_bytes.read()
-
-        # Set headers for PDF content
-        response = HttpResponse(file_content, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{id}.pdf"'
-        return response
+        try:
+            s3_response = get_storage().get_object(**document_get_params(request, s3_file_key))
+        except ClientError as e:
+            response = document_error_response(request, e)
+            if response is None:
+                raise
+            return response
+
+        return document_response(id, s3_response, s3_response['Body'].iter_chunks(chunk_size=DOCUMENT_CHUNK_SIZE))
 
     except Exception as e:
         logger.error(f"Error retrieving document: {e}")
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
+def write_label(bucket, s3_file_key, json_data, author):
+    """
+    Synchronous label write for state transitions. Goes through the journal
+    when write-behind is on, so it is ordered after any buffered autosave of
+    the same label and S3 holds it before the status changes.
+    """
+    if label_journal.enabled():
+        label_journal.write(bucket, s3_file_key, json_data.encode('utf-8'), author.id)
+        if not label_journal.flush(bucket, s3_file_key):
+            raise Exception("Could not write label to storage")
+    else:
+        get_storage().put_object(Bucket=bucket, Key=s3_file_key, Body=json_data)
+    # Transitions are the only label writes kept as revisions, journal or not
+    safe_record_revision(bucket, s3_file_key, json_data.encode('utf-8'), author.id)
+    label_cache.invalidate(bucket, s3_file_key)
+
+def label_bucket(status):
+    if status in ['pre-labelled', 'in-labelling', 'in-review', 'accepted']:
+        return settings.S3_LABELLING_BUCKET
+    if status in ['done', 'completed']:
+        return settings.S3_LABEL_BUCKET
+    return None
+
+def label_response(etag, body, if_none_match):
+    if etag == if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 @api_view(['GET'])    
 @permission_classes([IsAuthenticated])
 def get_json(request, status: str, id: str):
@@ -51,32 +168,86 @@ def get_json(request, status: str, id: str):
 
             status = status_in_db
         
-        elif status in ['pre-labelled', 'in-labelling', 'in-review', 'accepted']:
-            bucket = settings.S3_LABELLING_BUCKET
-
-        elif status == 'done':
-            bucket = settings.S3_LABEL_BUCKET
-
-        else:
+        bucket = label_bucket(status)
+        if bucket is None:
             return JsonResponse({'status': 'error', 'message': 'Invalid status'}, status=400)
 
         s3_file_key = f"{id}.json"
-        s3_response = s3.get_object(Bucket=bucket, Key=s3_file_key)
-        json_content = s3_response['Body'].read().decode('utf-8')
-        data = json.loads(json_content)
+        if_none_match = request.headers.get('If-None-Match')
+
+        pending = label_journal.read(bucket, s3_file_key) if label_journal.enabled() else None
+        if pending is not None:
+            # Saved but not yet flushed to S3
+            return JsonResponse({'status': 'success', 'data': json.loads(pending)}, safe=False)
+
+        cached = label_cache.get(bucket, s3_file_key)
+        if cached is None:
+            s3_response = get_storage().get_object(Bucket=bucket, Key=s3_file_key)
+            etag = s3_response['ETag']
+            if etag == if_none_match:
+                body = None
+            else:
+                json_content = s3_response['Body'].read().decode('utf-8')
+                data = json.loads(json_content)
+                body = JsonResponse({'status': 'success', 'data': data}, safe=False).content
+                label_cache.put(bucket, s3_file_key, etag, body)
+        else:
+            etag, body = cached
 
-        return JsonResponse({'status': 'success', 'data': data}, safe=False)
+        return label_response(etag, body, if_none_match)
 
     except Exception as e:
         logger.error(f"Error retrieving JSON document: {e}")
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
-@api_view(['POST'])
+def _patch_label(request, bucket, s3_file_key):
+    """
+    Applies the JSON Patch in the request body to the stored label and writes
+    it back only if the stored version is still the one the patch was made
+    against (If-Match, defaulting to the version just read).
+    """
+    try:
+        patch = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid JSON Patch body'}, status=400)
+    base_etag = request.headers.get('If-Match')
+
+    # Patches apply to what is in S3, so a buffered full save must land first
+    if label_journal.enabled() and not label_journal.flush(bucket, s3_file_key):
+        raise Exception("Could not flush buffered label")
+
+    cached = label_cache.get(bucket, s3_file_key)
+    if cached is not None and (base_etag is None or cached[0] == base_etag):
+        etag, document = cached[0], json.loads(cached[1])['data']
+    else:
+        s3_response = get_storage().get_object(Bucket=bucket, Key=s3_file_key)
+        etag = s3_response['ETag']
+        document = json.loads(s3_response['Body'].read())
+
+    if base_etag is not None and base_etag != etag:
+        return JsonResponse({'status': 'error', 'message': 'Label has changed, reload and retry'}, status=412)
+
+    try:
+        document = apply_patch(document, patch)
+    except JsonPatchTestFailed as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=409)
+    except JsonPatchError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    body = json.dumps(document).encode('utf-8')
+    try:
+        put_response = get_storage().put_object(Bucket=bucket, Key=s3_file_key, Body=body, IfMatch=etag)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('412', 'PreconditionFailed', 'ConditionalRequestConflict'):
+            label_cache.invalidate(bucket, s3_file_key)
+            return JsonResponse({'status': 'error', 'message': 'Label has changed, reload and retry'}, status=412)
+        raise
+    return put_response['ETag']
+
+@api_view(['POST', 'PATCH'])
 @permission_classes([IsAuthenticated])
 def save(request , status: str, id: str):
     try:
-        json_data = request.body.decode('utf-8')
-
         if status in ['pre-labelling','in-labelling', 'in-review', 'accepted']:
             bucket = settings.S3_LABELLING_BUCKET
         elif status == 'completed':
@@ -84,12 +255,31 @@ def save(request , status: str, id: str):
         else:
             return JsonResponse({'status': 'error', 'message': 'Invalid status'}, status=400)
 
+        check_lease(id, request.user)
         s3_file_key = f"{id}.json"
 
-        s3.put_object(Bucket=bucket, Key=s3_file_key, Body=json_data)
+        if request.method == 'PATCH':
+            etag = _patch_label(request, bucket, s3_file_key)
+            if isinstance(etag, HttpResponse):
+                return etag
+        else:
+            json_data = request.body.decode('utf-8')
+            if label_journal.enabled():
+                # Acknowledged once journalled; the flusher uploads it
+                label_journal.write(bucket, s3_file_key, request.body, request.user.id)
+                etag = None
+            else:
+                # No revision here: autosaves are recorded when flushed or at the next transition
+                etag = get_storage().put_object(Bucket=bucket, Key=s3_file_key, Body=json_data)['ETag']
+        label_cache.invalidate(bucket, s3_file_key)
 
-        return JsonResponse({'status': 'success', 'message': f'{status} JSON data saved successfully'}, safe=False)
+        response = JsonResponse({'status': 'success', 'message': f'{status} JSON data saved successfully', 'etag': etag}, safe=False)
+        if etag:
+            response['ETag'] = etag
+        return response
 
+    except LeaseError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=409)
     except Exception as e:
         logger.error(f"Error saving JSON data: {e}")
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
@@ -107,20 +297,15 @@ def submit(request , status: str, id: str):
 
         s3_file_key = f"{id}.json"
 
-        s3.put_object(Bucket=bucket, Key=s3_file_key, Body=json_data)
+        check_lease(id, request.user)
+        write_label(bucket, s3_file_key, json_data, request.user)
 
-        annotation = Annotation.objects.get(id=id)
-        annotation.labelled_by = request.user
-        annotation.status = 'in-review'
-        reviewers = User.objects.filter(groups__name='reviewers')
-        if reviewers.exists():
-            annotation.assigned_to_user = reviewers.order_by('?').first()
-        ist_time = get_current_time_ist()
-        annotation.history.append(f'{ist_time}: labelled by {request.user.username}')
-        annotation.save()
+        submit_annotation(id, request.user)
 
         return JsonResponse({'status': 'success', 'message': f'{status} JSON data saved successfully'}, safe=False)
 
+    except LeaseError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=409)
     except Exception as e:
         logger.error(f"Error saving JSON data: {e}")
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500) 
@@ -132,18 +317,8 @@ def get_ocr_text(request):
         if request.method == 'POST' and 'file' in request.FILES:
             uploaded_file = request.FILES['file']
 
-            # Use Pillow to open the uploaded image file
-            image = Image.open(uploaded_file)
-
-            # Convert RGBA to RGB
-            rgb_image = image.convert("RGB")
-
-            # Save as JPEG
-            rgb_image.save("ocr_crop.jpeg")
-            # Apply OCR using pytesseract
-            text = pytesseract.image_to_string(image)
-
-            text = text.strip()
+            # Decoded and recognised in memory on the OCR pool
+            text = ocr_images([uploaded_file.read()])[0]
 
             # Return the extracted text as JSON response
             return JsonResponse({'text': text})
@@ -153,6 +328,44 @@ def get_ocr_text(request):
         logger.error(f"Error processing OCR: {e}")
         return JsonResponse({'error': str(e)}, status=500)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def get_ocr_text_batch(request):
+    try:
+        files = request.FILES.getlist('files')
+        if not files:
+            return JsonResponse({'error': 'POST method and file data required'}, status=400)
+        if len(files) > settings.OCR_MAX_BATCH:
+            return JsonResponse({'error': f'At most {settings.OCR_MAX_BATCH} files per batch'}, status=400)
+
+        texts = ocr_images([uploaded_file.read() for uploaded_file in files])
+        return JsonResponse({'texts': texts})
+
+    except Exception as e:
+        logger.error(f"Error processing batch OCR: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_region_text(request, id: str):
+    # Text inside a page rectangle from the precomputed word index.
+    # Coordinates are fractions of the page width/height (0..1).
+    try:
+        page = int(request.GET['page'])
+        x0, y0, x1, y1 = (float(request.GET[name]) for name in ('x0', 'y0', 'x1', 'y1'))
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'page, x0, y0, x1 and y1 are required'}, status=400)
+
+    try:
+        text = region_text(id, page, min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        if text is None:
+            return JsonResponse({'error': 'Page is not indexed'}, status=404)
+        return JsonResponse({'text': text})
+
+    except Exception as e:
+        logger.error(f"Error reading region text: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def reject(request , status: str, id: str):
@@ -163,25 +376,16 @@ def reject(request , status: str, id: str):
         else:
             return JsonResponse({'status': 'error', 'message': 'Cannot reject!'}, status=400)
 
-        s3.put_object(Bucket=bucket, Key=f"{id}.json", Body=json_data)
-        annotation = Annotation.objects.get(id=id)
-
-        if annotation.reviewed_by:
-            annotation.status = 'in-review'
-            annotation.assigned_to_user = annotation.reviewed_by
-        elif annotation.labelled_by:
-            annotation.status = 'in-labelling'
-            annotation.assigned_to_user = annotation.labelled_by
-            annotation.reviewed_by = request.user
-        else:
-            return JsonResponse({'status': 'error', 'message': 'Cannot reject!'}, status=400)
-        
-        ist_time = get_current_time_ist()
-        annotation.history.append(f'{ist_time}: rejected by {request.user.username}')
-        annotation.history.append(f'{ist_time}: assigned to {annotation.assigned_to_user.username}')
-        annotation.save()
+        check_lease(id, request.user)
+        write_label(bucket, f"{id}.json", json_data, request.user)
+        try:
+            reject_annotation(id, request.user)
+        except TransitionError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=409 if isinstance(e, LeaseError) else 400)
         return JsonResponse({'status': 'success', 'message': 'Annotation rejected'}, safe=False)
 
+    except LeaseError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=409)
     except Exception as e:
         logger.error(f"Error rejecting annotation: {e}")
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
@@ -194,55 +398,120 @@ def accept(request , status: str, id: str):
         if status != 'in-review':
             return JsonResponse({'status': 'error', 'message': 'Cannot accept!'}, status=400)
         
-        s3.put_object(Bucket=settings.S3_LABELLING_BUCKET, Key=f"{id}.json", Body=json_data)
-        annotation = Annotation.objects.get(id=id)
-        annotation.status = 'accepted'
-        ist_time = get_current_time_ist()
-        annotation.history.append(f'{ist_time}: accepted by {request.user.username}')
-        
-        annotation.reviewed_by = request.user
-        
-        if random.random() < 0.2:
-            superusers = User.objects.filter(is_superuser=True)
-            if superusers.exists():
-                annotation.assigned_to_user = superusers.order_by('?').first()
-            else:
-                annotation.assigned_to_user = None
-            annotation.history.append(f'{ist_time}: assigned to {annotation.assigned_to_user}')
-        annotation.save()
+        check_lease(id, request.user)
+        write_label(settings.S3_LABELLING_BUCKET, f"{id}.json", json_data, request.user)
+        accept_annotation(id, request.user)
         return JsonResponse({'status': 'success', 'message': 'Annotation accepted!'}, safe=False)
 
+    except LeaseError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=409)
     except Exception as e:
         logger.error(f"Error rejecting annotation: {e}")
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
+# Most neighbours get_neighbors returns on each side
+NEIGHBOR_MAX = 20
+
+def neighbor_rows(user, id, next_count, prev_count):
+    """
+    The current annotation plus up to next_count older ("next") and
+    prev_count newer ("prev") ones in the listing order, fetched in one
+    UNION ALL query that walks the (assigned_to_user, inserted_time) or
+    (inserted_time) index from the current row. Returns (current, next, prev)
+    with the neighbours nearest first; current is None if id does not exist.
+    """
+    current = Annotation.objects.filter(id=id)
+    current_time = Subquery(current.values('inserted_time')[:1])
+    # Pending rows are direct uploads that have not been completed
+    visible = Annotation.objects.exclude(status='pending')
+    if not user.is_superuser:
+        visible = visible.filter(assigned_to_user=user)
+
+    parts = [annotation_values(current).annotate(direction=Value('current', output_field=CharField()))]
+    if next_count:
+        older = visible.filter(Q(inserted_time__lt=current_time) | Q(inserted_time=current_time, id__lt=id))
+        parts.append(annotation_values(older.order_by('-inserted_time', '-id')).annotate(direction=Value('next', output_field=CharField()))[:next_count])
+    if prev_count:
+        newer = visible.filter(Q(inserted_time__gt=current_time) | Q(inserted_time=current_time, id__gt=id))
+        parts.append(annotation_values(newer.order_by('inserted_time', 'id')).annotate(direction=Value('prev', output_field=CharField()))[:prev_count])
+
+    rows = {'current': [], 'next': [], 'prev': []}
+    for row in parts[0].union(*parts[1:], all=True):
+        rows[row.pop('direction')].append(serialize_annotation(row))
+    # UNION ALL keeps each arm's order on Postgres, but do not rely on it
+    rows['next'].sort(key=lambda row: (row['inserted_time'], str(row['id'])), reverse=True)
+    rows['prev'].sort(key=lambda row: (row['inserted_time'], str(row['id'])))
+    return (rows['current'][0] if rows['current'] else None), rows['next'], rows['prev']
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_neighbors(request, id: str):
+    try:
+        k = min(int(request.GET.get('k', 5)), NEIGHBOR_MAX)
+        current, next_rows, prev_rows = neighbor_rows(request.user, id, k, k)
+        if current is None:
+            return JsonResponse({'status': 'error', 'message': 'Annotation not found'}, status=404)
+        return JsonResponse({'status': 'success', 'annotation': current, 'next': next_rows, 'prev': prev_rows}, safe=False)
+
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid request'}, status=400)
+    except ValidationError:
+        return JsonResponse({'status': 'error', 'message': 'Annotation not found'}, status=404)
+    except Exception as e:
+        logger.error(f"Error retrieving neighbouring annotations: {e}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def claim_next(request):
+    try:
+        roles = claim_roles(request.user)
+        role = request.data.get('role') or (roles[0] if roles else None)
+        if role not in roles:
+            return JsonResponse({'status': 'error', 'message': 'Not allowed to claim documents for this role'}, status=403)
+
+        annotation = claim_next_annotation(request.user, role)
+        if annotation is None:
+            return JsonResponse({'status': 'success', 'message': 'No documents to claim'}, safe=False)
+        return JsonResponse({
+            'status': 'success',
+            'annotation': serialize_instance(annotation),
+            'lease_expires_at': annotation.lease_expires_at,
+        }, safe=False)
+
+    except Exception as e:
+        logger.error(f"Error claiming annotation: {e}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def claim_heartbeat(request, id: str):
+    try:
+        expires_at = extend_lease(id, request.user)
+        if expires_at is None:
+            return JsonResponse({'status': 'error', 'message': 'Lease expired'}, status=409)
+        return JsonResponse({'status': 'success', 'lease_expires_at': expires_at}, safe=False)
+
+    except ValidationError:
+        return JsonResponse({'status': 'error', 'message': 'Annotation not found'}, status=404)
+    except Exception as e:
+        logger.error(f"Error extending lease: {e}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_next(request, id: str):
     try:
-        current_annotation = Annotation.objects.get(id=id)
-        if request.user.is_superuser:
-            next_annotation = Annotation.objects.filter(inserted_time__lt=current_annotation.inserted_time).order_by('-inserted_time').first()
-        else:
-            next_annotation = Annotation.objects.filter(assigned_to_user=request.user, inserted_time__lt=current_annotation.inserted_time).order_by('-inserted_time').first()
-        
-        if next_annotation:
-            annotation_data = next_annotation.__dict__
-            if next_annotation.assigned_to_user_id:
-                try:
-                    user = User.objects.get(id=next_annotation.assigned_to_user_id)
-                    annotation_data['assigned_to_user'] = user.username
-                except User.DoesNotExist:
-                    annotation_data['assigned_to_user'] = None
-            else:
-                annotation_data['assigned_to_user'] = None
-            del annotation_data['_state']  # Remove the internal state field
-            return JsonResponse({'status': 'success', 'annotation': annotation_data}, safe=False)
+        current, next_rows, _ = neighbor_rows(request.user, id, 1, 0)
+        if current is None:
+            return JsonResponse({'status': 'error', 'message': 'Annotation not found'}, status=404)
+
+        if next_rows:
+            return JsonResponse({'status': 'success', 'annotation': next_rows[0]}, safe=False)
         return JsonResponse({'status': 'success', 'message': 'No more documents to label'}, safe=False)
 
-    except Annotation.DoesNotExist:
+    except ValidationError:
         return JsonResponse({'status': 'error', 'message': 'Annotation not found'}, status=404)
-
     except Exception as e:
         logger.error(f"Error retrieving next annotation: {e}")
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
@@ -251,28 +520,143 @@ def get_next(request, id: str):
 @permission_classes([IsAuthenticated])    
 def get_prev(request, id: str):
     try:
-        current_annotation = Annotation.objects.get(id=id)
-        if request.user.is_superuser:
-            prev_annotation = Annotation.objects.filter(inserted_time__gt=current_annotation.inserted_time).order_by('inserted_time').first()
-        else:
-            prev_annotation = Annotation.objects.filter(assigned_to_user=request.user, inserted_time__gt=current_annotation.inserted_time).order_by('inserted_time').first()
-        
-        if prev_annotation:
-            annotation_data = prev_annotation.__dict__
-            if prev_annotation.assigned_to_user_id:
-                try:
-                    user = User.objects.get(id=prev_annotation.assigned_to_user_id)
-                    annotation_data['assigned_to_user'] = user.username
-                except User.DoesNotExist:
-                    annotation_data['assigned_to_user'] = None
-            else:
-                annotation_data['assigned_to_user'] = None
-            del annotation_data['_state']  # Remove the internal state field
-            return JsonResponse({'status': 'success', 'annotation': annotation_data}, safe=False)
+        current, _, prev_rows = neighbor_rows(request.user, id, 0, 1)
+        if current is None:
+            return JsonResponse({'status': 'error', 'message': 'Annotation not found'}, status=404)
+
+        if prev_rows:
+            return JsonResponse({'status': 'success', 'annotation': prev_rows[0]}, safe=False)
         return JsonResponse({'status': 'success', 'message': 'No more documents to label'}, safe=False)
 
-    except Annotation.DoesNotExist:
+    except ValidationError:
         return JsonResponse({'status': 'error', 'message': 'Annotation not found'}, status=404)
     except Exception as e:
         logger.error(f"Error retrieving previous annotation: {e}")
-        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+def page_params(request, default_per_page=20):
+    # ?perPage= (clamped to 1..100) and ?page=; ValueError if either is not a number
+    per_page = int(request.GET.get('perPage', default_per_page))
+    page = int(request.GET.get('page', 1))
+    return min(max(per_page, 1), 100), page
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_history(request, id: str):
+    try:
+        per_page, page_number = page_params(request)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'perPage and page must be numbers'}, status=400)
+
+    try:
+        events = (
+            AnnotationEvent.objects.filter(annotation_id=id)
+            .order_by('-timestamp', '-id')
+            .values('action', 'timestamp', 'from_status', 'to_status', 'message',
+                    'actor__username', 'assignee__username')
+        )
+        paginator = Paginator(events, per_page)
+        page = paginator.get_page(page_number)
+
+        data = []
+        for event in page.object_list:
+            data.append({
+                'action': event['action'],
+                'timestamp': event['timestamp'],
+                'from_status': event['from_status'],
+                'to_status': event['to_status'],
+                'actor': event['actor__username'],
+                'assignee': event['assignee__username'],
+                'description': format_event(event),
+            })
+
+        return JsonResponse({
+            'status': 'success',
+            'events': data,
+            'page': page.number,
+            'pages': paginator.num_pages,
+            'is_last_page': not page.has_next(),
+        }, safe=False)
+
+    except Exception as e:
+        logger.error(f"Error retrieving annotation history: {e}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_revisions(request, id: str):
+    try:
+        per_page, page_number = page_params(request)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'perPage and page must be numbers'}, status=400)
+
+    try:
+        revisions = (
+            LabelRevision.objects.filter(annotation_id=id)
+            .order_by('-created_at', '-id')
+            .values('id', 'bucket', 'created_at', 'content_hash', 'size', 'compressed_size', 'author__username')
+        )
+        paginator = Paginator(revisions, per_page)
+        page = paginator.get_page(page_number)
+
+        data = []
+        for revision in page.object_list:
+            revision['author'] = revision.pop('author__username')
+            data.append(revision)
+
+        return JsonResponse({
+            'status': 'success',
+            'revisions': data,
+            'page': page.number,
+            'pages': paginator.num_pages,
+            'is_last_page': not page.has_next(),
+        }, safe=False)
+
+    except Exception as e:
+        logger.error(f"Error retrieving label revisions: {e}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_revision(request, id: str, revision_id: int):
+    try:
+        revision = LabelRevision.objects.get(id=revision_id, annotation_id=id)
+        data = json.loads(read_revision(revision))
+
+        # ?diff_from=<revision id> returns a JSON Patch from that revision to this one
+        diff_from = request.GET.get('diff_from')
+        if diff_from:
+            try:
+                base = LabelRevision.objects.get(id=int(diff_from), annotation_id=id)
+            except ValueError:
+                return JsonResponse({'status': 'error', 'message': 'diff_from must be a revision id'}, status=400)
+            except LabelRevision.DoesNotExist:
+                return JsonResponse({'status': 'error', 'message': 'Base revision not found'}, status=404)
+            patch = make_patch(json.loads(read_revision(base)), data)
+            return JsonResponse({'status': 'success', 'patch': patch}, safe=False)
+
+        return JsonResponse({'status': 'success', 'data': data}, safe=False)
+
+    except LabelRevision.DoesNotExist:
+        return JsonResponse({'status': 'error', 'message': 'Revision not found'}, status=404)
+    except Exception as e:
+        logger.error(f"Error retrieving label revision: {e}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def restore_revision(request, id: str, revision_id: int):
+    try:
+        revision = LabelRevision.objects.get(id=revision_id, annotation_id=id)
+        # Overwrites the current label, so it takes the same lease check as save
+        check_lease(id, request.user)
+        write_label(revision.bucket, f"{id}.json", read_revision(revision).decode('utf-8'), request.user)
+        return JsonResponse({'status': 'success', 'message': f'Revision {revision_id} restored'}, safe=False)
+
+    except LabelRevision.DoesNotExist:
+        return JsonResponse({'status': 'error', 'message': 'Revision not found'}, status=404)
+    except LeaseError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=409)
+    except Exception as e:
+        logger.error(f"Error restoring label revision: {e}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
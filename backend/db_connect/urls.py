@@ -2,15 +2,24 @@ from django.urls import path
 from .views import (
     get_annotations,
     upload_document,
+    bulk_upload_documents,
+    create_upload,
+    complete_upload,
     assign_annotation,
     smart_assign,
     get_smart_assign_data,
     get_annotations_count,
     get_groups_with_users,
     dashboard_view,
-    pre_label
+    dashboard_stats,
+    search_annotations,
+    pre_label,
+    pre_label_status,
 )
-from .triage_views import (get_document, get_json, save, accept, submit, get_ocr_text, reject, get_next, get_prev)
+from .triage_views import (get_document, get_json, save, accept, submit, get_ocr_text, get_ocr_text_batch, get_region_text, reject, get_next, get_prev, get_neighbors, get_history,
+                           get_revisions, get_revision, restore_revision, claim_next, claim_heartbeat)
+from . import async_views
+from .metrics import metrics_view
 
 urlpatterns = [
     path(
@@ -18,8 +27,12 @@ urlpatterns = [
         get_annotations,
         name="get annotations",
     ),
+    path("search_annotations/", search_annotations, name="search annotations"),
     path("get_document/<str:id>", get_document, name="get document"),
     path("upload_document/", upload_document, name="upload document"),
+    path("bulk_upload_documents/", bulk_upload_documents, name="bulk upload documents"),
+    path("create_upload/", create_upload, name="create upload"),
+    path("complete_upload/<str:id>/", complete_upload, name="complete upload"),
     path("get_json/<str:status>/<str:id>/", get_json, name="get json"),
     path("assign_annotation", assign_annotation, name="assign annotation"),
     path("save/<str:status>/<str:id>/", save, name="save json"),
@@ -27,12 +40,31 @@ urlpatterns = [
     path("submit/<str:status>/<str:id>/", submit, name="submit annotation"),
     path("reject/<str:status>/<str:id>/", reject, name="reject annotation"),
     path("get_ocr_text/", get_ocr_text, name="get ocr text"),
+    path("get_ocr_text_batch/", get_ocr_text_batch, name="get ocr text batch"),
+    path("get_region_text/<str:id>/", get_region_text, name="get region text"),
     path("get_next/<str:id>/", get_next, name="get next"),
     path("get_prev/<str:id>/", get_prev, name="get prev"),
+    path("get_neighbors/<str:id>/", get_neighbors, name="get neighbors"),
+    path("claim_next/", claim_next, name="claim next"),
+    path("claim_heartbeat/<str:id>/", claim_heartbeat, name="claim heartbeat"),
+    path("get_history/<str:id>/", get_history, name="get history"),
+    path("get_revisions/<str:id>/", get_revisions, name="get revisions"),
+    path("get_revision/<str:id>/<int:revision_id>/", get_revision, name="get revision"),
+    path("restore_revision/<str:id>/<int:revision_id>/", restore_revision, name="restore revision"),
     path("smart_assign/", smart_assign, name="smart assign"),
     path('get_smart_assign_data/', get_smart_assign_data, name='get_user_groups'),
     path('get_annotations_count/', get_annotations_count, name='get_annotations_count'),
     path('get_groups_with_users/', get_groups_with_users, name='get_groups_with_users'),
     path('dashboard_view/', dashboard_view, name='dashboard_view'),
-    path('pre_label/', pre_label, name='pre_label')
+    path('dashboard_stats/', dashboard_stats, name='dashboard_stats'),
+    path('pre_label/', pre_label, name='pre_label'),
+    path('pre_label_status/<str:job_id>/', pre_label_status, name='pre_label_status'),
+    path('metrics/', metrics_view, name='metrics'),
+    # ASGI-native versions of the triage I/O endpoints
+    path("async/get_document/<str:id>", async_views.get_document, name="async get document"),
+    path("async/get_json/<str:status>/<str:id>/", async_views.get_json, name="async get json"),
+    path("async/save/<str:status>/<str:id>/", async_views.save, name="async save json"),
+    path("async/submit/<str:status>/<str:id>/", async_views.submit, name="async submit annotation"),
+    path("async/accept/<str:status>/<str:id>/", async_views.accept, name="async accept annotation"),
+    path("async/reject/<str:status>/<str:id>/", async_views.reject, name="async reject annotation"),
 ]
@@ -1,6 +1,159 @@
 from datetime import datetime
+import base64, json, uuid
 import pytz
+from django.db import connection
+from django.db.models import Q
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_date
+from .models import AnnotationEvent, AnnotationStatusCount, UserDailyStats
 
 def get_current_time_ist():
     ist = pytz.timezone('Asia/Kolkata')
-    return datetime.now().astimezone(ist).strftime('%H:%M:%S (%d-%b-%y)')
\ No newline at end of file
+    return datetime.now().astimezone(ist).strftime('%H:%M:%S (%d-%b-%y)')
+
+def encode_cursor(row):
+    # Opaque keyset token for (inserted_time, id) of a values() row
+    raw = json.dumps([row["inserted_time"].isoformat(), str(row["id"])])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(token):
+    try:
+        inserted_time, id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        inserted_time = parse_datetime(inserted_time)
+        # Checked here so a tampered id is a 400, not a ValidationError from the ORM
+        id = uuid.UUID(id)
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Invalid cursor")
+    if inserted_time is None:
+        raise ValueError("Invalid cursor")
+    return inserted_time, id
+
+def keyset_page(queryset, per_page, after=None, before=None):
+    """
+    Returns (rows, has_next, has_prev) for a queryset ordered newest first by
+    (inserted_time, id). Pages are fetched with a seek predicate instead of
+    OFFSET, so the cost does not grow with the depth of the page.
+    """
+    if before:
+        inserted_time, id = decode_cursor(before)
+        queryset = queryset.filter(
+            Q(inserted_time__gt=inserted_time) | Q(inserted_time=inserted_time, id__gt=id)
+        ).order_by("inserted_time", "id")
+        rows = list(queryset[:per_page + 1])
+        has_prev = len(rows) > per_page
+        rows = rows[:per_page]
+        rows.reverse()
+        return rows, True, has_prev
+
+    queryset = queryset.order_by("-inserted_time", "-id")
+    if after:
+        inserted_time, id = decode_cursor(after)
+        queryset = queryset.filter(
+            Q(inserted_time__lt=inserted_time) | Q(inserted_time=inserted_time, id__lt=id)
+        )
+    rows = list(queryset[:per_page + 1])
+    has_next = len(rows) > per_page
+    return rows[:per_page], has_next, bool(after)
+
+def id_prefix_filter(search):
+    """
+    Q for annotation ids starting with `search` (hyphens optional), written
+    as a range on the primary key so the pk index serves it. None when
+    `search` cannot be the start of a UUID.
+    """
+    digits = search.strip().lower().replace('-', '')
+    if not digits or len(digits) > 32 or any(c not in '0123456789abcdef' for c in digits):
+        return None
+    return Q(id__gte=uuid.UUID(digits.ljust(32, '0')), id__lte=uuid.UUID(digits.ljust(32, 'f')))
+
+def estimate_count(queryset):
+    # Planner row estimate, avoids a full COUNT(*) on large tables
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+def record_event(annotation, action, actor=None, from_status=None, assignee=None, message=''):
+    # Single INSERT into the append-only event log
+    return AnnotationEvent.objects.create(
+        annotation_id=annotation.id,
+        action=action,
+        actor=actor,
+        from_status=from_status,
+        to_status=annotation.status,
+        assignee=assignee,
+        message=message,
+    )
+
+def format_event(event):
+    # Renders an event row the way the old history strings looked
+    ist = pytz.timezone('Asia/Kolkata')
+    return f"{event['timestamp'].astimezone(ist).strftime('%H:%M:%S (%d-%b-%y)')}: {event['message']}"
+
+def get_status_counts():
+    # {status: {"assigned": n, "unassigned": m}} read from the trigger-maintained counters
+    counts = {}
+    for status, assigned, count in AnnotationStatusCount.objects.values_list('status', 'assigned', 'count'):
+        counts.setdefault(status, {'assigned': 0, 'unassigned': 0})['assigned' if assigned else 'unassigned'] = count
+    return counts
+
+DAILY_STATS_FIELDS = ['labelled', 'reviewed', 'accepted', 'rejected']
+
+def ist_day(value=None):
+    # IST calendar day of an ISO date/datetime string (or now), the bucket the rollups use.
+    # None for a malformed string; ValueError for a well-formed but impossible date.
+    ist = pytz.timezone('Asia/Kolkata')
+    if value is None:
+        return timezone.now().astimezone(ist).date()
+    moment = parse_datetime(value)
+    if moment is None:
+        return parse_date(value)
+    if timezone.is_naive(moment):
+        return moment.date()
+    return moment.astimezone(ist).date()
+
+def record_daily_stats(user_id, **counts):
+    # Adds to the user's row for today in one upsert, so concurrent transitions cannot lose counts
+    table = UserDailyStats._meta.db_table
+    columns = ', '.join(DAILY_STATS_FIELDS)
+    updates = ', '.join(f"{field} = {table}.{field} + EXCLUDED.{field}" for field in DAILY_STATS_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, day, {columns}) VALUES (%s, %s, %s, %s, %s, %s) "
+            f"ON CONFLICT (user_id, day) DO UPDATE SET {updates}",
+            [user_id, ist_day(), *(counts.get(field, 0) for field in DAILY_STATS_FIELDS)],
+        )
+
+def _daily_rows(start_day, end_day, user):
+    rows = UserDailyStats.objects.filter(day__gte=start_day, day__lte=end_day)
+    return rows if user is None else rows.filter(user=user)
+
+def get_daily_totals(start_day, end_day, user=None):
+    # Summed counts for the inclusive day range in one aggregate query
+    totals = _daily_rows(start_day, end_day, user).aggregate(**{field: Sum(field) for field in DAILY_STATS_FIELDS})
+    return {field: totals[field] or 0 for field in DAILY_STATS_FIELDS}
+
+def get_daily_stats(start_day, end_day, user=None):
+    """
+    Rollup totals for the inclusive day range, for one user or everyone:
+    {"totals": {...}, "daily": [{"day": ..., ...}]}, plus per-user
+    "users" rows when no user is given.
+    """
+    rows = _daily_rows(start_day, end_day, user)
+    sums = {field: Sum(field) for field in DAILY_STATS_FIELDS}
+
+    daily = rows.values('day').annotate(**sums).order_by('day')
+    stats = {
+        'totals': get_daily_totals(start_day, end_day, user),
+        'daily': [{**row, 'day': row['day'].isoformat()} for row in daily],
+    }
+    if user is None:
+        users = rows.values('user__username').annotate(**sums).order_by('user__username')
+        stats['users'] = [{'username': row.pop('user__username'), **row} for row in users]
+    return stats
@@ -1,25 +1,46 @@
-from .models import Annotation
+from .models import Annotation, AnnotationEvent, PreLabelJob
 from django.http import JsonResponse
 from django.contrib.auth.models import User
 from django.conf import settings
 import logging
 from django.db import transaction
-import boto3
+from django.db.models import Count, Q
+from django.utils import timezone
+from botocore.exceptions import ClientError
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.core.exceptions import ValidationError
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
+import io
 import json
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from django.contrib.auth.models import Group
 from rest_framework import status
-from django.db.models import Count, Q
-from .utils import get_current_time_ist
+from .utils import record_event, keyset_page, encode_cursor, estimate_count, get_status_counts, ist_day, get_daily_stats, id_prefix_filter
+from .serializers import annotation_values, serialize_annotations
+from .documents import ingest_document, prepare_derivative
+from .word_index import schedule_word_index
+from .backends import get_storage, get_queue
+from .pre_label import (
+    SQS_BATCH_SIZE,
+    pre_label_message,
+    send_pre_label_batch,
+    start_pre_label_job,
+    fail_if_stale,
+    PreLabelJobRunning,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Upload file to S3
-s3 = boto3.client("s3")
+# Most matches search_annotations returns
+SEARCH_MAX_RESULTS = 50
+
+# Rows updated per round of smart assign
+SMART_ASSIGN_BATCH_SIZE = 5000
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
@@ -61,44 +82,79 @@ def get_annotations(
                 assigned_to_user=request.user, status=status
             ).order_by("-inserted_time")
 
+    # Direct uploads that were never completed are not documents yet
+    annotations_list = annotations_list.exclude(status="pending")
+
     if searchID != "null":
-        annotations_list = annotations_list.filter(id__icontains=searchID)
+        id_filter = id_prefix_filter(searchID)
+        annotations_list = annotations_list.filter(id_filter) if id_filter else annotations_list.none()
 
-    paginator = Paginator(
-        annotations_list, perPage
-    )  # Use perPage for annotations per page
+    annotations_list = annotation_values(annotations_list)
 
-    try:
-        annotations = paginator.page(page)
-    except PageNotAnInteger:
-        annotations = paginator.page(1)
-    except EmptyPage:
-        annotations = paginator.page(paginator.num_pages)
-
-    data = []
-    for annotation in annotations.object_list:
-        annotation_data = annotation.__dict__
-        if annotation.assigned_to_user_id:
-            try:
-                user = User.objects.get(id=annotation.assigned_to_user_id)
-                annotation_data["assigned_to_user"] = user.username
-            except User.DoesNotExist:
-                annotation_data["assigned_to_user"] = None
-        else:
-            annotation_data["assigned_to_user"] = None
-        del annotation_data["_state"]  # Remove the internal state field
-        data.append(annotation_data)
+    # Cursor mode: ?paginate=cursor, then follow ?after=<token> / ?before=<token>
+    after = request.GET.get("after")
+    before = request.GET.get("before")
+    count_mode = request.GET.get("count")
+    if after or before or request.GET.get("paginate") == "cursor":
+        try:
+            rows, has_next, has_prev = keyset_page(
+                annotations_list, perPage, after=after, before=before
+            )
+        except ValueError as e:
+            return JsonResponse({"status": "error", "message": str(e)}, status=400)
 
-    return JsonResponse(
-        {
-            "annotations": data,
+        meta = {
+            "next_cursor": encode_cursor(rows[-1]) if rows and has_next else None,
+            "prev_cursor": encode_cursor(rows[0]) if rows and has_prev else None,
+            "is_last_page": not has_next,
+        }
+        if count_mode == "exact":
+            meta["total_annotations"] = annotations_list.count()
+        elif count_mode == "estimate":
+            meta["total_annotations"] = estimate_count(annotations_list)
+    else:
+        paginator = Paginator(
+            annotations_list, perPage
+        )  # Use perPage for annotations per page
+
+        try:
+            annotations = paginator.page(page)
+        except PageNotAnInteger:
+            annotations = paginator.page(1)
+        except EmptyPage:
+            annotations = paginator.page(paginator.num_pages)
+
+        rows = annotations.object_list
+        meta = {
             "page": annotations.number,
             "pages": paginator.num_pages,
             "total_annotations": paginator.count,
             "is_last_page": not annotations.has_next(),
-        },
-        safe=False,
-    )
+        }
+
+    data = serialize_annotations(rows)
+
+    return JsonResponse({"annotations": data, **meta}, safe=False)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def search_annotations(request):
+    # Typeahead for the ID search box: first ?limit= ids starting with ?q=, in id order
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 10)), SEARCH_MAX_RESULTS))
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "limit must be a number"}, status=400)
+
+    id_filter = id_prefix_filter(request.GET.get("q", ""))
+    if id_filter is None:
+        return JsonResponse({"annotations": []})
+
+    annotations = Annotation.objects.filter(id_filter).exclude(status="pending")
+    if not request.user.is_superuser:
+        annotations = annotations.filter(assigned_to_user=request.user)
+    rows = annotation_values(annotations.order_by("id"))[:limit]
+
+    return JsonResponse({"annotations": serialize_annotations(rows)})
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
@@ -117,64 +173,276 @@ def upload_document(request):
             )
 
         uploaded_file = request.FILES["document"]
-        file_extension = uploaded_file.name.split(".")[-1].lower()
 
+        # Determine uploader
+        uploader = (
+            request.user.username
+            if request.user.is_authenticated
+            else "Anonymous"
+        )
+
+        # Use UUID as the file key
+        annotation = Annotation(status="uploaded")
+        annotation.s3_file_key = document_key(annotation.id, uploaded_file.name)
+
+        # Storage and SQS calls stay outside the transaction so the row (and
+        # the status-count trigger's counter) is not locked while they run
         try:
-            with transaction.atomic():
-                # Determine uploader
-                uploader = (
-                    request.user.username
-                    if request.user.is_authenticated
-                    else "Anonymous"
-                )
+            get_storage().upload_fileobj(uploaded_file, settings.S3_DOC_BUCKET, annotation.s3_file_key)
+        except Exception as e:
+            logger.error(
+                f"Error uploading document '{uploaded_file.name}' by '{uploader}': {e}"
+            )
+            return JsonResponse({"status": "error", "message": str(e)}, status=500)
 
+        try:
+            with transaction.atomic():
                 # Create a new annotation record
-                annotation = Annotation(status="uploaded")
-                ist_time = get_current_time_ist()
-                annotation.history = [f"{ist_time}: uploaded by {uploader}"]
                 annotation.save()
+                record_event(
+                    annotation,
+                    "uploaded",
+                    actor=request.user,
+                    message=f"uploaded by {uploader}",
+                )
+                ingest_document(annotation.id, annotation.s3_file_key)
+        except Exception as e:
+            logger.error(
+                f"Error uploading document '{uploaded_file.name}' by '{uploader}': {e}"
+            )
+            try:
+                get_storage().delete_object(Bucket=settings.S3_DOC_BUCKET, Key=annotation.s3_file_key)
+            except Exception as delete_error:
+                logger.error(f"Error deleting orphaned upload {annotation.s3_file_key}: {delete_error}")
+            return JsonResponse({"status": "error", "message": str(e)}, status=500)
 
-                # Use UUID as the file key
-                s3_file_key = f"{annotation.id}.{file_extension}"
+        # send message to SQS; a document that is not enqueued here is picked
+        # up by the next pre-label job
+        pre_label_enqueued = False
+        try:
+            get_queue().send_message(
+                QueueUrl=settings.SQS_PRE_LABEL_QUEUE_URL,
+                MessageBody=pre_label_message(annotation.id, annotation.s3_file_key),
+            )
+            Annotation.objects.filter(id=annotation.id).update(
+                pre_label_enqueued_at=timezone.now()
+            )
+            pre_label_enqueued = True
+        except Exception as e:
+            logger.error(f"Error enqueueing pre-label for {annotation.id}: {e}")
 
-                s3.upload_fileobj(uploaded_file, settings.S3_DOC_BUCKET, s3_file_key)
+        logger.info(
+            f"File '{uploaded_file.name}' uploaded successfully by '{uploader}'"
+        )
 
-                # Update annotation record
-                annotation.s3_file_key = s3_file_key
-                annotation.save()
+        return JsonResponse(
+            {
+                "status": "success",
+                "message": f"File '{uploaded_file.name}' uploaded successfully.",
+                "file_path": annotation.s3_file_key,
+                "pre_label_enqueued": pre_label_enqueued,
+            }
+        )
 
-                # send message to SQS
-                sqs = boto3.client("sqs", region_name="ap-south-1")
-                sqs.send_message(
-                    QueueUrl=settings.SQS_PRE_LABEL_QUEUE_URL,
-                    MessageBody=json.dumps(
-                        {
-                            "id": str(annotation.id),
-                            "s3_doc_bucket": settings.S3_DOC_BUCKET,
-                            "s3_file_key": s3_file_key,
-                            "s3_pre_label_bucket": settings.S3_LABELLING_BUCKET,
-                            "database": settings.DATABASES["default"],
-                        }
-                    ),
-                )
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def bulk_upload_documents(request):
+    if not request.user.is_superuser:
+        return JsonResponse(
+            {"status": "error", "message": "Only superusers can upload documents"},
+            status=403,
+        )
 
-                logger.info(
-                    f"File '{uploaded_file.name}' uploaded successfully by '{uploader}'"
-                )
+    try:
+        sources = _ingest_sources(request)
+    except zipfile.BadZipFile:
+        return JsonResponse(
+            {"status": "error", "message": "Invalid ZIP archive"}, status=400
+        )
+    except ArchiveTooLarge as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=413)
+    if not sources:
+        return JsonResponse(
+            {"status": "error", "message": "No file uploaded"}, status=400
+        )
+
+    annotations = []
+    for filename, _ in sources:
+        annotation = Annotation(status="uploaded")
+        annotation.s3_file_key = document_key(annotation.id, filename)
+        annotations.append(annotation)
+
+    # Objects first, in parallel; only rows whose object landed get created
+    with ThreadPoolExecutor(max_workers=settings.BULK_UPLOAD_WORKERS) as executor:
+        errors = list(
+            executor.map(
+                _upload_source, annotations, [opener for _, opener in sources]
+            )
+        )
+
+    uploaded = [
+        annotation for annotation, error in zip(annotations, errors) if error is None
+    ]
+    with transaction.atomic():
+        Annotation.objects.bulk_create(uploaded)
+        AnnotationEvent.objects.bulk_create(
+            AnnotationEvent(
+                annotation_id=annotation.id,
+                action="uploaded",
+                actor=request.user,
+                to_status="uploaded",
+                message=f"uploaded by {request.user.username}",
+            )
+            for annotation in uploaded
+        )
+
+    for annotation in uploaded:
+        schedule_word_index(annotation.id)
+
+    rows = [(annotation.id, annotation.s3_file_key) for annotation in uploaded]
+    batches = [rows[i : i + SQS_BATCH_SIZE] for i in range(0, len(rows), SQS_BATCH_SIZE)]
+    enqueued = set()
+    with ThreadPoolExecutor(max_workers=settings.PRE_LABEL_WORKERS) as executor:
+        for sent_ids, _ in executor.map(send_pre_label_batch, batches):
+            enqueued.update(sent_ids)
+    if enqueued:
+        Annotation.objects.filter(id__in=enqueued).update(
+            pre_label_enqueued_at=timezone.now()
+        )
+
+    manifest = []
+    for (filename, _), annotation, error in zip(sources, annotations, errors):
+        if error is None:
+            manifest.append(
+                {
+                    "file": filename,
+                    "status": "success",
+                    "id": str(annotation.id),
+                    "file_path": annotation.s3_file_key,
+                    "pre_label_enqueued": annotation.id in enqueued,
+                }
+            )
+        else:
+            manifest.append({"file": filename, "status": "error", "message": error})
+
+    logger.info(
+        f"Bulk upload by '{request.user.username}': {len(uploaded)}/{len(sources)} files uploaded"
+    )
+
+    return JsonResponse(
+        {
+            "status": "success" if len(uploaded) == len(sources) else "partial",
+            "uploaded": len(uploaded),
+            "failed": len(sources) - len(uploaded),
+            "files": manifest,
+        }
+    )
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def create_upload(request):
+    # Step 1 of a direct upload: the browser POSTs the file straight to S3
+    if not request.user.is_superuser:
+        return JsonResponse(
+            {"status": "error", "message": "Only superusers can upload documents"},
+            status=403,
+        )
+
+    filename = request.data.get("filename")
+    if not filename:
+        return JsonResponse(
+            {"status": "error", "message": "filename is required"}, status=400
+        )
+    try:
+        annotation = Annotation(status="pending")
+        annotation.s3_file_key = document_key(annotation.id, filename)
+        annotation.save()
+
+        upload = get_storage().generate_presigned_post(
+            Bucket=settings.S3_DOC_BUCKET,
+            Key=annotation.s3_file_key,
+            Conditions=[["content-length-range", 1, settings.MAX_UPLOAD_SIZE]],
+            ExpiresIn=settings.PRESIGNED_UPLOAD_EXPIRY,
+        )
+
+        return JsonResponse(
+            {
+                "status": "success",
+                "id": str(annotation.id),
+                "file_path": annotation.s3_file_key,
+                "upload": upload,
+            }
+        )
+
+    except Exception as e:
+        logger.error(f"Error creating upload for '{filename}': {e}")
+        return JsonResponse({"status": "error", "message": str(e)}, status=500)
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def complete_upload(request, id: str):
+    # Step 2: confirm the object landed in S3, then hand it to pre-labelling
+    if not request.user.is_superuser:
+        return JsonResponse(
+            {"status": "error", "message": "Only superusers can upload documents"},
+            status=403,
+        )
+
+    try:
+        annotation = Annotation.objects.get(id=id)
+        if annotation.status != "pending":
+            return JsonResponse(
+                {"status": "error", "message": "Upload already completed"}, status=409
+            )
+
+        try:
+            get_storage().head_object(Bucket=settings.S3_DOC_BUCKET, Key=annotation.s3_file_key)
+        except ClientError:
+            return JsonResponse(
+                {"status": "error", "message": "Uploaded file not found"}, status=400
+            )
+
+        with transaction.atomic():
+            # Conditional update so a repeated callback cannot enqueue twice
+            updated = Annotation.objects.filter(id=annotation.id, status="pending").update(
+                status="uploaded"
+            )
+            if not updated:
                 return JsonResponse(
-                    {
-                        "status": "success",
-                        "message": f"File '{uploaded_file.name}' uploaded successfully.",
-                        "file_path": s3_file_key,
-                    }
+                    {"status": "error", "message": "Upload already completed"}, status=409
                 )
-
-        except Exception as e:
-            logger.error(
-                f"Error uploading document '{uploaded_file.name}' by '{uploader}': {e}"
+            annotation.status = "uploaded"
+            record_event(
+                annotation,
+                "uploaded",
+                actor=request.user,
+                from_status="pending",
+                message=f"uploaded by {request.user.username}",
             )
-            return JsonResponse({"status": "error", "message": str(e)}, status=500)
+
+        ingest_document(annotation.id, annotation.s3_file_key)
+
+        get_queue().send_message(
+            QueueUrl=settings.SQS_PRE_LABEL_QUEUE_URL,
+            MessageBody=pre_label_message(annotation.id, annotation.s3_file_key),
+        )
+        Annotation.objects.filter(id=annotation.id).update(
+            pre_label_enqueued_at=timezone.now()
+        )
+
+        return JsonResponse(
+            {
+                "status": "success",
+                "message": f"File '{annotation.s3_file_key}' uploaded successfully.",
+                "file_path": annotation.s3_file_key,
+            }
+        )
+
+    except (Annotation.DoesNotExist, ValidationError):
+        return JsonResponse({"status": "error", "message": "Annotation not found"}, status=404)
+    except Exception as e:
+        logger.error(f"Error completing upload {id}: {e}")
+        return JsonResponse({"status": "error", "message": str(e)}, status=500)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
@@ -187,19 +455,29 @@ def assign_annotation(request):
             annotation = Annotation.objects.get(id=annotation_id)
             if username == None:
                 assign_to_user = None
+                action = "unassigned"
                 history_message = f"unassigned by {assigned_by.username}"
             else:
                 assign_to_user = User.objects.get(username=username)
                 assigned_to_username = assign_to_user.username
+                action = "assigned"
                 history_message = (
                     f"assigned to {assigned_to_username} by {assigned_by.username}"
                 )
 
-            annotation.assigned_to_user = assign_to_user
-            ist_time = get_current_time_ist()
-
-            annotation.history.append(f"{ist_time}: {history_message}")
-            annotation.save()
+            with transaction.atomic():
+                # A manual assignment replaces any claim_next lease
+                annotation.assigned_to_user = assign_to_user
+                annotation.lease_expires_at = None
+                annotation.save(update_fields=["assigned_to_user", "lease_expires_at"])
+                record_event(
+                    annotation,
+                    action,
+                    actor=assigned_by,
+                    from_status=annotation.status,
+                    assignee=assign_to_user,
+                    message=history_message,
+                )
 
             return JsonResponse(
                 {
@@ -234,7 +512,11 @@ def smart_assign(request):
             )
 
         annotations = Annotation.objects.filter(status=status, assigned_to_user=None)
-        users = User.objects.filter(groups__name=user_group).values("id", "username")
+        users = list(
+            User.objects.filter(groups__name=user_group)
+            .order_by("id")
+            .values("id", "username")
+        )
         user_count = len(users)
         if user_count == 0:
             return JsonResponse(
@@ -242,24 +524,57 @@ def smart_assign(request):
                 status=404,
             )
 
-        annotations_to_assign = int(len(annotations) * (percentage / 100))
-        user_index = 0
+        annotations_to_assign = int(annotations.count() * (percentage / 100))
+        assigned_counts = {user["username"]: 0 for user in users}
 
-        for annotation in annotations[:annotations_to_assign]:
-            user_id = users[user_index]["id"]
-            annotation.assigned_to_user_id = user_id
-            annotation.status = "in-labelling"
-            ist_time = get_current_time_ist()
-            annotation.history.append(
-                f'{ist_time}: assigned to {users[user_index]["username"]} by {request.user.username}(smart assign)'
-            )
-            annotation.save()
-            user_index = (user_index + 1) % user_count
+        # One transaction per batch: the status-count trigger locks its counter
+        # rows until commit, so a single transaction would block every other
+        # status change for the whole run
+        assigned = 0
+        while assigned < annotations_to_assign:
+            with transaction.atomic():
+                # Lock the rows we hand out; rows held by annotators are skipped, not waited on
+                batch = list(
+                    annotations.order_by("inserted_time")
+                    .select_for_update(skip_locked=True)
+                    .values_list("id", flat=True)[
+                        : min(SMART_ASSIGN_BATCH_SIZE, annotations_to_assign - assigned)
+                    ]
+                )
+                if not batch:
+                    break
+
+                events = []
+                for user_index, user in enumerate(users):
+                    # Round robin continues across batches
+                    start = (user_index - assigned) % user_count
+                    user_ids = batch[start::user_count]
+                    if not user_ids:
+                        continue
+                    Annotation.objects.filter(id__in=user_ids).update(
+                        assigned_to_user_id=user["id"], status="in-labelling", lease_expires_at=None
+                    )
+                    assigned_counts[user["username"]] += len(user_ids)
+                    events.extend(
+                        AnnotationEvent(
+                            annotation_id=annotation_id,
+                            action="assigned",
+                            actor=request.user,
+                            from_status=status,
+                            to_status="in-labelling",
+                            assignee_id=user["id"],
+                            message=f'assigned to {user["username"]} by {request.user.username}(smart assign)',
+                        )
+                        for annotation_id in user_ids
+                    )
+                AnnotationEvent.objects.bulk_create(events)
+            assigned += len(batch)
 
         return JsonResponse(
             {
                 "status": "success",
-                "message": f"{annotations_to_assign} annotations assigned successfully",
+                "message": f"{assigned} annotations assigned successfully",
+                "assigned": assigned_counts,
             },
             safe=False,
         )
@@ -280,18 +595,11 @@ def get_smart_assign_data(request):
             groups_with_users[group_name] = []
         groups_with_users[group_name].append(user_name)
 
-    annotation_status_counts = (
-        Annotation.objects.values("status")
-        .annotate(
-            total_count=Count("status"),
-            unassigned_count=Count("status", filter=Q(assigned_to_user=None)),
-        )
-        .order_by("status")
-    )
-    status_counts = {
-        item["status"]: f"{item['unassigned_count']}/{item['total_count']}"
-        for item in annotation_status_counts
-    }
+    status_counts = {}
+    for item_status, counts in sorted(get_status_counts().items()):
+        total_count = counts["assigned"] + counts["unassigned"]
+        if total_count:
+            status_counts[item_status] = f"{counts['unassigned']}/{total_count}"
 
     return JsonResponse(
         {"groups": groups_with_users, "status": status_counts},
@@ -302,25 +610,18 @@ def get_smart_assign_data(request):
 @permission_classes([IsAuthenticated])
 def get_annotations_count(request):
     try:
-        total_count = Annotation.objects.count()
-        inprogress_counts = (
-            Annotation.objects.filter(
-                status__in=[
-                    "uploaded",
-                    "pre-labelled",
-                    "in-labelling",
-                    "in-review",
-                    "accepted",
-                ]
-            )
-            .values("status")
-            .annotate(count=Count("status"))
-        )
-        completed_count = Annotation.objects.filter(status="completed").count()
+        counts = {
+            status: item["assigned"] + item["unassigned"]
+            for status, item in get_status_counts().items()
+        }
+        # Pending uploads have no document yet
+        counts.pop("pending", None)
+        total_count = sum(counts.values())
+        completed_count = counts.get("completed", 0)
 
         # Initialize inprogress with all possible statuses
         inprogress = {
-            status: 0
+            status: counts.get(status, 0)
             for status in [
                 "uploaded",
                 "pre-labelled",
@@ -329,8 +630,6 @@ def get_annotations_count(request):
                 "accepted",
             ]
         }
-        for status in inprogress_counts:
-            inprogress[status["status"]] = status["count"]
 
         return JsonResponse(
             {
@@ -388,70 +687,115 @@ def dashboard_view(request):
         # Use the logged-in user if no username is provided
         user = request.user
 
-    start_date = request.GET.get("start_date")
-    end_date = request.GET.get("end_date")
-
-    print(f"Start date: {start_date}, End date: {end_date}")
-    print(f"Start date: {type(start_date)}, End date: {type(end_date)}")
-
-    # Filter labelled files for the user (those labelled by the user)
-    labelled_files = Annotation.objects.filter(
-        labelled_by=user,
-        labelled_at__gte=start_date,
-        labelled_at__lte=end_date
-    ).order_by('-labelled_at')
+    start_date = request.GET.get("start_date", "")
+    end_date = request.GET.get("end_date", "")
+    try:
+        start_day, end_day = ist_day(start_date), ist_day(end_date)
+        per_page = int(request.GET.get("perPage", 10))
+        page_labelled = int(request.GET.get("page_labelled", 1))
+        page_reviewed = int(request.GET.get("page_reviewed", 1))
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Invalid date or page"}, status=400)
+    if start_day is None or end_day is None:
+        return JsonResponse(
+            {"status": "error", "message": "start_date and end_date are required"}, status=400
+        )
+    per_page = min(max(per_page, 1), 100)
+    page_labelled, page_reviewed = max(page_labelled, 1), max(page_reviewed, 1)
+
+    # Files labelled / reviewed by the user in the range; served by the
+    # (labelled_by, labelled_at) and (reviewed_by, reviewed_at) indexes
+    labelled = Q(labelled_by=user, labelled_at__gte=start_date, labelled_at__lte=end_date)
+    reviewed = Q(reviewed_by=user, reviewed_at__gte=start_date, reviewed_at__lte=end_date)
+    labelled_files = Annotation.objects.filter(labelled).order_by('-labelled_at').values(
+        "id", "status", "reviewed_by__username", "assigned_to_user__username"
+    )
+    reviewed_files = Annotation.objects.filter(reviewed).order_by('-reviewed_at').values(
+        "id", "status", "labelled_by__username", "assigned_to_user__username"
+    )
 
-    print({"labelled_files": list(labelled_files.values())})
-    
-    # Filter reviewed files for the user (those reviewed by the user)
-    reviewed_files = Annotation.objects.filter(
-        reviewed_by=user,
-        reviewed_at__gte=start_date,
-        reviewed_at__lte=end_date
-    ).order_by('-reviewed_at')
-    print({"reviewed_files": list(reviewed_files.values())})
-    
-    # Pagination for labelled files
-    labelled_paginator = Paginator(labelled_files, request.GET.get("perPage", 10))
-    page_labelled = request.GET.get("page_labelled", 1)
-    labelled_page = labelled_paginator.get_page(page_labelled)
+    # Totals count the same rows the lists page through (documents, not the
+    # transition counts of the daily rollups), both in one query
+    totals = Annotation.objects.filter(labelled | reviewed).aggregate(
+        labelled=Count("id", filter=labelled), reviewed=Count("id", filter=reviewed)
+    )
 
-    # Pagination for reviewed files
-    reviewed_paginator = Paginator(reviewed_files, request.GET.get("perPage", 10))
-    page_reviewed = request.GET.get("page_reviewed", 1)
-    reviewed_page = reviewed_paginator.get_page(page_reviewed)
+    offset = (page_labelled - 1) * per_page
+    labelled_page = list(labelled_files[offset : offset + per_page])
+    has_next_labelled = offset + per_page < totals["labelled"]
+    offset = (page_reviewed - 1) * per_page
+    reviewed_page = list(reviewed_files[offset : offset + per_page])
+    has_next_reviewed = offset + per_page < totals["reviewed"]
 
     labelled_data = []
     for annotation in labelled_page:
         labelled_data.append({
-            "ID": str(annotation.id),
-            "Reviewed By": annotation.reviewed_by.username if annotation.reviewed_by else None,
-            "Assignee": annotation.assigned_to_user.username if annotation.assigned_to_user else None,
-            "Status": annotation.status,
+            "ID": str(annotation["id"]),
+            "Reviewed By": annotation["reviewed_by__username"],
+            "Assignee": annotation["assigned_to_user__username"],
+            "Status": annotation["status"],
         })
 
     reviewed_data = []
     for annotation in reviewed_page:
         reviewed_data.append({
-            "ID": str(annotation.id),
-            "Labelled By": annotation.labelled_by.username if annotation.labelled_by else None,
-            "Assignee": annotation.assigned_to_user.username if annotation.assigned_to_user else None,
-            "Status": annotation.status,
+            "ID": str(annotation["id"]),
+            "Labelled By": annotation["labelled_by__username"],
+            "Assignee": annotation["assigned_to_user__username"],
+            "Status": annotation["status"],
         })
 
     return JsonResponse({
         "labelled_files": labelled_data,
         "reviewed_files": reviewed_data,
-        "page_labelled": labelled_page.number,
-        "pages_labelled": labelled_paginator.num_pages,
-        "total_labelled": labelled_paginator.count,
-        "is_last_page_labelled": not labelled_page.has_next(),
-        "page_reviewed": reviewed_page.number,
-        "pages_reviewed": reviewed_paginator.num_pages,
-        "total_reviewed": reviewed_paginator.count,
-        "is_last_page_reviewed": not reviewed_page.has_next(),
+        "page_labelled": page_labelled,
+        "pages_labelled": max(1, -(-totals["labelled"] // per_page)),
+        "total_labelled": totals["labelled"],
+        "is_last_page_labelled": not has_next_labelled,
+        "page_reviewed": page_reviewed,
+        "pages_reviewed": max(1, -(-totals["reviewed"] // per_page)),
+        "total_reviewed": totals["reviewed"],
+        "is_last_page_reviewed": not has_next_reviewed,
     })
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def dashboard_stats(request):
+    # Labelled/reviewed/accepted/rejected counts per IST day from the rollup table
+    username = request.GET.get("username")
+    try:
+        start_day = ist_day(request.GET.get("start_date", ""))
+        end_day = ist_day(request.GET.get("end_date", ""))
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Invalid date"}, status=400)
+    if start_day is None or end_day is None:
+        return JsonResponse(
+            {"status": "error", "message": "start_date and end_date are required"}, status=400
+        )
+
+    if username == "all":
+        if not request.user.is_superuser:
+            return JsonResponse(
+                {"status": "error", "message": "Only superusers can view everyone's stats"},
+                status=403,
+            )
+        user = None
+    elif username:
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            return JsonResponse({"error": "User not found."}, status=404)
+    else:
+        user = request.user
+
+    return JsonResponse(
+        {
+            "start_day": start_day.isoformat(),
+            "end_day": end_day.isoformat(),
+            **get_daily_stats(start_day, end_day, user),
+        }
+    )
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def pre_label(request):
@@ -461,24 +805,48 @@ def pre_label(request):
             status=403,
         )
 
-    annotations = Annotation.objects.filter(status="uploaded")
-    sqs = boto3.client("sqs", region_name="ap-south-1")
-
-    for annotation in annotations:
-        s3_file_key = annotation.s3_file_key
-        message_body = json.dumps(
+    # Runs in the background; poll pre_label_status/<job_id>/ for progress
+    force = str(request.data.get("force", "")).lower() in ("1", "true")
+    try:
+        job = start_pre_label_job(request.user, force=force)
+    except PreLabelJobRunning as e:
+        return JsonResponse(
             {
-                "id": str(annotation.id),
-                "s3_doc_bucket": settings.S3_DOC_BUCKET,
-                "s3_file_key": s3_file_key,
-                "s3_pre_label_bucket": settings.S3_LABELLING_BUCKET,
-                "database": settings.DATABASES["default"],
-            }
+                "status": "error",
+                "message": str(e),
+                "job_id": str(e.job.id) if e.job else None,
+            },
+            status=409,
         )
 
-        sqs.send_message(
-            QueueUrl=settings.SQS_PRE_LABEL_QUEUE_URL,
-            MessageBody=message_body,
-        )
+    return JsonResponse(
+        {
+            "status": "success",
+            "message": "Pre-labeling started.",
+            "job_id": str(job.id),
+            "total": job.total,
+        }
+    )
 
-    return JsonResponse({"status": "success", "message": "Pre-labeling successful."})
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def pre_label_status(request, job_id: str):
+    try:
+        job = PreLabelJob.objects.get(id=job_id)
+    except (PreLabelJob.DoesNotExist, ValidationError):
+        return JsonResponse({"status": "error", "message": "Job not found"}, status=404)
+    job = fail_if_stale(job)
+
+    return JsonResponse(
+        {
+            "status": "success",
+            "job_id": str(job.id),
+            "job_status": job.status,
+            "total": job.total,
+            "enqueued": job.enqueued,
+            "failed": job.failed,
+            "error": job.error,
+            "created_at": job.created_at,
+            "finished_at": job.finished_at,
+        }
+    )
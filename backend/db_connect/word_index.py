@@ -0,0 +1,153 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import transaction, close_old_connections
+from PIL import Image, ImageSequence
+import logging, io, threading, time
+from .models import Annotation, PageWordIndex
+from .ocr import ocr_pages
+from .metrics import timed
+from .backends import get_storage
+
+try:
+    import fitz  # PyMuPDF, needed to rasterise PDF pages
+except ImportError:  # reported by the db_connect.W001 check
+    fitz = None
+
+# Per-page word boxes, OCR'd once at ingest, so region OCR becomes a lookup.
+# Word boxes are stored in page-relative coordinates (0..1) with a GRID x GRID
+# bucket grid over the page; a rectangle query only looks at the words
+# registered in the cells it overlaps.
+
+logger = logging.getLogger(__name__)
+
+GRID = 32
+PDF_RENDER_ZOOM = 2.0
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+# (annotation id, page) -> (loaded at, index). Rebuilds clear this process's
+# entries; other processes drop theirs after WORD_INDEX_CACHE_SECONDS.
+_pages = OrderedDict()
+_pages_lock = threading.Lock()
+
+def render_pages(s3_file_key, data):
+    # PNG bytes for every page of the document
+    with timed('render'):
+        return _render_pages(s3_file_key, data)
+
+def _render_pages(s3_file_key, data):
+    pages = []
+    if s3_file_key.lower().endswith('.pdf'):
+        if fitz is None:
+            raise RuntimeError("PyMuPDF is required to index PDF documents")
+        document = fitz.open(stream=data, filetype='pdf')
+        for page in document:
+            pages.append(page.get_pixmap(matrix=fitz.Matrix(PDF_RENDER_ZOOM, PDF_RENDER_ZOOM)).tobytes('png'))
+    else:
+        for frame in ImageSequence.Iterator(Image.open(io.BytesIO(data))):
+            png = io.BytesIO()
+            frame.convert('RGB').save(png, format='PNG')
+            pages.append(png.getvalue())
+    return pages
+
+def build_grid(words):
+    grid = {}
+    for index, (x0, y0, x1, y1, *_) in enumerate(words):
+        for i in range(min(int(x0 * GRID), GRID - 1), min(int(x1 * GRID), GRID - 1) + 1):
+            for j in range(min(int(y0 * GRID), GRID - 1), min(int(y1 * GRID), GRID - 1) + 1):
+                grid.setdefault(f"{i},{j}", []).append(index)
+    return grid
+
+def build_word_index(annotation_id):
+    annotation = Annotation.objects.values('s3_file_key').get(id=annotation_id)
+    data = get_storage().get_object(Bucket=settings.S3_DOC_BUCKET, Key=annotation['s3_file_key'])['Body'].read()
+
+    rows = []
+    for page, (width, height, words) in enumerate(ocr_pages(render_pages(annotation['s3_file_key'], data)), start=1):
+        words = [
+            [x0 / width, y0 / height, x1 / width, y1 / height, *rest]
+            for x0, y0, x1, y1, *rest in words
+        ]
+        rows.append(PageWordIndex(annotation_id=annotation_id, page=page, words=words, grid=build_grid(words)))
+
+    with transaction.atomic():
+        PageWordIndex.objects.filter(annotation_id=annotation_id).delete()
+        PageWordIndex.objects.bulk_create(rows)
+    with _pages_lock:
+        for key in [key for key in _pages if key[0] == str(annotation_id)]:
+            del _pages[key]
+    return len(rows)
+
+def _run(annotation_id):
+    close_old_connections()
+    try:
+        build_word_index(annotation_id)
+    except Exception as e:
+        logger.error(f"Error building word index for {annotation_id}: {e}")
+    finally:
+        close_old_connections()
+
+def _get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = ThreadPoolExecutor(max_workers=2, thread_name_prefix='word-index')
+    return _scheduler
+
+def schedule_word_index(annotation_id):
+    # Ingest hook: indexing runs in the background, never on the upload request
+    _get_scheduler().submit(_run, annotation_id)
+
+def _load_page(annotation_id, page):
+    key = (str(annotation_id), page)
+    now = time.monotonic()
+    with _pages_lock:
+        if key in _pages:
+            loaded_at, index = _pages[key]
+            if now - loaded_at < settings.WORD_INDEX_CACHE_SECONDS:
+                _pages.move_to_end(key)
+                return index
+            del _pages[key]
+
+    index = PageWordIndex.objects.filter(annotation_id=annotation_id, page=page).values('words', 'grid').first()
+    if index is None:
+        return None
+    with _pages_lock:
+        _pages[key] = (now, index)
+        while len(_pages) > settings.WORD_INDEX_CACHE_SIZE:
+            _pages.popitem(last=False)
+    return index
+
+def region_text(annotation_id, page, x0, y0, x1, y1):
+    """
+    Text of the words whose centre lies inside the page-relative rectangle,
+    in reading order, one line per OCR line. None if the page is not indexed.
+    """
+    index = _load_page(annotation_id, page)
+    if index is None:
+        return None
+
+    words, grid = index['words'], index['grid']
+    candidates = set()
+    for i in range(max(int(x0 * GRID), 0), min(int(x1 * GRID), GRID - 1) + 1):
+        for j in range(max(int(y0 * GRID), 0), min(int(y1 * GRID), GRID - 1) + 1):
+            candidates.update(grid.get(f"{i},{j}", ()))
+
+    selected = []
+    for word_index in candidates:
+        wx0, wy0, wx1, wy1, text, block, paragraph, line, word = words[word_index]
+        if x0 <= (wx0 + wx1) / 2 <= x1 and y0 <= (wy0 + wy1) / 2 <= y1:
+            selected.append(((block, paragraph, line, word), text))
+    selected.sort()
+
+    lines = []
+    previous_line = None
+    for (block, paragraph, line, _), text in selected:
+        if (block, paragraph, line) != previous_line:
+            lines.append([])
+            previous_line = (block, paragraph, line)
+        lines[-1].append(text)
+    return '\n'.join(' '.join(line) for line in lines)
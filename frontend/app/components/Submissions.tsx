@@ -10,7 +10,6 @@ interface Annotation {
   assigned_to_user: string | null;
   assigned_to_user_id: number | null;
   status: string;
-  history: any[];
 }
 
 interface SubmissionsProps {
@@ -286,7 +285,6 @@ const Submissions: React.FC<SubmissionsProps> = ({ userData }) => {
                       pathname: "/triage",
                       query: {
                         doc_id: item.id,
-                        history: JSON.stringify(item.history),
                         status: item.status,
                         username: userData?.username || '',
                       },
@@ -313,19 +311,6 @@ const Submissions: React.FC<SubmissionsProps> = ({ userData }) => {
                     {(hoveredRowID === item.id && hoveredLink) ? "View" : item.status}
                   </Link>
                 </div>
-                {(item.id == hoveredRowID) ? (
-                  <div className="text-blue-500">
-                    {item.history.map((instance: any, index: number) => (
-                      <div key={index} className="flex justify-between">
-                        <p className="text-sm">{instance}</p>
-                      </div>
-                    ))}
-                  </div>
-                ) : item.history.length > 0 && (
-                  <div className="text-blue-500">
-                    <p className="text-sm">{item.history[item.history.length - 1]}</p>
-                  </div>
-                )}
               </div>
             ))}
           </div>}
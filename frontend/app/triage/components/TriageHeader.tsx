@@ -6,16 +6,29 @@ import axiosInstance from "@/app/utils/axiosInstance";
 
 interface TriageHeaderProps {
   doc_id: string | null;
-  history: any[];
   handlePrevClick: () => void;
   handleNextClick: () => void;
 }
 
-const TriageHeader: React.FC<TriageHeaderProps> = ({ doc_id,  history, handlePrevClick, handleNextClick}) => {
+const TriageHeader: React.FC<TriageHeaderProps> = ({ doc_id, handlePrevClick, handleNextClick}) => {
   const [loading, setLoading] = useState<boolean>(false);
   const [showHistory, setShowHistory] = useState<boolean>(false);
+  const [history, setHistory] = useState<string[]>([]);
+
+  useEffect(() => {
+    if (!doc_id) return;
+    const fetchHistory = async () => {
+      try {
+        const response = await axiosInstance.get(`/get_history/${doc_id}/`);
+        // Events come back newest first; the header renders oldest first
+        setHistory(response.data.events.map((event: any) => event.description).reverse());
+      } catch (error) {
+        console.error("Failed to fetch history:", error);
+      }
+    };
+    fetchHistory();
+  }, [doc_id]);
 
-  
 
   if (loading) {
     return (
@@ -53,7 +66,7 @@ const TriageHeader: React.FC<TriageHeaderProps> = ({ doc_id,  history, handlePre
               className="text-lg text-gray-700 hover:text-blue-500 cursor-pointer"
               onClick={() => setShowHistory(!showHistory)}
             />
-            <p className="text-gray-700 text-sm">{history ? `${history[history.length - 1]}` : ""}</p>
+            <p className="text-gray-700 text-sm">{history.length > 0 ? history[history.length - 1] : ""}</p>
           </div>
 
           {showHistory && (
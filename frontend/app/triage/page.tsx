@@ -1,6 +1,6 @@
 'use client'
-import { Suspense } from 'react';
-import { useSearchParams } from 'next/navigation';
+import { Suspense, useEffect, useState } from 'react';
+import { useRouter, useSearchParams } from 'next/navigation';
 import InteractiveSpace from './components/InteractiveSpace';
 import TriageHeader from '@/app/triage/components/TriageHeader';
 import withAuth from '../utils/withAuth';
@@ -14,55 +14,75 @@ const Triage = () => {
   );
 }
 
+// Annotations either side of `annotation`, in listing order, nearest first.
+// `fetched` is false once the window has been shifted locally by a navigation.
+type NeighborWindow = { annotation: any; next: any[]; prev: any[]; fetched: boolean };
+
 function TriageContent() {
+  const router = useRouter();
   const searchParams = useSearchParams();
   const doc_id = searchParams.get('doc_id');
   const status = searchParams.get('status');
-  const historyParam = searchParams.get('history');
   const username = searchParams.get('username');
 
-  // Parse history if it exists
-  const history = historyParam ? JSON.parse(historyParam) : null;
+  const [neighbors, setNeighbors] = useState<NeighborWindow | null>(null);
 
-  const handleNextClick = async () => {
-    if (!doc_id) {
-      console.error("Document ID is missing");
-      return;
-    }
-    try {
-      const response = await axiosInstance.get(`/get_next/${doc_id}/`, {
-        headers: {
-          "Content-Type": "application/json",
-        },
+  useEffect(() => {
+    if (!doc_id) return;
+    // A shifted window is reused until it runs short on either side
+    if (
+      neighbors?.annotation.id === doc_id &&
+      (neighbors.fetched || (neighbors.next.length > 1 && neighbors.prev.length > 1))
+    ) return;
+    axiosInstance
+      .get(`/get_neighbors/${doc_id}/`, { params: { k: 5 } })
+      .then((response) => {
+        if (response.data.status !== "success") return;
+        setNeighbors({ annotation: response.data.annotation, next: response.data.next, prev: response.data.prev, fetched: true });
+      })
+      .catch((error) => {
+        console.error("Failed to prefetch neighbouring documents:", error);
       });
+  }, [doc_id, neighbors]);
 
-      if (response.status !== 200) {
-        throw new Error("Network response was not ok");
-      }
-      const data = response.data;
-      if (data.status === "success") {
-        const annotation = data.annotation;
-        if (annotation) {
-          window.location.href = `/triage?doc_id=${annotation.id}&history=${JSON.stringify(annotation.history)}&status=${annotation.status}&username=${username}`;
-        }
-        else {
-          alert("You are at the last document");
-        }
-      } else {
-        alert(`Failed to get next document: ${data.message}`);
-      }
-    } catch (error) {
-      console.error("Failed to send option:", error);
-    }
+  const upcoming = neighbors?.annotation.id === doc_id ? neighbors?.next[0] : undefined;
+
+  useEffect(() => {
+    if (!upcoming) return;
+    // Warm the browser cache with the document and label the user most likely opens next,
+    // using the same URLs the triage components request
+    fetch(`${process.env.NEXT_PUBLIC_API_BASE_URL}/get_document/${upcoming.id}`).catch(() => {});
+    axiosInstance.get(`/get_json/${upcoming.status}/${upcoming.id}`).catch(() => {});
+  }, [upcoming]);
+
+  const open = (annotation: any) => {
+    router.push(`/triage?doc_id=${annotation.id}&status=${annotation.status}&username=${username}`);
   };
 
-  const handlePrevClick = async () => {
+  const navigate = async (direction: "next" | "prev", edgeMessage: string) => {
     if (!doc_id) {
       console.error("Document ID is missing");
       return;
     }
+    if (neighbors?.annotation.id === doc_id) {
+      const [annotation, ...rest] = neighbors[direction];
+      if (!annotation) {
+        alert(edgeMessage);
+        return;
+      }
+      // Slide the window so the next click needs no round trip either
+      const opposite = direction === "next" ? "prev" : "next";
+      setNeighbors({
+        annotation,
+        [direction]: rest,
+        [opposite]: [neighbors.annotation, ...neighbors[opposite]],
+        fetched: false,
+      } as NeighborWindow);
+      open(annotation);
+      return;
+    }
     try {
-      const response = await axiosInstance.get(`/get_prev/${doc_id}/`, {
+      const response = await axiosInstance.get(`/get_${direction}/${doc_id}/`, {
         headers: {
           "Content-Type": "application/json",
         },
@@ -71,29 +91,32 @@ function TriageContent() {
       if (response.status !== 200) {
         throw new Error("Network response was not ok");
       }
-
       const data = response.data;
       if (data.status === "success") {
         const annotation = data.annotation;
         if (annotation) {
-          window.location.href = `/triage?doc_id=${annotation.id}&history=${JSON.stringify(annotation.history)}&status=${annotation.status}&username=${username}`;
+          open(annotation);
         }
         else {
-          alert("You are at the first document");
+          alert(edgeMessage);
         }
       } else {
-        alert(`Failed to get next document: ${data.message}`);
+        alert(`Failed to get ${direction} document: ${data.message}`);
       }
     } catch (error) {
       console.error("Failed to send option:", error);
     }
   };
 
+  const handleNextClick = () => navigate("next", "You are at the last document");
+
+  const handlePrevClick = () => navigate("prev", "You are at the first document");
+
   return (
     <main>
-      <TriageHeader doc_id={doc_id} history={history} handlePrevClick={handlePrevClick} handleNextClick={handleNextClick}/>
+      <TriageHeader doc_id={doc_id} handlePrevClick={handlePrevClick} handleNextClick={handleNextClick}/>
       {doc_id && status ? (
-        <InteractiveSpace doc_id={doc_id} status={status} handleNextClick={handleNextClick}/>
+        <InteractiveSpace key={doc_id} doc_id={doc_id} status={status} handleNextClick={handleNextClick}/>
       ) : (
         <div>Invalid document ID or status</div>
       )}